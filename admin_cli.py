@@ -0,0 +1,229 @@
+"""
+Offline maintenance of the data store, without going through the bot.
+
+Every command runs as one storage transaction, so a large job is a
+single load/save of data.json.
+
+Usage:
+    python -m admin_cli authorize users.txt
+    python -m admin_cli unauthorize users.txt
+    python -m admin_cli import-prices prices.csv
+    python -m admin_cli adjust 123456789 -5000
+    python -m admin_cli check --deep
+    python -m admin_cli compact --keep-days 30
+    python -m admin_cli migrate
+    python -m admin_cli snapshot backup.mmbs
+    python -m admin_cli restore backup.mmbs
+"""
+import argparse, csv, os, sys
+from datetime import datetime, timedelta
+
+import ledger, pricing, snapshot, stats
+from storage import DATA_FILE, load_data, data_transaction
+
+USER_DEFAULTS = {"name": "", "username": "", "balance": 0, "orders": [], "topups": []}
+
+
+def read_user_ids(path):
+    """One user ID per line; blank lines and # comments are ignored"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if not line.isdigit():
+                raise ValueError(f"invalid user id: {line!r}")
+            yield line
+
+
+def cmd_authorize(args):
+    user_ids = list(read_user_ids(args.file))
+    with data_transaction() as data:
+        authorized = set(data.get("authorized_users", []))
+        before = len(authorized)
+        authorized.update(user_ids)
+        data["authorized_users"] = sorted(authorized)
+    print(f"{len(authorized) - before} users authorized ({len(authorized)} total)")
+
+
+def cmd_unauthorize(args):
+    user_ids = set(read_user_ids(args.file))
+    with data_transaction() as data:
+        authorized = set(data.get("authorized_users", []))
+        before = len(authorized)
+        authorized -= user_ids
+        data["authorized_users"] = sorted(authorized)
+    print(f"{before - len(authorized)} users unauthorized ({len(authorized)} total)")
+
+
+def cmd_import_prices(args):
+    """CSV with item,price rows; a header row is skipped if present"""
+    prices = {}
+    with open(args.file, "r", encoding="utf-8", newline="") as f:
+        for line_no, row in enumerate(csv.reader(f), 1):
+            if not row or row[0].strip().lower() == "item":
+                continue
+            if len(row) < 2:
+                raise ValueError(f"line {line_no}: expected item,price, got {row!r}")
+            item, price = row[0].strip(), row[1].strip()
+            if not price.isdigit():
+                raise ValueError(f"invalid price for {item}: {price!r}")
+            prices[item] = int(price)
+    with data_transaction() as data:
+        pricing.set_custom_prices(data, prices, replace=args.replace)
+    print(f"{len(prices)} prices imported")
+
+
+def cmd_adjust(args):
+    with data_transaction() as data:
+        if args.user_id not in data["users"]:
+            raise ValueError(f"user {args.user_id} not found")
+        kind = ledger.KIND_TOPUP if args.amount > 0 else ledger.KIND_DEDUCT
+        entry = ledger.post(data, args.user_id, kind, args.amount, ref=f"cli:{args.note}")
+    print(f"{args.user_id}: {args.amount:+,} -> {entry['balance']:,} MMK")
+
+
+def find_problems(data):
+    """Structural problems in the store, as human-readable strings"""
+    problems = []
+    seen_orders = set()
+    for uid, user_data in data["users"].items():
+        for key in USER_DEFAULTS:
+            if key not in user_data:
+                problems.append(f"user {uid}: missing {key}")
+        for order in user_data.get("orders", []):
+            order_id = order.get("order_id")
+            if order_id in seen_orders:
+                problems.append(f"user {uid}: duplicate order {order_id}")
+            seen_orders.add(order_id)
+            for key in ("order_id", "game_id", "server_id", "amount", "price", "status", "timestamp"):
+                if key not in order:
+                    problems.append(f"user {uid}: order {order_id} missing {key}")
+        if user_data.get("balance", 0) < 0:
+            problems.append(f"user {uid}: negative balance {user_data['balance']}")
+    return problems
+
+
+def cmd_check(args):
+    data = load_data()
+    problems = find_problems(data)
+    mismatches, untracked = ledger.check(data, deep=args.deep)
+    for problem in problems:
+        print(problem)
+    for user_id, stored, expected in mismatches:
+        print(f"user {user_id}: balance {stored} but ledger says {expected}")
+    print(
+        f"{len(data['users'])} users, {len(problems)} problems, "
+        f"{len(mismatches)} ledger mismatches, {len(untracked)} not in ledger"
+    )
+    return 1 if problems or mismatches else 0
+
+
+def cmd_compact(args):
+    """Drop hourly aggregates older than --keep-days and de-duplicate ID lists"""
+    cutoff = (datetime.now() - timedelta(days=args.keep_days)).strftime("%Y-%m-%dT%H")
+    with data_transaction() as data:
+        hours = data.get("stats", {}).get("hours", {})
+        stale = [key for key in hours if key < cutoff]
+        for key in stale:
+            del hours[key]
+        data["authorized_users"] = sorted(set(data.get("authorized_users", [])))
+        if "admin_ids" in data:
+            data["admin_ids"] = list(dict.fromkeys(data["admin_ids"]))
+    print(f"{len(stale)} hourly buckets removed")
+
+
+def cmd_migrate(args):
+    """Bring old records up to the current layout, open ledgers and rebuild aggregates"""
+    with data_transaction() as data:
+        data.setdefault("prices", {})
+        filled = 0
+        for uid, user_data in data["users"].items():
+            for key, default in USER_DEFAULTS.items():
+                if key not in user_data:
+                    user_data[key] = [] if isinstance(default, list) else default
+                    filled += 1
+            for order in user_data["orders"]:
+                if "user_id" not in order:
+                    order["user_id"] = uid
+                    filled += 1
+        _, untracked = ledger.check(data)
+        for uid in untracked:
+            balance = data["users"][uid]["balance"]
+            data["users"][uid]["balance"] = 0
+            ledger.post(data, uid, ledger.KIND_OPENING, balance)
+        stats.rebuild_stats(data)
+    print(f"{filled} fields filled, {len(untracked)} ledgers opened, aggregates rebuilt")
+
+
+def cmd_snapshot(args):
+    """Write the store as a compact binary snapshot (see snapshot.py)"""
+    data = load_data()
+    snapshot.write(data, args.file)
+    print(
+        f"{len(data['users'])} users written to {args.file} "
+        f"({os.path.getsize(args.file):,} bytes, data.json {os.path.getsize(DATA_FILE):,} bytes)"
+    )
+
+
+def cmd_restore(args):
+    """Replace the store with the contents of a snapshot"""
+    restored = snapshot.load(args.file)
+    with data_transaction() as data:
+        data.clear()
+        data.update(restored)
+    print(f"{len(restored.get('users', {}))} users restored from {args.file}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m admin_cli", description="Data store maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("authorize", help="authorize user IDs listed in a file")
+    command.add_argument("file")
+    command.set_defaults(func=cmd_authorize)
+
+    command = commands.add_parser("unauthorize", help="unauthorize user IDs listed in a file")
+    command.add_argument("file")
+    command.set_defaults(func=cmd_unauthorize)
+
+    command = commands.add_parser("import-prices", help="import custom prices from item,price CSV")
+    command.add_argument("file")
+    command.add_argument("--replace", action="store_true", help="drop existing custom prices first")
+    command.set_defaults(func=cmd_import_prices)
+
+    command = commands.add_parser("adjust", help="credit (+) or debit (-) a user's balance")
+    command.add_argument("user_id")
+    command.add_argument("amount", type=int)
+    command.add_argument("--note", default="adjust")
+    command.set_defaults(func=cmd_adjust)
+
+    command = commands.add_parser("check", help="verify store structure and ledger balances")
+    command.add_argument("--deep", action="store_true", help="replay every ledger entry")
+    command.set_defaults(func=cmd_check)
+
+    command = commands.add_parser("compact", help="prune old hourly aggregates")
+    command.add_argument("--keep-days", type=int, default=30)
+    command.set_defaults(func=cmd_compact)
+
+    command = commands.add_parser("migrate", help="upgrade records to the current layout")
+    command.set_defaults(func=cmd_migrate)
+
+    command = commands.add_parser("snapshot", help="write the store as a compact binary snapshot")
+    command.add_argument("file")
+    command.set_defaults(func=cmd_snapshot)
+
+    command = commands.add_parser("restore", help="replace the store with a snapshot's contents")
+    command.add_argument("file")
+    command.set_defaults(func=cmd_restore)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args) or 0
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Keyword auto-replies for plain text messages.
+
+Rules live in the data store under data["auto_reply"]["rules"], e.g.
+
+    {"name": "greeting", "keywords": ["hello", "hi", "မင်္ဂလာပါ"],
+     "response": "👋 မင်္ဂလာပါ! ..."}
+
+All keywords of all rules are compiled into one alternation regex, so a
+message is scanned once however many rules there are. Keywords match
+anywhere in the text, case-insensitively (Burmese has no word breaks);
+when several rules match, the one listed first wins.
+"""
+import re, time
+
+DEFAULT_RULES = [
+    {
+        "name": "greeting",
+        "keywords": ["hello", "hi", "မင်္ဂလာပါ", "ဟယ်လို", "ဟိုင်း", "ကောင်းလား"],
+        "response": (
+            "👋 မင်္ဂလာပါ! MLBB Diamond Top-up Bot မှ ကြိုဆိုပါတယ်!\n\n"
+            "📱 Bot commands များ သုံးရန် `/start` နှိပ်ပါ\n"
+            "💡 အကူအညီလိုရင် `/help` နှိပ်ပါ"
+        ),
+    },
+    {
+        "name": "help",
+        "keywords": ["help", "ကူညီ", "အကူအညီ", "မသိ", "လမ်းညွှန်"],
+        "response": (
+            "📱 **အသုံးပြုနိုင်တဲ့ commands:**\n"
+            "• `/start` - Bot စတင်အသုံးပြုရန်\n"
+            "• `/mmb gameid serverid amount` - Diamond ဝယ်ယူရန်\n"
+            "• `/balance` - လက်ကျန်ငွေ စစ်ရန်\n"
+            "• `/topup amount` - ငွေဖြည့်ရန်\n"
+            "• `/price` - ဈေးနှုန်းများ ကြည့်ရန်\n"
+            "• `/history` - မှတ်တမ်းများ ကြည့်ရန်\n\n"
+            "💡 အသေးစိတ် လိုအပ်ရင် admin ကို ဆက်သွယ်ပါ!"
+        ),
+    },
+]
+
+DEFAULT_RESPONSE = (
+    "📱 **MLBB Diamond Top-up Bot**\n\n"
+    "💎 Diamond ဝယ်ယူရန် `/mmb` command သုံးပါ\n"
+    "💰 ဈေးနှုန်းများ သိရှိရန် `/price` နှိပ်ပါ\n"
+    "🆘 အကူအညီ လိုရင် `/start` နှိပ်ပါ"
+)
+
+
+def compile_rules(rules):
+    """Return matcher(text) -> response of the first matching rule, or None"""
+    owner = {}
+    for position, rule in enumerate(rules):
+        for keyword in rule["keywords"]:
+            owner.setdefault(keyword.lower(), position)
+    if not owner:
+        return lambda text: None
+
+    # Longest first so a keyword never hides a longer one starting at the same place
+    pattern = re.compile(
+        "|".join(re.escape(keyword) for keyword in sorted(owner, key=len, reverse=True)),
+        re.IGNORECASE,
+    )
+    responses = [rule["response"] for rule in rules]
+
+    def matcher(text):
+        best = None
+        for match in pattern.finditer(text):
+            position = owner[match.group(0).lower()]
+            if best is None or position < best:
+                best = position
+                if best == 0:
+                    break
+        return responses[best] if best is not None else None
+
+    return matcher
+
+
+def get_rules(data):
+    return data.get("auto_reply", {}).get("rules", DEFAULT_RULES)
+
+
+def set_rules(data, rules):
+    data["auto_reply"] = {"rules": rules}
+
+
+def parse_rule(text):
+    """
+    Parse `name keyword1,keyword2 | response` into a rule; raises
+    ValueError on bad input. The response may span several lines.
+    """
+    head, sep, response = text.partition("|")
+    parts = head.split(None, 1)
+    response = response.strip()
+    if not sep or len(parts) != 2 or not response:
+        raise ValueError("format: name keyword1,keyword2 | response")
+    keywords = [keyword.strip() for keyword in parts[1].split(",") if keyword.strip()]
+    if not keywords:
+        raise ValueError("at least one keyword is required")
+    return {"name": parts[0], "keywords": keywords, "response": response}
+
+
+class Cooldown:
+    """Allows one reply per chat every `seconds`"""
+
+    def __init__(self, seconds, max_chats=10000):
+        self.seconds = seconds
+        self.max_chats = max_chats
+        self.last = {}
+
+    def ready(self, chat_id, now=None):
+        now = time.monotonic() if now is None else now
+        last = self.last.get(chat_id)
+        if last is not None and now - last < self.seconds:
+            return False
+        if len(self.last) >= self.max_chats:
+            cutoff = now - self.seconds
+            self.last = {chat: at for chat, at in self.last.items() if at > cutoff}
+        self.last[chat_id] = now
+        return True
@@ -0,0 +1,97 @@
+"""
+Update throughput of N cluster workers sharing one store, versus one.
+
+Usage:
+    python bench_cluster.py --workers 1 2 4 --orders 20000 --updates 400 --write-ratio 0.2 --latency 0.05
+
+Each worker is a fresh process working through its share of synthetic
+updates one at a time, as a bot worker does (python-telegram-bot handles
+a worker's updates sequentially). Per update it does what a handler does
+to storage:
+
+    two StoreDict reads (user_states, maintenance), as every handler checks
+    load_user() for a read update (/balance, /history)
+    a data_transaction() adding an order, for --write-ratio of the updates
+    a sleep of --latency seconds standing in for the reply round trip to
+    the Telegram API
+
+Throughput is all updates over the slowest worker's wall time. Reads
+run in parallel. Writes take the store lock and rewrite data.json, so
+they run one at a time whatever N is. --latency 0 shows that ceiling.
+"""
+import argparse, multiprocessing, os, random, tempfile, time
+
+
+def worker(directory, updates, write_ratio, latency, seed, start, results):
+    os.chdir(directory)
+    import storage
+
+    user_states = storage.StoreDict("user_states")
+    maintenance = storage.StoreDict("maintenance", {"orders": True})
+    uids = list(storage.load_data()["users"])
+    rng = random.Random(seed)
+    start.wait()
+    began = time.perf_counter()
+    for number in range(updates):
+        uid = rng.choice(uids)
+        uid in user_states
+        maintenance["orders"]
+        if rng.random() < write_ratio:
+            with storage.data_transaction() as data:
+                data["users"][uid]["orders"].append({"order_id": f"BENCH{seed}-{number}", "status": "pending"})
+        else:
+            storage.load_user(uid)
+        if latency:
+            time.sleep(latency)
+    results.put(time.perf_counter() - began)
+
+
+def run(directory, workers, updates, write_ratio, latency):
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(directory, updates // workers, write_ratio, latency, seed, start, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    # Let every worker import and open the store before timing
+    time.sleep(1.0)
+    start.set()
+    elapsed = max(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return (updates // workers) * workers / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--updates", type=int, default=400)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    import storage
+    from bench_snapshot import make_store
+
+    print(f"{os.cpu_count()} CPUs, {args.orders:,} orders, {args.updates} updates, "
+          f"{args.write_ratio:.0%} writes, {args.latency * 1000:.0f} ms API latency")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                storage.save_data(make_store(args.orders, 10))
+            finally:
+                os.chdir(cwd)
+            rate = run(directory, workers, args.updates, args.write_ratio, args.latency)
+        baseline = baseline or rate
+        print(f"  {workers} worker(s): {rate:8.1f} updates/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
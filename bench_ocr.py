@@ -0,0 +1,65 @@
+"""
+Throughput of the screenshot OCR stage on a directory of sample images.
+
+Usage:
+    python bench_ocr.py samples/ --workers 1 2 4 --expect 50000
+
+Prints images/second for each pool size and how many screenshots parsed
+to an amount (and, with --expect, how many matched it).
+"""
+import argparse, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+import ocr
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def load_samples(directory):
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(directory, name), "rb") as f:
+                samples.append((name, f.read()))
+    return samples
+
+
+def run(samples, workers):
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(ocr.scan_image, [image for _, image in samples]))
+    return time.perf_counter() - start, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--expect", type=int, help="amount every sample should show")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print each parsed receipt")
+    args = parser.parse_args(argv)
+
+    if not ocr.is_available():
+        sys.exit("pytesseract and Pillow are required for OCR")
+    samples = load_samples(args.directory)
+    if not samples:
+        sys.exit(f"no images in {args.directory}")
+
+    for workers in args.workers:
+        elapsed, results = run(samples, workers)
+        parsed = sum(1 for receipt in results if receipt["amount"] is not None)
+        line = (
+            f"workers={workers}: {len(samples)} images in {elapsed:.2f}s "
+            f"({len(samples) / elapsed:.1f}/s), amount parsed {parsed}/{len(samples)}"
+        )
+        if args.expect is not None:
+            matched = sum(1 for receipt in results if ocr.verdict(receipt, args.expect) == ocr.MATCH)
+            line += f", matched {matched}/{len(samples)}"
+        print(line)
+        if args.verbose:
+            for (name, _), receipt in zip(samples, results):
+                print(f"  {name}: {receipt}")
+
+
+if __name__ == "__main__":
+    main()
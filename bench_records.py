@@ -0,0 +1,55 @@
+"""
+Memory per order held as store dicts versus records.Order.
+
+Usage:
+    python bench_records.py --orders 100000
+
+Orders are parsed from JSON text, as load_data() would, and kept either
+as the parsed dicts or converted to records sharing repeated strings
+(the dicts are dropped). Memory is what tracemalloc still sees allocated
+afterwards.
+"""
+import argparse, gc, json, time, tracemalloc
+
+import records
+from bench_snapshot import make_store
+
+
+def held_memory(text, convert):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = convert(json.loads(text))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, current, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    store = make_store(args.orders, 10)
+    orders = [order for user_data in store["users"].values() for order in user_data["orders"]]
+    text = json.dumps(orders)
+    del store, orders
+
+    dicts, dict_bytes, dict_seconds = held_memory(text, lambda parsed: parsed)
+    del dicts
+    strings = {}
+    held, record_bytes, record_seconds = held_memory(
+        text, lambda parsed: [records.Order.from_dict(order, strings) for order in parsed]
+    )
+    assert [order.to_dict() for order in held] == json.loads(text)
+    del held, strings
+
+    for label, size, seconds in (("dict", dict_bytes, dict_seconds), ("Order", record_bytes, record_seconds)):
+        print(f"{label:<6} {size / args.orders:7.0f} bytes/order  {size / 2**20:8.1f} MiB  {seconds * 1000:8.1f} ms")
+    print(f"records use {record_bytes / dict_bytes:.0%} of the dict memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Load time and memory of data.json versus the compact snapshot.
+
+Usage:
+    python bench_snapshot.py --orders 10000 100000 1000000 --orders-per-user 10
+
+For each size a synthetic store is written both ways to a temp directory.
+Every measurement runs in a fresh interpreter so peak RSS is its own:
+
+    json       json.load of data.json (indent=2, as the bot used to write it)
+    full       snapshot.load, decoding every user
+    open       Snapshot() plus one user lookup, the lazy path
+"""
+import argparse, json, os, random, resource, subprocess, sys, tempfile, time
+from datetime import datetime, timedelta
+
+import snapshot
+
+PACKAGES = ["11", "22", "56", "86", "112", "172", "257", "343", "429", "514", "706", "wp1", "wp2", "twilight"]
+STATUSES = ["pending", "confirmed", "delivered", "cancelled", "expired", "failed"]
+
+
+def make_store(orders, orders_per_user, seed=1):
+    """Synthetic store where each user orders for one of a couple of game accounts"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    users = {}
+    accounts = {}
+    for number in range(max(1, orders // orders_per_user)):
+        uid = str(5000000000 + number)
+        users[uid] = {"name": f"User {number}", "username": f"user{number}",
+                      "balance": rng.randrange(0, 200000), "orders": [], "topups": []}
+        accounts[uid] = [(str(rng.randrange(10**8, 10**9)), str(rng.randrange(1000, 20000))) for _ in range(2)]
+    uids = list(users)
+    for number in range(orders):
+        uid = uids[number % len(uids)]
+        game_id, server_id = rng.choice(accounts[uid])
+        users[uid]["orders"].append({
+            "order_id": f"ORD{20250101000000 + number}",
+            "game_id": game_id,
+            "server_id": server_id,
+            "amount": rng.choice(PACKAGES),
+            "price": rng.randrange(1000, 300000, 100),
+            "status": rng.choice(STATUSES),
+            "timestamp": (start + timedelta(seconds=number * 17, microseconds=rng.randrange(10**6))).isoformat(),
+            "user_id": uid,
+            "chat_id": int(uid),
+        })
+    return {"users": users, "prices": {"wp1": 6000}, "authorized_users": uids[:100]}
+
+
+def peak_rss_kib():
+    # ru_maxrss survives exec on Linux, so a child forked from this (large)
+    # parent would report the parent's peak; VmHWM is reset by exec.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, path):
+    """Runs in the child interpreter; prints seconds and peak RSS growth in KiB"""
+    baseline = peak_rss_kib()
+    start = time.perf_counter()
+    if mode == "json":
+        with open(path) as f:
+            data = json.load(f)
+    elif mode == "full":
+        data = snapshot.load(path)
+    else:
+        reader = snapshot.Snapshot(path)
+        data = reader[next(iter(reader))]
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kib()
+    print(json.dumps({"seconds": elapsed, "rss_kib": peak - baseline}))
+
+
+def run_child(mode, path):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", mode, path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--orders-per-user", type=int, default=10)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        snap_path = os.path.join(directory, "data.mmbs")
+        for orders in args.orders:
+            data = make_store(orders, args.orders_per_user)
+            with open(json_path, "w") as f:
+                json.dump(data, f, indent=2)
+            snapshot.write(data, snap_path)
+            assert snapshot.load(snap_path) == data
+            del data
+
+            print(
+                f"{orders:,} orders: data.json {os.path.getsize(json_path) / 2**20:.1f} MiB, "
+                f"snapshot {os.path.getsize(snap_path) / 2**20:.1f} MiB"
+            )
+            for mode, path in (("json", json_path), ("full", snap_path), ("open", snap_path)):
+                result = run_child(mode, path)
+                print(f"  {mode:<5} {result['seconds'] * 1000:9.1f} ms  {result['rss_kib'] / 1024:8.1f} MiB RSS")
+
+
+if __name__ == "__main__":
+    main()
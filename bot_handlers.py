@@ -19,9 +19,9 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     try:
         await update.message.reply_text(welcome_message)
-        logger.info(f"Start command executed for user {user.id}")
-    except Exception as e:
-        logger.error(f"Error in start command: {e}")
+        logger.info("start command", extra={"user_id": user.id, "sample": "command"})
+    except Exception:
+        logger.exception("start command failed")
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /help is issued."""
@@ -38,9 +38,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     
     try:
         await update.message.reply_text(help_message)
-        logger.info(f"Help command executed for user {update.effective_user.id}")
-    except Exception as e:
-        logger.error(f"Error in help command: {e}")
+        logger.info("help command", extra={"user_id": update.effective_user.id, "sample": "command"})
+    except Exception:
+        logger.exception("help command failed")
 
 async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Echo the user message with some processing."""
@@ -58,9 +58,9 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     
     try:
         await update.message.reply_text(response_message)
-        logger.info(f"Echoed message from user {user.id}: {user_message[:50]}...")
-    except Exception as e:
-        logger.error(f"Error echoing message: {e}")
+        logger.info("echoed message", extra={"user_id": user.id, "length": len(user_message), "sample": "echo"})
+    except Exception:
+        logger.exception("echo failed")
 
 async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show current prices for data packages."""
@@ -79,9 +79,9 @@ async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     try:
         await update.message.reply_text(price_message)
-        logger.info(f"Price command executed for user {update.effective_user.id}")
-    except Exception as e:
-        logger.error(f"Error in price command: {e}")
+        logger.info("price command", extra={"user_id": update.effective_user.id, "sample": "command"})
+    except Exception:
+        logger.exception("price command failed")
 
 async def order_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle user orders."""
@@ -102,9 +102,9 @@ async def order_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     try:
         await update.message.reply_text(order_message)
-        logger.info(f"Order command executed for user {user.id}")
-    except Exception as e:
-        logger.error(f"Error in order command: {e}")
+        logger.info("order command", extra={"user_id": user.id, "sample": "command"})
+    except Exception:
+        logger.exception("order command failed")
 
 # Admin command functions
 async def set_wave(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -122,7 +122,7 @@ async def set_wave(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     WAVE_NUMBER = new_wave
     
     await update.message.reply_text(f"✅ Wave နံပါတ် ပြောင်းလဲပြီး: {new_wave}")
-    logger.info(f"Wave number updated to {new_wave} by admin {update.effective_user.id}")
+    logger.info("wave number updated", extra={"number": new_wave, "admin_id": update.effective_user.id})
 
 async def set_kpay(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Set KPay number (Admin only)."""
@@ -139,7 +139,7 @@ async def set_kpay(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     KPAY_NUMBER = new_kpay
     
     await update.message.reply_text(f"✅ KPay နံပါတ် ပြောင်းလဲပြီး: {new_kpay}")
-    logger.info(f"KPay number updated to {new_kpay} by admin {update.effective_user.id}")
+    logger.info("kpay number updated", extra={"number": new_kpay, "admin_id": update.effective_user.id})
 
 async def set_price(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Set package prices (Admin only)."""
@@ -164,7 +164,7 @@ async def set_price(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if package in PRICES:
         PRICES[package] = price
         await update.message.reply_text(f"✅ {package.upper()} ဈေးနှုန်း {price} MMK သို့ ပြောင်းလဲပြီး")
-        logger.info(f"Price updated: {package} = {price} MMK by admin {update.effective_user.id}")
+        logger.info("price updated", extra={"package": package, "price": price, "admin_id": update.effective_user.id})
     else:
         await update.message.reply_text(f"❌ Package '{package}' မတွေ့ပါ\nရရှိနိုင်သော packages: {', '.join(PRICES.keys())}")
 
@@ -198,10 +198,10 @@ async def process_order(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             )
             await update.message.reply_text(confirmation)
             
-            logger.info(f"Order processed from user {user.id}: {message_text[:50]}...")
+            logger.info("order processed", extra={"user_id": user.id, "length": len(message_text)})
             
-        except Exception as e:
-            logger.error(f"Error processing order: {e}")
+        except Exception:
+            logger.exception("order processing failed")
             await update.message.reply_text(
                 "😔 Order ပို့ရာတွင် ပြဿနာ ဖြစ်ပါသည်။\n"
                 "ကျေးဇူးပြု၍ နောက်မှ ထပ်စမ်းကြည့်ပါ။"
@@ -227,13 +227,13 @@ async def admin_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     
     try:
         await update.message.reply_text(admin_commands)
-        logger.info(f"Admin help shown to user {update.effective_user.id}")
-    except Exception as e:
-        logger.error(f"Error in admin help: {e}")
+        logger.info("admin help", extra={"user_id": update.effective_user.id})
+    except Exception:
+        logger.exception("admin help failed")
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log the error and send a telegram message to notify the developer."""
-    logger.error(f"Exception while handling an update: {context.error}")
+    logger.error("exception while handling an update", exc_info=context.error)
     
     # Try to send error message to user if update is available
     if isinstance(update, Update) and update.effective_message:
@@ -245,5 +245,5 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
         
         try:
             await update.effective_message.reply_text(error_message)
-        except Exception as e:
-            logger.error(f"Error sending error message: {e}")
+        except Exception:
+            logger.exception("sending error message failed")
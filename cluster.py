@@ -0,0 +1,160 @@
+"""
+Multi-process deployment: one webhook front process feeding N bot workers.
+
+    BOT_WORKERS=4 WEBHOOK_URL=https://bot.example.com/telegram python cluster.py
+
+The front registers WEBHOOK_URL with Telegram and listens on WEBHOOK_PORT
+(default 8080). Put it behind a TLS-terminating proxy, because Telegram
+only posts to HTTPS. Each update is routed to a worker by the sender's
+user ID, so one user's updates are always handled in order by the same
+worker.
+
+Workers run the normal bot (main.build_application) without polling.
+They keep user_states, pending_topups, maintenance and payment_info in
+data.json.state, a sqlite file (BOT_SHARED_STATE=1), rather than in
+memory, so every worker sees the same state; a read or write there
+touches one row.
+
+Limit: everything else is data.json, and every write to it takes one
+file lock and rewrites the whole file, blocking the worker's event loop
+while it waits. Writes therefore run one at a time however many workers
+there are. Workers pay off by overlapping Telegram API round trips and
+read-only updates. bench_cluster.py measures it; on one core with 20,000
+orders and 20% writes:
+
+    50 ms API latency   1 worker 7.4 updates/s, 2 workers 1.44x, 4 workers 1.79x
+    no API latency      1 worker 13.5 updates/s, 2 and 4 workers about the same
+"""
+import asyncio, json, logging, multiprocessing, os, secrets, urllib.parse, urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import jsonlog
+
+logger = logging.getLogger(__name__)
+
+# Update fields whose object carries the acting user as "from" (or "user")
+SENDER_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+    "shipping_query", "pre_checkout_query", "my_chat_member", "chat_member",
+    "chat_join_request", "poll_answer", "message_reaction",
+)
+
+
+def partition(update, workers):
+    """Worker index for a raw update: by sender, falling back to update_id"""
+    for field in SENDER_FIELDS:
+        item = update.get(field)
+        if item:
+            sender = item.get("from") or item.get("user")
+            if sender:
+                return int(sender["id"]) % workers
+    return update.get("update_id", 0) % workers
+
+
+def run_worker(index, inbox):
+    """Process entry point: run one bot worker fed from inbox"""
+    os.environ["BOT_SHARED_STATE"] = "1"
+    os.environ["BOT_WORKER_INDEX"] = str(index)
+    jsonlog.setup(f"worker {index}")
+    # Imported only now, so main sees the shared-state settings above
+    import main
+    asyncio.run(serve_worker(main, inbox))
+
+
+async def serve_worker(main, inbox):
+    from telegram import Update
+
+    application = main.build_application(polling=False)
+    await application.initialize()
+    await main.start_fulfillment(application)
+    await application.start()
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, inbox.get)
+            if raw is None:
+                break
+            update = Update.de_json(json.loads(raw), application.bot)
+            await application.update_queue.put(update)
+    finally:
+        await application.stop()
+        await main.stop_workers(application)
+        await application.shutdown()
+
+
+def set_webhook(token, url, secret):
+    params = urllib.parse.urlencode({"url": url, "secret_token": secret}).encode()
+    request = urllib.request.Request(f"https://api.telegram.org/bot{token}/setWebhook", data=params)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        result = json.load(response)
+    if not result.get("ok"):
+        raise RuntimeError(f"setWebhook failed: {result}")
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    # The server is single-threaded on purpose: updates are handed to the
+    # worker queues in the order Telegram delivered them.
+
+    def do_POST(self):
+        if self.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.server.secret:
+            self.send_error(403)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            update = json.loads(body)
+        except ValueError:
+            self.send_error(400)
+            return
+        inboxes = self.server.inboxes
+        inboxes[partition(update, len(inboxes))].put(body)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def main():
+    jsonlog.setup("front")
+    # main.py loads .env and reads the token
+    from main import BOT_TOKEN
+
+    url = os.getenv("WEBHOOK_URL")
+    if not BOT_TOKEN or not url:
+        raise SystemExit("BOT_TOKEN and WEBHOOK_URL are required")
+    port = int(os.getenv("WEBHOOK_PORT", "8080"))
+    workers = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 1)))
+    secret = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+
+    # Fresh interpreters, so each worker imports main with its own settings
+    context = multiprocessing.get_context("spawn")
+    inboxes = [context.Queue() for _ in range(workers)]
+    processes = [
+        context.Process(target=run_worker, args=(index, inbox), name=f"bot-worker-{index}")
+        for index, inbox in enumerate(inboxes)
+    ]
+    for process in processes:
+        process.start()
+
+    server = HTTPServer(("0.0.0.0", port), WebhookHandler)
+    server.inboxes = inboxes
+    server.secret = secret
+    set_webhook(BOT_TOKEN, url, secret)
+    logger.info("Webhook front on port %d feeding %d workers", port, workers)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for inbox in inboxes:
+            inbox.put(None)
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+In-process event bus for order and topup lifecycle changes.
+
+A handler commits its change to the store, publishes an event and
+replies. Everything that merely reacts to the change (admin and group
+notices, the user's status message, fulfillment) subscribes to the event
+type and runs in the background, each subscriber in its own task, so the
+handler's latency ends at the storage commit. A failing subscriber is
+logged and does not affect the others.
+
+Events carry the records as committed; subscribers must not write them
+back to the store.
+"""
+import asyncio, logging
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class OrderCreated:
+    user_id: str
+    user_name: str
+    orders: tuple
+    admin_ids: tuple
+    # Set for cart orders, which share one admin card
+    batch_id: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class OrderConfirmed:
+    user_id: str
+    user_name: str
+    order: dict
+    admin_id: str
+    admin_name: str
+    admin_ids: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class OrderCancelled:
+    user_id: str
+    user_name: str
+    order: dict
+    # None when no admin acted (the order expired)
+    admin_id: str | None
+    admin_name: str
+    admin_ids: tuple
+    refund: int
+    expired: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class StockAlert:
+    sku: str
+    # inventory.LOW or inventory.DEPLETED
+    kind: str
+    units: int
+    admin_ids: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class TopupSubmitted:
+    user_id: str
+    user_name: str
+    topup: dict
+    # Where the screenshot was sent, so it can be forwarded to the admin
+    chat_id: int
+    message_id: int
+    # Earlier receipts the screenshot matched, from ReceiptIndex.find
+    duplicates: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class TopupApproved:
+    user_id: str
+    amount: int
+    balance: int
+    admin_id: str
+
+
+@dataclass(frozen=True, slots=True)
+class BalanceDeducted:
+    user_id: str
+    amount: int
+    balance: int
+    admin_id: str
+
+
+class EventBus:
+    def __init__(self):
+        self.subscribers = {}
+        self.tasks = set()
+
+    def subscribe(self, event_type):
+        """Decorator: call the coroutine function with (event, *args) for each event_type published"""
+        def register(handler):
+            self.subscribers.setdefault(event_type, []).append(handler)
+            return handler
+        return register
+
+    def publish(self, event, *args):
+        """Start every subscriber of the event in the background; returns at once"""
+        for handler in self.subscribers.get(type(event), ()):
+            task = asyncio.create_task(self._run(handler, event, args))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, handler, event, args):
+        try:
+            await handler(event, *args)
+        except Exception as e:
+            logger.error("%s failed on %s", handler.__name__, type(event).__name__, exc_info=e)
+
+    async def drain(self):
+        """Wait for subscribers still running, e.g. before shutdown"""
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks))
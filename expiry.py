@@ -0,0 +1,107 @@
+"""
+Expiry of orders and topups left pending for too long.
+
+PendingIndex keeps one min-heap per kind, ordered by creation time, so
+each expiry run only looks at the items that are actually due instead of
+scanning every user. Entries are removed lazily: an item confirmed or
+approved in the meantime is simply dropped when it reaches the top.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+import ledger
+from records import OrderStatus, TopupStatus
+
+ORDER = "order"
+TOPUP = "topup"
+
+
+class PendingIndex:
+    def __init__(self):
+        self.heaps = {ORDER: [], TOPUP: []}
+
+    def __len__(self):
+        return sum(len(heap) for heap in self.heaps.values())
+
+    def add_order(self, user_id, order):
+        heapq.heappush(self.heaps[ORDER], (order["timestamp"], user_id, order["order_id"]))
+
+    def add_topup(self, user_id, topup):
+        # Topups have no ID; their timestamp is unique per user
+        heapq.heappush(self.heaps[TOPUP], (topup["timestamp"], user_id, topup["timestamp"]))
+
+    def rebuild(self, data):
+        """Index every pending order and topup in one pass over the store"""
+        self.heaps = {ORDER: [], TOPUP: []}
+        for uid, user_data in data["users"].items():
+            for order in user_data.get("orders", []):
+                if order.get("status") == OrderStatus.PENDING:
+                    self.heaps[ORDER].append((order["timestamp"], uid, order["order_id"]))
+            for topup in user_data.get("topups", []):
+                if topup.get("status") == TopupStatus.PENDING:
+                    self.heaps[TOPUP].append((topup["timestamp"], uid, topup["timestamp"]))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+
+    def has_due(self, now, order_ttl, topup_ttl):
+        """Whether expire_due() would find anything to look at"""
+        cutoffs = {ORDER: _cutoff(now, order_ttl), TOPUP: _cutoff(now, topup_ttl)}
+        return any(heap and heap[0][0] < cutoffs[kind] for kind, heap in self.heaps.items())
+
+    def pop_due(self, kind, cutoff, limit):
+        """Pop up to limit entries created before cutoff (an ISO timestamp)"""
+        heap = self.heaps[kind]
+        due = []
+        while heap and len(due) < limit and heap[0][0] < cutoff:
+            due.append(heapq.heappop(heap))
+        return due
+
+
+def _cutoff(now, ttl):
+    return (now - timedelta(seconds=ttl)).isoformat()
+
+
+def expire_due(index, data, now, order_ttl, topup_ttl, batch_size):
+    """
+    Expire due items in data (the caller saves). Pending orders are
+    refunded. Returns (expired_orders, expired_topups) as lists of
+    (user_id, record).
+    """
+    expired_orders = []
+    expired_topups = []
+
+    order_cutoff = _cutoff(now, order_ttl)
+    for _, uid, order_id in index.pop_due(ORDER, order_cutoff, batch_size):
+        orders = data["users"].get(uid, {}).get("orders", [])
+        order = next((o for o in reversed(orders) if o["order_id"] == order_id), None)
+        if not order or order.get("status") != OrderStatus.PENDING:
+            continue
+        order["status"] = OrderStatus.EXPIRED.value
+        order["rev"] = order.get("rev", 0) + 1
+        order["expired_at"] = now.isoformat()
+        ledger.post(data, uid, ledger.KIND_REFUND, order["price"], ref=order_id)
+        expired_orders.append((uid, order))
+
+    topup_cutoff = _cutoff(now, topup_ttl)
+    for _, uid, timestamp in index.pop_due(TOPUP, topup_cutoff, batch_size):
+        user_data = data["users"].get(uid, {})
+        for topup in user_data.get("topups", []):
+            if topup.get("timestamp") == timestamp and topup.get("status") == TopupStatus.PENDING:
+                topup["status"] = TopupStatus.EXPIRED.value
+                topup["expired_at"] = now.isoformat()
+                expired_topups.append((uid, topup))
+                break
+
+    return expired_orders, expired_topups
+
+
+def expire_waiting_screenshots(pending_topups, now, topup_ttl):
+    """Drop /topup requests whose screenshot never arrived; returns their user IDs"""
+    cutoff = now - timedelta(seconds=topup_ttl)
+    stale = [
+        uid for uid, pending in pending_topups.items()
+        if datetime.fromisoformat(pending["timestamp"]) < cutoff
+    ]
+    for uid in stale:
+        del pending_topups[uid]
+    return stale
@@ -0,0 +1,141 @@
+"""
+Streaming export of orders, topups and balances for accounting.
+
+Rows are produced by generators and written one at a time, so the
+output never has to be built up in memory.
+
+Usage:
+    python export.py orders --format csv --from 2025-09-01 --to 2025-09-30
+    python export.py topups --status approved --format jsonl -o topups.jsonl
+    python export.py balances
+"""
+import argparse, csv, json, sys
+from datetime import datetime, timedelta
+
+from records import OrderStatus, TopupStatus
+from storage import load_data
+
+EXPORT_KINDS = ("orders", "topups", "balances")
+EXPORT_FORMATS = ("csv", "jsonl")
+
+ORDER_FIELDS = [
+    "order_id", "user_id", "game_id", "server_id", "amount", "price", "status",
+    "timestamp", "chat_id", "confirmed_by", "confirmed_at", "cancelled_by", "cancelled_at"
+]
+TOPUP_FIELDS = ["user_id", "amount", "status", "timestamp", "approved_at"]
+BALANCE_FIELDS = ["user_id", "name", "username", "balance"]
+
+FIELDS = {"orders": ORDER_FIELDS, "topups": TOPUP_FIELDS, "balances": BALANCE_FIELDS}
+# Statuses each kind can be filtered by; balances have none
+STATUSES = {"orders": tuple(OrderStatus), "topups": tuple(TopupStatus), "balances": ()}
+
+
+def parse_date(value, end=False):
+    """Parse YYYY-MM-DD; an end date is inclusive, so it moves to the next midnight"""
+    if not value:
+        return None
+    day = datetime.strptime(value, "%Y-%m-%d")
+    return day + timedelta(days=1) if end else day
+
+
+def in_range(timestamp, start, end):
+    if start is None and end is None:
+        return True
+    if not timestamp:
+        return False
+    at = datetime.fromisoformat(timestamp)
+    if start is not None and at < start:
+        return False
+    if end is not None and at >= end:
+        return False
+    return True
+
+
+def iter_orders(data, start=None, end=None, status=None):
+    for uid, user_data in data["users"].items():
+        for order in user_data.get("orders", []):
+            if status and order.get("status") != status:
+                continue
+            if not in_range(order.get("timestamp"), start, end):
+                continue
+            row = {field: order.get(field, "") for field in ORDER_FIELDS}
+            row["user_id"] = order.get("user_id", uid)
+            yield row
+
+
+def iter_topups(data, start=None, end=None, status=None):
+    for uid, user_data in data["users"].items():
+        for topup in user_data.get("topups", []):
+            if status and topup.get("status") != status:
+                continue
+            if not in_range(topup.get("timestamp"), start, end):
+                continue
+            row = {field: topup.get(field, "") for field in TOPUP_FIELDS}
+            row["user_id"] = uid
+            yield row
+
+
+def iter_balances(data, start=None, end=None, status=None):
+    for uid, user_data in data["users"].items():
+        yield {
+            "user_id": uid,
+            "name": user_data.get("name", ""),
+            "username": user_data.get("username", ""),
+            "balance": user_data.get("balance", 0),
+        }
+
+
+ITERATORS = {"orders": iter_orders, "topups": iter_topups, "balances": iter_balances}
+
+
+def iter_rows(data, kind, start=None, end=None, status=None):
+    return ITERATORS[kind](data, start, end, status)
+
+
+def write_rows(rows, fields, out, fmt):
+    """Stream rows into a text file object; returns the number of rows written"""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+    return count
+
+
+def export(kind, out, fmt="csv", start=None, end=None, status=None, data=None):
+    if data is None:
+        data = load_data()
+    rows = iter_rows(data, kind, start, end, status)
+    return write_rows(rows, FIELDS[kind], out, fmt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export orders, topups or balances")
+    parser.add_argument("kind", choices=EXPORT_KINDS)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--from", dest="start", help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", help="last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--status", help="only rows with this status")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    start = parse_date(args.start)
+    end = parse_date(args.end, end=True)
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            count = export(args.kind, out, args.format, start, end, args.status)
+    else:
+        count = export(args.kind, sys.stdout, args.format, start, end, args.status)
+    print(f"{count} rows exported", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
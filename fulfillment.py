@@ -0,0 +1,228 @@
+"""
+Supplier fulfillment for confirmed orders.
+
+Confirmed order IDs go onto a queue served by a pool of asyncio workers.
+Each worker moves the order to "processing", asks the provider to
+deliver it (retrying with exponential backoff) and records "delivered"
+or "failed". The order ID is the idempotency key, so a retried or
+re-queued order is never delivered twice by a well-behaved provider.
+
+A failed order, or one stalled in "processing" (left there by a run
+that died, or by a run that had no pool), waits for an admin: reopen()
+puts it back to "confirmed" for another delivery run, or the bot refunds
+it.
+"""
+import asyncio, importlib, logging, os
+from datetime import datetime, timedelta
+
+from records import OrderStatus
+from storage import data_transaction, find_order, load_data
+
+logger = logging.getLogger(__name__)
+
+STATUS_CONFIRMED = OrderStatus.CONFIRMED.value
+STATUS_PROCESSING = OrderStatus.PROCESSING.value
+STATUS_DELIVERED = OrderStatus.DELIVERED.value
+STATUS_FAILED = OrderStatus.FAILED.value
+
+# A delivery run takes seconds; an order processing for longer has stalled
+STALLED_AFTER = timedelta(hours=1)
+
+
+class FulfillmentError(Exception):
+    """Raised by a provider when a delivery attempt fails; logged without a traceback"""
+
+
+class FulfillmentProvider:
+    """Interface for supplier integrations"""
+
+    async def deliver(self, order, idempotency_key):
+        """Deliver an order and return the supplier's reference for it"""
+        raise NotImplementedError
+
+
+class FakeProvider(FulfillmentProvider):
+    """
+    Local stand-in for a supplier. Deliveries are kept in memory by
+    idempotency key; fail_times makes the first N attempts per order fail.
+    """
+
+    def __init__(self, fail_times=0, delay=0.0):
+        self.fail_times = fail_times
+        self.delay = delay
+        self.attempts = {}
+        self.delivered = {}
+
+    async def deliver(self, order, idempotency_key):
+        if idempotency_key in self.delivered:
+            return self.delivered[idempotency_key]
+        self.attempts[idempotency_key] = self.attempts.get(idempotency_key, 0) + 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.attempts[idempotency_key] <= self.fail_times:
+            raise FulfillmentError("fake provider failure")
+        reference = f"FAKE-{order['order_id']}"
+        self.delivered[idempotency_key] = reference
+        return reference
+
+
+PROVIDERS = {"fake": FakeProvider}
+
+
+def mark_for_fulfillment(order):
+    """
+    Tag a confirmed order with its idempotency key. Only tagged orders are
+    picked up, so orders confirmed before the pool existed (and delivered
+    by hand) are never sent to the supplier.
+    """
+    order["fulfillment_key"] = f"order-{order['order_id']}"
+
+
+def is_resolvable(order, now):
+    """Whether an admin may retry or refund the order: it failed, or it stalled in processing"""
+    status = order.get("status")
+    if status == STATUS_FAILED:
+        return True
+    if status != STATUS_PROCESSING:
+        return False
+    started = order.get("processing_at")
+    return not started or now - datetime.fromisoformat(started) > STALLED_AFTER
+
+
+def reopen(data, order_id, now):
+    """
+    Inside a data_transaction(), move a failed or stalled order back to
+    confirmed and tag it for the pool. Returns (user_id, order, applied)
+    like storage.transition_order().
+    """
+    uid, order = find_order(data, order_id)
+    if order is None or not is_resolvable(order, now):
+        return uid, order, False
+    order["status"] = STATUS_CONFIRMED
+    order["rev"] = order.get("rev", 0) + 1
+    order.pop("failed_at", None)
+    order["retries"] = order.get("retries", 0) + 1
+    mark_for_fulfillment(order)
+    return uid, order, True
+
+
+def load_provider(name):
+    """Build a provider from a registered name or a 'module:Class' path"""
+    if name in PROVIDERS:
+        return PROVIDERS[name]()
+    module_name, _, class_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class FulfillmentPool:
+    def __init__(self, provider, notify=None, workers=4, max_attempts=5, base_delay=2.0):
+        self.provider = provider
+        self.notify = notify
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.queue = asyncio.Queue()
+        self.queued = set()
+        self.tasks = []
+
+    async def start(self, recover=True):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if not recover:
+            return
+        # Pick up orders left confirmed or half-processed by a previous run
+        data = load_data()
+        for user_data in data["users"].values():
+            for order in user_data.get("orders", []):
+                if order.get("status") in (STATUS_CONFIRMED, STATUS_PROCESSING) and order.get("fulfillment_key"):
+                    self.submit(order["order_id"])
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def submit(self, order_id):
+        if order_id in self.queued:
+            return
+        self.queued.add(order_id)
+        self.queue.put_nowait(order_id)
+
+    async def join(self):
+        await self.queue.join()
+
+    async def _worker(self):
+        while True:
+            order_id = await self.queue.get()
+            try:
+                await self._process(order_id)
+            except Exception:
+                logger.exception("Fulfillment of %s crashed", order_id)
+            finally:
+                self.queued.discard(order_id)
+                self.queue.task_done()
+
+    def _transition(self, order_id, allowed, status, **fields):
+        """Move an order to status if it is currently in allowed; returns the order or None"""
+        with data_transaction() as data:
+            _, order = find_order(data, order_id)
+            if not order or order.get("status") not in allowed or not order.get("fulfillment_key"):
+                return None
+            order["status"] = status
+            order["rev"] = order.get("rev", 0) + 1
+            order.update(fields)
+            return dict(order)
+
+    async def _process(self, order_id):
+        order = self._transition(
+            order_id, (STATUS_CONFIRMED, STATUS_PROCESSING), STATUS_PROCESSING,
+            processing_at=datetime.now().isoformat(),
+        )
+        if not order:
+            return
+        await self._notify(order)
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                reference = await self.provider.deliver(order, order["fulfillment_key"])
+            except Exception as e:
+                # Anything else (a network error, a provider bug) is retried the same
+                # way, so the order still ends up delivered or failed, never stuck
+                logger.warning(
+                    "Delivery of %s failed (attempt %d): %s", order_id, attempt, e,
+                    exc_info=not isinstance(e, FulfillmentError),
+                )
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(self.base_delay * 2 ** (attempt - 1))
+                continue
+            order = self._transition(
+                order_id, (STATUS_PROCESSING,), STATUS_DELIVERED,
+                delivered_at=datetime.now().isoformat(), supplier_ref=reference,
+            )
+            if order:
+                await self._notify(order)
+            return
+
+        order = self._transition(
+            order_id, (STATUS_PROCESSING,), STATUS_FAILED,
+            failed_at=datetime.now().isoformat(),
+        )
+        if order:
+            await self._notify(order)
+
+    async def _notify(self, order):
+        if not self.notify:
+            return
+        try:
+            await self.notify(order)
+        except Exception:
+            logger.exception("Fulfillment notification for %s failed", order["order_id"])
+
+
+def pool_from_env(notify=None):
+    """Build a pool from FULFILLMENT_PROVIDER / FULFILLMENT_WORKERS, or None when unset"""
+    provider_name = os.getenv("FULFILLMENT_PROVIDER")
+    if not provider_name:
+        return None
+    workers = int(os.getenv("FULFILLMENT_WORKERS", "4"))
+    return FulfillmentPool(load_provider(provider_name), notify=notify, workers=workers)
@@ -0,0 +1,140 @@
+"""
+Stock and supplier cost per SKU, kept in the data store under
+data["inventory"]:
+
+    {"86": {"stock": 120, "cost": 4600, "low": 10},
+     "wp1": {"balance": 500000, "cost": 5600, "low": 5, "maintenance": true}}
+
+"stock" counts codes on hand. "balance" is money left with a supplier
+that sells the SKU at "cost" per unit, so it covers balance // cost
+units. An SKU with neither is not tracked and never runs out; "cost"
+alone still feeds margins.
+
+consume() runs in the transaction that confirms an order: it takes one
+unit, copies the unit cost onto the order (stats uses it for margins,
+and it survives rebuild_stats) and reports crossing the "low" threshold.
+A depleted SKU is switched to maintenance, which stops new orders for it
+until it is restocked. Confirming is never refused here; an admin may
+confirm an order the stock no longer covers, which shows as negative
+stock.
+"""
+
+LOW = "low"
+DEPLETED = "depleted"
+
+UPDATE_FIELDS = ("stock", "balance", "add", "cost", "low", "maintenance")
+
+
+def available(entry):
+    """Units left for an inventory entry, or None if it isn't tracked"""
+    if "stock" in entry:
+        return entry["stock"]
+    if "balance" in entry and entry.get("cost"):
+        return entry["balance"] // entry["cost"]
+    return None
+
+
+def get_entry(data, sku):
+    return data.get("inventory", {}).get(sku)
+
+
+def is_paused(data, sku):
+    """Whether new orders for the SKU are stopped"""
+    entry = get_entry(data, sku)
+    return bool(entry and entry.get("maintenance"))
+
+
+def paused_skus(data):
+    return {sku for sku, entry in data.get("inventory", {}).items() if entry.get("maintenance")}
+
+
+def in_stock(data, sku):
+    entry = get_entry(data, sku)
+    units = available(entry) if entry else None
+    return units is None or units > 0
+
+
+def consume(data, order):
+    """Take one unit of the order's SKU; returns LOW or DEPLETED when this crosses that line, else None"""
+    entry = get_entry(data, order.get("amount"))
+    if not entry:
+        return None
+    if entry.get("cost") is not None:
+        order["cost"] = entry["cost"]
+    before = available(entry)
+    if before is None:
+        return None
+    if "stock" in entry:
+        entry["stock"] -= 1
+    else:
+        entry["balance"] -= entry["cost"]
+    after = available(entry)
+    if after <= 0:
+        entry["maintenance"] = True
+        return DEPLETED if before > 0 else None
+    if after <= entry.get("low", 0) < before:
+        return LOW
+    return None
+
+
+def parse_update(tokens):
+    """Build an update from `key=value` tokens; raises ValueError on bad input"""
+    update = {}
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        if not sep or key not in UPDATE_FIELDS:
+            raise ValueError(f"unknown inventory field: {token}")
+        if key == "maintenance":
+            if value not in ("on", "off"):
+                raise ValueError(f"maintenance must be on or off: {value}")
+            update[key] = value == "on"
+            continue
+        update[key] = int(value)
+        if key != "add" and update[key] < 0:
+            raise ValueError(f"{key} must not be negative: {value}")
+    if "stock" in update and "balance" in update:
+        raise ValueError("use either stock or balance")
+    if not update:
+        raise ValueError("nothing to change")
+    return update
+
+
+def apply_update(data, sku, update):
+    """Apply a parse_update() result; restocking a paused SKU resumes it unless maintenance is given"""
+    entry = data.setdefault("inventory", {}).setdefault(sku, {})
+    for key in ("stock", "balance"):
+        if key in update:
+            entry.pop("balance" if key == "stock" else "stock", None)
+            entry[key] = update[key]
+    if "add" in update:
+        key = "balance" if "balance" in entry else "stock"
+        entry[key] = entry.get(key, 0) + update["add"]
+    for key in ("cost", "low"):
+        if key in update:
+            entry[key] = update[key]
+
+    if "maintenance" in update:
+        entry["maintenance"] = update["maintenance"]
+    elif entry.get("maintenance") and (available(entry) or 0) > 0:
+        entry["maintenance"] = False
+    if entry.get("maintenance") is False:
+        del entry["maintenance"]
+    return entry
+
+
+def describe(entry):
+    parts = []
+    units = available(entry)
+    if "stock" in entry:
+        parts.append(f"stock={entry['stock']:,}")
+    elif "balance" in entry:
+        parts.append(f"balance={entry['balance']:,} ({units if units is not None else '?'} units)")
+    if "cost" in entry:
+        parts.append(f"cost={entry['cost']:,}")
+    if "low" in entry:
+        parts.append(f"low={entry['low']}")
+    if entry.get("maintenance"):
+        parts.append("⛔ maintenance")
+    elif units is not None and units <= entry.get("low", 0):
+        parts.append("⚠️ low")
+    return " ".join(parts) or "(not tracked)"
@@ -0,0 +1,164 @@
+"""
+Structured logging: JSON lines written off the event loop, with sampling.
+
+setup() puts a QueueHandler on the root logger, so a log call only
+enqueues the record; a QueueListener thread formats it and does the file
+or console I/O. Each line is one JSON object, and values passed with
+extra= become fields of it:
+
+    {"ts": "2025-09-02T14:03:11.204", "level": "INFO", "logger": "jsonlog",
+     "msg": "update handled", "update_id": 81234, "user_id": 42,
+     "handler": "mmb_command", "latency_ms": 12.4, "outcome": "ok"}
+
+A record logged with extra={"sample": name} is kept at the rate set for
+that name in LOG_SAMPLE, e.g. "update=0.1,broadcast=0.2" (unlisted names
+are kept); WARNING and above are never dropped.
+
+Environment: LOG_FORMAT (json or text, default json), LOG_FILE (default
+stderr), LOG_LEVEL (default INFO), LOG_SAMPLE.
+"""
+import atexit, copy, functools, json, logging, logging.handlers, os, queue, random, time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Attributes every LogRecord has; anything else came from extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        name = getattr(record, "sample", None)
+        if name is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rates.get(name, 1.0)
+
+
+class _LabelFilter(logging.Filter):
+    def __init__(self, label):
+        super().__init__()
+        self.label = label
+
+    def filter(self, record):
+        record.proc = self.label
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The stock prepare() bakes the formatted line into msg; keep the fields
+        # and only render what can't cross to the listener thread as is
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_rates(text):
+    """{"update": 0.1} from "update=0.1"; raises ValueError on bad input"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, sep, rate = item.partition("=")
+        if not sep or not 0 <= float(rate) <= 1:
+            raise ValueError(f"bad LOG_SAMPLE entry: {item}")
+        rates[name] = float(rate)
+    return rates
+
+
+def setup(label=None):
+    """Route all logging through the queue; label (e.g. "worker 2") tags every line"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_file = os.getenv("LOG_FILE")
+    target = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json") == "text":
+        prefix = f"[{label}] " if label else ""
+        target.setFormatter(logging.Formatter(f"%(asctime)s {prefix}%(levelname)s %(name)s: %(message)s"))
+    else:
+        target.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(SamplingFilter(parse_rates(os.getenv("LOG_SAMPLE", ""))))
+    if label:
+        handler.addFilter(_LabelFilter(label))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    _listener = logging.handlers.QueueListener(records, target)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def _timed(callback):
+    name = getattr(callback, "__name__", repr(callback))
+
+    @functools.wraps(callback)
+    async def timed(update, context):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            # ApplicationHandlerStop is flow control, not a failure
+            outcome = "stop" if type(e).__name__ == "ApplicationHandlerStop" else "error"
+            raise
+        finally:
+            user = getattr(update, "effective_user", None)
+            logger.log(
+                logging.ERROR if outcome == "error" else logging.INFO,
+                "update handled",
+                extra={
+                    "update_id": getattr(update, "update_id", None),
+                    "user_id": user.id if user else None,
+                    "handler": name,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "outcome": outcome,
+                    "sample": "update",
+                },
+            )
+
+    return timed
+
+
+def log_handler_calls(application):
+    """Log handler, latency and outcome of every update handler call; run once all handlers are added"""
+    for group, handlers in application.handlers.items():
+        # Negative groups hold pre-dispatch hooks (e.g. a TypeHandler that sees
+        # every update); logging them too would log each update twice
+        if group < 0:
+            continue
+        for handler in handlers:
+            handler.callback = _timed(handler.callback)
@@ -0,0 +1,107 @@
+"""
+Double-entry style balance ledger kept in the data store.
+
+Every balance change goes through post(), which appends an immutable
+entry to data["ledger"][user_id] with the running balance after it and
+bumps the per-user sum in data["ledger_totals"]. Stored balances can then
+be reconciled against the ledger without replaying orders and topups.
+"""
+from datetime import datetime
+
+KIND_OPENING = "opening"
+KIND_TOPUP = "topup"
+KIND_ORDER = "order"
+KIND_REFUND = "refund"
+KIND_DEDUCT = "deduct"
+
+
+def _append(data, user_id, kind, amount, balance, ref, timestamp):
+    entries = data.setdefault("ledger", {}).setdefault(user_id, [])
+    entry = {
+        "id": len(entries) + 1,
+        "timestamp": timestamp or datetime.now().isoformat(),
+        "kind": kind,
+        "amount": amount,
+        "balance": balance,
+        "ref": ref,
+    }
+    entries.append(entry)
+    totals = data.setdefault("ledger_totals", {})
+    totals[user_id] = totals.get(user_id, 0) + amount
+    return entry
+
+
+def post(data, user_id, kind, amount, ref=None, timestamp=None):
+    """Apply a signed balance change to a user and record it; returns the entry"""
+    user_data = data["users"][user_id]
+    balance = user_data.get("balance", 0)
+
+    # Balances that predate the ledger get an opening entry so the sums line up
+    if user_id not in data.get("ledger", {}) and balance:
+        _append(data, user_id, KIND_OPENING, balance, balance, None, timestamp)
+
+    user_data["balance"] = balance + amount
+    return _append(data, user_id, kind, amount, user_data["balance"], ref, timestamp)
+
+
+def entries_between(data, user_id, start=None, end=None):
+    """Entries for a user with start <= timestamp < end (datetimes, either may be None)"""
+    for entry in data.get("ledger", {}).get(user_id, []):
+        at = datetime.fromisoformat(entry["timestamp"])
+        if start is not None and at < start:
+            continue
+        if end is not None and at >= end:
+            continue
+        yield entry
+
+
+def balance_before(data, user_id, start):
+    """Running balance just before start, i.e. the statement's opening balance"""
+    balance = 0
+    if start is None:
+        return balance
+    for entry in data.get("ledger", {}).get(user_id, []):
+        if datetime.fromisoformat(entry["timestamp"]) >= start:
+            break
+        balance = entry["balance"]
+    return balance
+
+
+def check(data, deep=False):
+    """
+    Compare stored balances with the ledger.
+
+    Returns (mismatches, untracked): mismatches is a list of
+    (user_id, stored_balance, ledger_balance); untracked lists users with a
+    non-zero balance but no ledger yet. The fast check uses the indexed
+    per-user sums; deep=True also re-adds every entry and checks the
+    running balances.
+    """
+    ledger = data.get("ledger", {})
+    totals = data.get("ledger_totals", {})
+    mismatches = []
+    untracked = []
+
+    for user_id, user_data in data["users"].items():
+        stored = user_data.get("balance", 0)
+        if user_id not in ledger:
+            if stored:
+                untracked.append(user_id)
+            continue
+
+        expected = totals.get(user_id, 0)
+        if deep:
+            running = 0
+            broken = False
+            for entry in ledger[user_id]:
+                running += entry["amount"]
+                if entry["balance"] != running:
+                    broken = True
+            if broken or running != expected:
+                mismatches.append((user_id, stored, running))
+                continue
+
+        if stored != expected:
+            mismatches.append((user_id, stored, expected))
+
+    return mismatches, untracked
@@ -1,8 +1,20 @@
-import json, os, asyncio
+import time
+PROCESS_STARTED = time.perf_counter()
+
+import logging, os, asyncio, functools, secrets
+from collections import OrderedDict
 from datetime import datetime
 from telegram import Update, Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes, CallbackQueryHandler
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ChatMember
+from storage import load_data, load_user, data_stamp, data_transaction, find_order, transition_order, StoreDict
+import autoreply, events, expiry, fulfillment, inventory, jsonlog, ledger, messages, ocr, pricing, receipts, records, rules, stats
+from records import Order, OrderStatus, Topup, TopupStatus
+# export (and tempfile) are imported inside the few commands that use them
+
+IMPORTS_DONE = time.perf_counter()
+
+logger = logging.getLogger(__name__)
 
 
 # Load environment variables from .env file
@@ -19,31 +31,232 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 # Hard-coded admin IDs (override environment variables)
 ADMIN_ID = 6437656033
 ADMIN_GROUP_ID = -1002747496932
-DATA_FILE = "data.json"
 
 # Authorized users - only these users can use the bot
 AUTHORIZED_USERS = set()
 
+# Set in every worker process when several bot processes share one store (see cluster.py)
+SHARED_STATE = os.getenv("BOT_SHARED_STATE") == "1"
+WORKER_INDEX = int(os.getenv("BOT_WORKER_INDEX", "0"))
+
+def shared_state(key, defaults=None):
+    """Runtime state dict: in memory for a single process, in the shared state file when shared"""
+    if SHARED_STATE:
+        return StoreDict(key, defaults)
+    return dict(defaults or {})
+
+def state_items(state):
+    """Every item of a shared_state() dict, read with one query when shared"""
+    return state.snapshot() if isinstance(state, StoreDict) else dict(state)
+
 # User states for restricting actions after screenshot
-user_states = {}
+user_states = shared_state("user_states")
 
 # Bot maintenance mode
-bot_maintenance = {
+bot_maintenance = shared_state("maintenance", {
     "orders": True,    # True = enabled, False = disabled
     "topups": True,    # True = enabled, False = disabled
     "general": True    # True = enabled, False = disabled
-}
+})
 
 # Payment information
-payment_info = {
+payment_info = shared_state("payment_info", {
     "kpay_number": "09678786528",
     "kpay_name": "Ma May Phoo Wai",
     "kpay_image": None,  # Store file_id of KPay QR code image
     "wave_number": "09673585480",
     "wave_name": "Nine Nine",
     "wave_image": None   # Store file_id of Wave QR code image
+})
+
+# Pending orders/topups by creation time, for the expiry job
+pending_index = expiry.PendingIndex()
+ORDER_EXPIRY_HOURS = float(os.getenv("ORDER_EXPIRY_HOURS", "24"))
+TOPUP_EXPIRY_HOURS = float(os.getenv("TOPUP_EXPIRY_HOURS", "24"))
+EXPIRY_BATCH_SIZE = 200
+EXPIRY_INTERVAL = 60
+
+async def expire_pending_job(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback: expire and refund stale pending orders, expire stale topups"""
+    now = datetime.now()
+    order_ttl = ORDER_EXPIRY_HOURS * 3600
+    topup_ttl = TOPUP_EXPIRY_HOURS * 3600
+
+    expiry.expire_waiting_screenshots(pending_topups, now, topup_ttl)
+
+    # Most runs find nothing due; don't lock and rewrite the store for them
+    if not pending_index.has_due(now, order_ttl, topup_ttl):
+        return
+
+    with data_transaction() as data:
+        expired_orders, expired_topups = expiry.expire_due(
+            pending_index, data, now, order_ttl, topup_ttl, EXPIRY_BATCH_SIZE
+        )
+        names = {uid: data["users"][uid].get("name", "Unknown") for uid, _ in expired_orders}
+        admin_list = data.get("admin_ids", [ADMIN_ID])
+
+    if not expired_orders and not expired_topups:
+        return
+
+    # The user's notice and the admin cards come from the OrderCancelled subscribers
+    for uid, order in expired_orders:
+        event_bus.publish(events.OrderCancelled(
+            uid, names[uid], order, None, "Expiry", tuple(admin_list), order["price"], expired=True
+        ), context.bot)
+
+    messages = []
+    for uid, topup in expired_topups:
+        # An expired topup no longer blocks the user
+        user_states.pop(uid, None)
+        messages.append((
+            int(uid),
+            f"⌛ **Topup သက်တမ်းကုန်သွားပါပြီ!**\n\n"
+            f"💰 ပမာဏ: `{topup['amount']:,} MMK`\n\n"
+            "📞 ငွေလွှဲပြီးသားဆိုရင် admin ကို ဆက်သွယ်ပါ။"
+        ))
+    await send_many(context.bot, messages)
+
+    await send_many(context.bot, [(
+        ADMIN_ID,
+        f"⌛ **Expiry**\n\n"
+        f"📦 Orders expired (refunded): {len(expired_orders)}\n"
+        f"💳 Topups expired: {len(expired_topups)}"
+    )])
+
+# Perceptual hashes of every submitted payment screenshot
+receipt_index = receipts.ReceiptIndex()
+
+async def download_photo(bot, photo):
+    try:
+        photo_file = await bot.get_file(photo.file_id)
+        return bytes(await photo_file.download_as_bytearray())
+    except Exception as e:
+        logger.warning("screenshot download failed", extra={"file_id": photo.file_id, "error": str(e)})
+        return None
+
+async def hash_receipt(bot, photo_sizes):
+    """Download the smallest usable size of a photo and hash it off the event loop"""
+    image_bytes = await download_photo(bot, receipts.pick_photo_size(photo_sizes))
+    if image_bytes is None:
+        return None
+    return await asyncio.to_thread(receipts.hash_image, image_bytes)
+
+async def scan_receipt(bot, photo_sizes):
+    """OCR the full-size screenshot in the process pool; None when OCR is off, fails or is too slow"""
+    if not ocr.is_enabled():
+        return None
+    try:
+        async with asyncio.timeout(ocr.OCR_TIMEOUT), ocr.scan_slots:
+            image_bytes = await download_photo(bot, max(photo_sizes, key=lambda p: p.width * p.height))
+            if image_bytes is None:
+                return None
+            return await ocr.scan(image_bytes)
+    except TimeoutError:
+        logger.warning("screenshot OCR timed out; sending the topup without it", extra={"timeout_s": ocr.OCR_TIMEOUT})
+        return None
+    except Exception as e:
+        logger.warning("screenshot OCR failed", extra={"error": str(e)})
+        return None
+
+OCR_VERDICT_TEXT = {
+    ocr.MATCH: "✅ OCR: ပမာဏ ကိုက်ညီပါသည်",
+    ocr.MISMATCH: "❌ OCR: ပမာဏ မကိုက်ညီပါ!",
+    ocr.UNKNOWN: "❔ OCR: ပမာဏ ဖတ်မရပါ",
+}
+
+def describe_ocr_receipt(receipt, expected_amount):
+    lines = [OCR_VERDICT_TEXT[ocr.verdict(receipt, expected_amount)]]
+    if receipt.get("amount") is not None:
+        lines.append(f"💵 Screenshot amount: `{receipt['amount']:,} MMK`")
+    if receipt.get("transaction_id"):
+        lines.append(f"🧾 Transaction ID: `{receipt['transaction_id']}`")
+    if receipt.get("timestamp"):
+        lines.append(f"🕒 Transfer time: {receipt['timestamp']}")
+    return "\n".join(lines)
+
+def describe_duplicate_receipts(matches):
+    lines = ["⚠️ **Screenshot ထပ်နေပါသည်!**"]
+    for distance, uid, timestamp, amount in matches[:3]:
+        when = timestamp[:16].replace("T", " ") if timestamp else "?"
+        amount_text = f"{amount:,} MMK" if amount is not None else "?"
+        lines.append(f"• User `{uid}` - {amount_text} - {when} (diff {distance})")
+    return "\n".join(lines)
+
+# Supplier fulfillment pool, started on boot when FULFILLMENT_PROVIDER is set
+fulfillment_pool = None
+
+# Lifecycle events; notifications and fulfillment subscribe further down
+event_bus = events.EventBus()
+
+FULFILLMENT_STATUS_TEXT = {
+    fulfillment.STATUS_PROCESSING: "🔄 Diamonds ပို့နေပါသည်",
+    fulfillment.STATUS_DELIVERED: "💎 Diamonds ပို့ပြီးပါပြီ",
+    fulfillment.STATUS_FAILED: "⚠️ ပို့၍ မရပါ - Admin စစ်ဆေးပေးပါမယ်",
 }
 
+async def notify_fulfillment(bot, order):
+    """Push a fulfillment status change back to the chat the order came from"""
+    await bot.send_message(
+        chat_id=order.get("chat_id", int(order["user_id"])),
+        text=f"📦 **Order Update**\n\n"
+             f"📝 Order ID: `{order['order_id']}`\n"
+             f"🎮 Game ID: `{order['game_id']}`\n"
+             f"💎 Amount: {order['amount']}\n"
+             f"📊 Status: {FULFILLMENT_STATUS_TEXT[order['status']]}",
+        parse_mode="Markdown"
+    )
+    if order["status"] == fulfillment.STATUS_FAILED:
+        await bot.send_message(
+            chat_id=ADMIN_ID,
+            text=f"⚠️ **Fulfillment Failed**\n\n📝 Order ID: `{order['order_id']}`",
+            parse_mode="Markdown"
+        )
+
+def mark_for_fulfillment(order):
+    """Tag a just-confirmed order for the pool; call before the order is saved"""
+    if fulfillment_pool:
+        fulfillment.mark_for_fulfillment(order)
+
+def submit_for_fulfillment(order_id):
+    if fulfillment_pool:
+        fulfillment_pool.submit(order_id)
+
+async def start_fulfillment(application):
+    global fulfillment_pool
+    fulfillment_pool = fulfillment.pool_from_env(functools.partial(notify_fulfillment, application.bot))
+    if fulfillment_pool:
+        # With several workers only the first re-queues orders left over from a previous run
+        await fulfillment_pool.start(recover=WORKER_INDEX == 0)
+
+async def stop_fulfillment(application):
+    if fulfillment_pool:
+        await fulfillment_pool.stop()
+
+async def stop_workers(application):
+    await event_bus.drain()
+    await stop_fulfillment(application)
+    ocr.shutdown_pool()
+
+# Banned/flagged game IDs, loaded from the data file on startup
+BANNED_GAME_IDS = set()
+DEFAULT_BANNED_GAME_IDS = ["123456789"]
+
+# (user_id, game_id, server_id, amount) -> time the order was placed
+recent_orders = OrderedDict()
+DUPLICATE_ORDER_TTL = int(os.getenv("DUPLICATE_ORDER_TTL", "120"))
+RECENT_ORDERS_MAX = 5000
+
+# token -> repeat order waiting for the user to press confirm
+repeat_orders = OrderedDict()
+
+# IDs of order-card button presses already handled, oldest first
+handled_callbacks = OrderedDict()
+HANDLED_CALLBACKS_MAX = 5000
+
+# game_id -> time of the last banned-attempt alert sent to admins
+banned_alerts = {}
+BANNED_ALERT_WINDOW = 10 * 60
+
 def is_user_authorized(user_id):
     """Check if user is authorized to use the bot"""
     return str(user_id) in AUTHORIZED_USERS or int(user_id) == ADMIN_ID
@@ -53,74 +266,57 @@ async def is_bot_admin_in_group(bot, chat_id):
     try:
         bot_member = await bot.get_chat_member(chat_id, bot.id)
         return bot_member.status in [ChatMember.ADMINISTRATOR, ChatMember.OWNER]
-    except Exception:
+    except Exception as e:
+        logger.info("bot admin check failed", extra={"chat_id": chat_id, "error": str(e), "sample": "group"})
         return False
 
 
 
+# Keyword auto-replies, compiled on startup and whenever admins edit them
+auto_reply_matcher = autoreply.compile_rules(autoreply.DEFAULT_RULES)
+AUTO_REPLY_COOLDOWN = int(os.getenv("AUTO_REPLY_COOLDOWN", "60"))
+auto_reply_cooldown = autoreply.Cooldown(AUTO_REPLY_COOLDOWN)
+
+def load_auto_replies(data=None):
+    """Compile the stored auto-reply rules"""
+    global auto_reply_matcher
+    auto_reply_matcher = autoreply.compile_rules(autoreply.get_rules(data or load_data()))
+
 def simple_reply(message_text):
     """
     Simple auto-replies for common queries
     """
-    message_lower = message_text.lower()
-
-    # Greetings
-    if any(word in message_lower for word in ["hello", "hi", "မင်္ဂလာပါ", "ဟယ်လို", "ဟိုင်း", "ကောင်းလား"]):
-        return ("👋 မင်္ဂလာပါ! MLBB Diamond Top-up Bot မှ ကြိုဆိုပါတယ်!\n\n"
-                "📱 Bot commands များ သုံးရန် `/start` နှိပ်ပါ\n"
-                "💡 အကူအညီလိုရင် `/help` နှိပ်ပါ")
-
-    # Help requests
-    elif any(word in message_lower for word in ["help", "ကူညီ", "အကူအညီ", "မသိ", "လမ်းညွှန်"]):
-        return ("📱 **အသုံးပြုနိုင်တဲ့ commands:**\n"
-                "• `/start` - Bot စတင်အသုံးပြုရန်\n"
-                "• `/mmb gameid serverid amount` - Diamond ဝယ်ယူရန်\n"
-                "• `/balance` - လက်ကျန်ငွေ စစ်ရန်\n"
-                "• `/topup amount` - ငွေဖြည့်ရန်\n"
-                "• `/price` - ဈေးနှုန်းများ ကြည့်ရန်\n"
-                "• `/history` - မှတ်တမ်းများ ကြည့်ရန်\n\n"
-                "💡 အသေးစိတ် လိုအပ်ရင် admin ကို ဆက်သွယ်ပါ!")
-
-    # Default response
-    else:
-        return ("📱 **MLBB Diamond Top-up Bot**\n\n"
-                "💎 Diamond ဝယ်ယူရန် `/mmb` command သုံးပါ\n"
-                "💰 ဈေးနှုန်းများ သိရှိရန် `/price` နှိပ်ပါ\n"
-                "🆘 အကူအညီ လိုရင် `/start` နှိပ်ပါ")
-
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "w") as f:
-            json.dump({"users": {}, "prices": {}}, f)
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
-
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
-
-def load_authorized_users():
+    return auto_reply_matcher(message_text) or autoreply.DEFAULT_RESPONSE
+
+async def send_auto_reply(update: Update):
+    """Auto-reply to plain text; group chats get at most one reply per cooldown"""
+    if update.effective_chat.type != "private" and not auto_reply_cooldown.ready(update.effective_chat.id):
+        return
+    reply = simple_reply(update.message.text)
+    try:
+        await update.message.reply_text(reply, parse_mode="Markdown")
+    except Exception:
+        # An admin-written reply with broken Markdown still gets through
+        await update.message.reply_text(reply)
+
+def load_authorized_users(data=None):
     """Load authorized users from data file"""
     global AUTHORIZED_USERS
-    data = load_data()
+    data = data or load_data()
     AUTHORIZED_USERS = set(data.get("authorized_users", []))
 
-def save_authorized_users():
-    """Save authorized users to data file"""
-    data = load_data()
-    data["authorized_users"] = list(AUTHORIZED_USERS)
-    save_data(data)
-
-def load_prices():
-    """Load custom prices from data file"""
-    data = load_data()
-    return data.get("prices", {})
-
-def save_prices(prices):
-    """Save prices to data file"""
-    data = load_data()
-    data["prices"] = prices
-    save_data(data)
+def update_authorized_users(data, add=(), remove=()):
+    """
+    Authorize/unauthorize users in the stored list inside a
+    data_transaction(); returns the IDs that actually changed. Like
+    update_banned_ids, the stored list is the base, not the local set.
+    """
+    authorized = set(data.get("authorized_users", []))
+    changed = (set(add) - authorized) | (set(remove) & authorized)
+    authorized.update(add)
+    authorized.difference_update(remove)
+    data["authorized_users"] = sorted(authorized)
+    return changed
 
 def validate_game_id(game_id):
     """Validate MLBB Game ID (6-10 digits)"""
@@ -138,21 +334,32 @@ def validate_server_id(server_id):
         return False
     return True
 
+def load_banned_ids(data=None):
+    """Load the banned/flagged game ID registry from data file"""
+    global BANNED_GAME_IDS
+    data = data or load_data()
+    BANNED_GAME_IDS = set(data.get("banned_game_ids", DEFAULT_BANNED_GAME_IDS))
+
+def update_banned_ids(data, add=(), remove=()):
+    """
+    Ban/unban game IDs in the stored registry inside a data_transaction();
+    returns the IDs that actually changed. The stored list, not the local
+    set (which other workers may have changed since), is the base.
+    """
+    banned = set(data.get("banned_game_ids", DEFAULT_BANNED_GAME_IDS))
+    changed = (set(add) - banned) | (set(remove) & banned)
+    banned.update(add)
+    banned.difference_update(remove)
+    data["banned_game_ids"] = sorted(banned)
+    return changed
+
 def is_banned_account(game_id):
     """
     Check if MLBB account is banned
-    This is a simple example - in reality you'd need to integrate with MLBB API
-    For now, we'll use some common patterns of banned accounts
+    Looks the ID up in the banned registry (a set, so O(1) per lookup)
+    and rejects a few obviously invalid patterns
     """
-    # Add known banned account IDs here
-    banned_ids = [
-        "123456789",  # Example banned ID
-        "000000000",  # Invalid pattern
-        "111111111",  # Invalid pattern
-    ]
-
-    # Check if game_id matches banned patterns
-    if game_id in banned_ids:
+    if game_id in BANNED_GAME_IDS:
         return True
 
     # Check for suspicious patterns (all same digits, too simple patterns)
@@ -164,27 +371,91 @@ def is_banned_account(game_id):
 
     return False
 
-def get_price(diamonds):
-    # Load custom prices first - these override defaults
-    custom_prices = load_prices()
-    if diamonds in custom_prices:
-        return custom_prices[diamonds]
-
-    # Default prices
-    if diamonds.startswith("wp") and diamonds[2:].isdigit():
-        n = int(diamonds[2:])
-        if 1 <= n <= 10:
-            return n * 6000
-    table = {
-        "11": 950, "22": 1900, "33": 2850, "56": 4200, "112": 8200,
-        "86": 5100, "172": 10200, "257": 15300, "343": 20400,
-        "429": 25500, "514": 30600, "600": 35700, "706": 40800,
-        "878": 51000, "963": 56100, "1049": 61200, "1135": 66300,
-        "1412": 81600, "2195": 122400, "3688": 204000,
-        "5532": 306000, "9288": 510000, "12976": 714000,
-        "55": 3500, "165": 10000, "275": 16000, "565": 33000
-    }
-    return table.get(diamonds)
+def should_alert_banned_attempt(game_id):
+    """Only alert admins once per game ID within BANNED_ALERT_WINDOW seconds"""
+    now = datetime.now().timestamp()
+    last = banned_alerts.get(game_id)
+    if last is not None and now - last < BANNED_ALERT_WINDOW:
+        return False
+    # Forget expired entries so the map stays small
+    if len(banned_alerts) > 1000:
+        for key in [k for k, t in banned_alerts.items() if now - t >= BANNED_ALERT_WINDOW]:
+            del banned_alerts[key]
+    banned_alerts[game_id] = now
+    return True
+
+def is_recent_order(order_key):
+    """True if the same order was placed within DUPLICATE_ORDER_TTL seconds"""
+    placed_at = recent_orders.get(order_key)
+    return placed_at is not None and datetime.now().timestamp() - placed_at < DUPLICATE_ORDER_TTL
+
+def remember_recent_order(order_key):
+    """Record an order in the dedupe window, evicting expired and oldest entries"""
+    now = datetime.now().timestamp()
+    recent_orders.pop(order_key, None)
+    recent_orders[order_key] = now
+    # Entries are in insertion order, so expired ones are at the front
+    while recent_orders:
+        oldest_key, placed_at = next(iter(recent_orders.items()))
+        if now - placed_at < DUPLICATE_ORDER_TTL and len(recent_orders) <= RECENT_ORDERS_MAX:
+            break
+        del recent_orders[oldest_key]
+
+def first_delivery(callback_id):
+    """False if this callback query was handled before (a redelivered update)"""
+    if callback_id in handled_callbacks:
+        return False
+    handled_callbacks[callback_id] = True
+    while len(handled_callbacks) > HANDLED_CALLBACKS_MAX:
+        handled_callbacks.popitem(last=False)
+    return True
+
+def describe_processed_order(order):
+    """Alert for a press on an order another admin already handled"""
+    status = order.get("status")
+    by = order.get("confirmed_by") if status == OrderStatus.CONFIRMED else order.get("cancelled_by")
+    return f"⚠️ Order ကို လုပ်ဆောင်ပြီးပါပြီ! ({status}{f' - {by}' if by else ''})"
+
+def hold_repeat_order(order_key, chat_id):
+    """Park a repeat order until the user confirms it; returns the callback token"""
+    token = secrets.token_hex(6)
+    repeat_orders[token] = (order_key, chat_id, datetime.now().timestamp())
+    while len(repeat_orders) > RECENT_ORDERS_MAX:
+        repeat_orders.popitem(last=False)
+    return token
+
+def take_repeat_order(token):
+    """Pop a parked repeat order, or None if it is unknown or older than the TTL"""
+    held = repeat_orders.pop(token, None)
+    if held is None or datetime.now().timestamp() - held[2] >= DUPLICATE_ORDER_TTL:
+        return None
+    return held
+
+# The part of the store pricing reads, kept until data.json changes
+_pricing_view = {"stamp": None, "data": None}
+
+def pricing_view():
+    """Custom prices, pricing config and user tiers, reloaded only after data.json changes"""
+    stamp = data_stamp()
+    if stamp is None or _pricing_view["stamp"] != stamp:
+        data = load_data()
+        view = {
+            "prices": data.get("prices", {}),
+            "pricing": data.get("pricing", {}),
+            "users": {uid: {"tier": user["tier"]} for uid, user in data["users"].items() if "tier" in user},
+        }
+        _pricing_view.update(stamp=stamp, data=view)
+    return _pricing_view["data"]
+
+def get_price(diamonds, user_id=None):
+    """Price of an item for this user, with their tier, own prices and active promos applied"""
+    return pricing.price_for(pricing_view(), user_id, diamonds)
+
+def user_price_tables(user_id):
+    """(tier, pricing.PriceTables) for this user"""
+    data = pricing_view()
+    tier = data["users"].get(user_id, {}).get("tier", rules.DEFAULT_TIER)
+    return tier, pricing.get_tables(data)
 
 def is_payment_screenshot(update):
     """
@@ -202,7 +473,8 @@ def is_payment_screenshot(update):
         return True
     return False
 
-pending_topups = {}
+# /topup requests waiting for their screenshot
+pending_topups = shared_state("pending_topups")
 
 async def check_pending_topup(user_id):
     """Check if user has pending topups"""
@@ -210,20 +482,38 @@ async def check_pending_topup(user_id):
     user_data = data["users"].get(user_id, {})
 
     for topup in user_data.get("topups", []):
-        if topup.get("status") == "pending":
+        if topup.get("status") == TopupStatus.PENDING:
             return True
     return False
 
 async def send_pending_topup_warning(update: Update):
     """Send pending topup warning message"""
     await update.message.reply_text(
-        "⏳ **Pending Topup ရှိနေပါတယ်!**\n\n"
-        "❌ သင့်မှာ admin က approve မလုပ်သေးတဲ့ topup ရှိနေပါတယ်။\n\n"
-        "**လုပ်ရမည့်အရာများ**:\n"
-        "• Admin က topup ကို approve လုပ်ပေးတဲ့အထိ စောင့်ပါ\n"
-        "• Approve ရပြီးမှ command တွေကို ပြန်အသုံးပြုနိုင်ပါမယ်\n\n"
-        "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။\n"
-        "💡 `/balance` နဲ့ status စစ်ကြည့်နိုင်ပါတယ်။",
+        messages.render("pending_topup_warning", messages.user_locale(update.effective_user)),
+        parse_mode="Markdown"
+    )
+
+def owner_contact_markup():
+    return InlineKeyboardMarkup([[InlineKeyboardButton("👑 Contact Owner", url=f"tg://user?id={ADMIN_ID}")]])
+
+def payment_markup():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("📱 Copy KPay Number", callback_data="copy_kpay")],
+        [InlineKeyboardButton("📱 Copy Wave Number", callback_data="copy_wave")]
+    ])
+
+async def send_unauthorized(update: Update):
+    """Tell a user without access to ask the owner"""
+    await update.message.reply_text(
+        messages.render("unauthorized", messages.user_locale(update.effective_user)),
+        parse_mode="Markdown",
+        reply_markup=owner_contact_markup()
+    )
+
+async def send_restricted(update: Update):
+    """Tell a user waiting for topup approval that commands are locked"""
+    await update.message.reply_text(
+        messages.render("restricted", messages.user_locale(update.effective_user)),
         parse_mode="Markdown"
     )
 
@@ -276,22 +566,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Check if user is authorized
     if not is_user_authorized(user_id):
-        # Create keyboard with Owner contact button
-        keyboard = [[InlineKeyboardButton("👑 Contact Owner", url=f"tg://user?id={ADMIN_ID}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
         await update.message.reply_text(
-            f"🚫 **Bot အသုံးပြုခွင့် မရှိပါ!**\n\n"
-            f"👋 မင်္ဂလာပါ `{name}`!\n"
-            f"🆔 Your ID: `{user_id}`\n\n"
-            "❌ သင်သည် ဤ bot ကို အသုံးပြုခွင့် မရှိသေးပါ။\n\n"
-            "**လုပ်ရမည့်အရာများ**:\n"
-            "• အောက်က 'Contact Owner' button ကို နှိပ်ပါ\n"
-            "• Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ\n"
-            "• သင့် User ID ကို ပေးပို့ပါ\n\n"
-            "✅ Owner က approve လုပ်ပြီးမှ bot ကို အသုံးပြုနိုင်ပါမယ်။",
+            messages.render("unauthorized_start", name=name, user_id=user_id),
             parse_mode="Markdown",
-            reply_markup=reply_markup
+            reply_markup=owner_contact_markup()
         )
         return
 
@@ -303,14 +581,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if user_id not in data["users"]:
-        data["users"][user_id] = {
-            "name": name,
-            "username": username,
-            "balance": 0,
-            "orders": [],
-            "topups": []
-        }
-        save_data(data)
+        with data_transaction() as data:
+            data["users"].setdefault(user_id, {
+                "name": name,
+                "username": username,
+                "balance": 0,
+                "orders": [],
+                "topups": []
+            })
 
     # Clear any restricted state when starting
     if user_id in user_states:
@@ -329,7 +607,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "➤ `/balance` - ဘယ်လောက်လက်ကျန်ရှိလဲ စစ်မယ်\n"
         "➤ `/topup amount` - ငွေဖြည့်မယ် (screenshot တင်ပါ)\n"
         "➤ `/price` - Diamond များရဲ့ ဈေးနှုန်းများ\n"
-        "➤ `/history` - အော်ဒါမှတ်တမ်းကြည့်မယ်\n\n"
+        "➤ `/history` - အော်ဒါမှတ်တမ်းကြည့်မယ်\n"
+        "➤ `/statement [from] [to]` - ငွေစာရင်း ကြည့်မယ်\n\n"
         "**📌 ဥပမာ**:\n"
         "`/mmb 123456789 12345 wp1`\n"
         "`/mmb 123456789 12345 86`\n\n"
@@ -337,49 +616,54 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=reply_markup)
 
-async def mmb_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = str(update.effective_user.id)
-
+async def check_order_access(update: Update, user_id):
+    """Authorization, maintenance and restriction checks shared by the order entry points"""
     # Check authorization
     load_authorized_users()
     if not is_user_authorized(user_id):
-        keyboard = [[InlineKeyboardButton("👑 Contact Owner", url=f"tg://user?id={ADMIN_ID}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
-            "🚫 **အသုံးပြုခွင့် မရှိပါ!**\n\n"
-            "Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ။",
-            reply_markup=reply_markup
-        )
-        return
+        await send_unauthorized(update)
+        return False
 
     # Check maintenance mode
     if not await check_maintenance_mode("orders"):
         await send_maintenance_message(update, "orders")
-        return
+        return False
 
     # Check if user is restricted after screenshot
     if user_id in user_states and user_states[user_id] == "waiting_approval":
-        await update.message.reply_text(
-            "⏳ **Screenshot ပို့ပြီးပါပြီ!**\n\n"
-            "❌ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ commands တွေ အသုံးပြုလို့ မရပါ။\n\n"
-            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
-            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။",
-            parse_mode="Markdown"
-        )
-        return
+        await send_restricted(update)
+        return False
 
     # Check for pending topups first
     if await check_pending_topup(user_id):
         await send_pending_topup_warning(update)
+        return False
+
+    return True
+
+async def mmb_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    if not await check_order_access(update, user_id):
         return
 
     args = context.args
 
+    # Several "gameid serverid amount" lines form one cart order
+    text_lines = update.message.text.split("\n")
+    if len(text_lines) > 1 and len(args) > 3:
+        first = text_lines[0].split(None, 1)
+        lines = ([first[1]] if len(first) > 1 else []) + text_lines[1:]
+        await place_cart_order(context, update.effective_user, update.effective_chat.id, lines, update.message.reply_text)
+        return
+
     if len(args) != 3:
         await update.message.reply_text(
             "❌ အမှားရှိပါတယ်!\n\n"
             "**မှန်ကန်တဲ့ format**:\n"
             "`/mmb gameid serverid amount`\n\n"
+            "**တစ်ခါတည်း အများကြီး မှာရန်** (တစ်ကြောင်းလျှင် တစ်ခု):\n"
+            "`/mmb`\n`123456789 12345 wp1`\n`987654321 4321 86`\n\n"
             "**ဥပမာ**:\n"
             "`/mmb 123456789 12345 wp1`\n"
             "`/mmb 123456789 12345 86`",
@@ -441,16 +725,16 @@ async def mmb_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "⚠️ ဒီ account မှာ topup လုပ်လို့ မရပါ။"
         )
 
-        try:
-            await context.bot.send_message(chat_id=ADMIN_ID, text=admin_msg, parse_mode="Markdown")
-        except:
-            pass
+        if should_alert_banned_attempt(game_id):
+            try:
+                await context.bot.send_message(chat_id=ADMIN_ID, text=admin_msg, parse_mode="Markdown")
+            except Exception as e:
+                logger.warning("banned-account alert to owner failed", extra={"error": str(e)})
 
         return
 
-    price = get_price(amount)
-
-    if not price:
+    # Only checks the SKU is sold; place_order prices it under the store lock
+    if not get_price(amount, user_id):
         await update.message.reply_text(
             "❌ Diamond amount မှားနေပါတယ်!\n\n"
             "**ရရှိနိုင်တဲ့ amounts**:\n"
@@ -460,91 +744,289 @@ async def mmb_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    data = load_data()
-    user_balance = data["users"].get(user_id, {}).get("balance", 0)
-
-    if user_balance < price:
+    # Same order again within the dedupe window: ask before charging twice
+    order_key = (user_id, game_id, server_id, amount)
+    if is_recent_order(order_key):
+        token = hold_repeat_order(order_key, update.effective_chat.id)
+        keyboard = [[
+            InlineKeyboardButton("✅ ထပ်မှာမယ်", callback_data=f"dup_confirm_{token}"),
+            InlineKeyboardButton("❌ မမှာတော့ဘူး", callback_data=f"dup_cancel_{token}")
+        ]]
         await update.message.reply_text(
+            "⚠️ **ဒီအော်ဒါကို မကြာခင်က တင်ပြီးပါပြီ!**\n\n"
+            f"🎮 Game ID: `{game_id}`\n"
+            f"🌐 Server ID: `{server_id}`\n"
+            f"💎 Amount: {amount}\n\n"
+            "ထပ်မှာချင်တာ သေချာရင် အောက်က button ကို နှိပ်ပါ။",
+            parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return
+
+    await place_order(
+        context, update.effective_user, update.effective_chat.id,
+        game_id, server_id, amount, update.message.reply_text
+    )
+
+def take_stock(data, order, stock_alerts):
+    """Use up inventory for an order being confirmed; alerts are published once the transaction ends"""
+    alert = inventory.consume(data, order)
+    if alert:
+        entry = inventory.get_entry(data, order["amount"])
+        stock_alerts.append((order["amount"], alert, inventory.available(entry)))
+
+def publish_stock_alerts(stock_alerts, admin_ids, bot):
+    for sku, kind, units in stock_alerts:
+        event_bus.publish(events.StockAlert(sku, kind, units, tuple(admin_ids)), bot)
+
+def apply_auto_confirm(data, user_id, order, stock_alerts):
+    """Confirm an order in place if an auto-confirm rule matches; returns the rule name or None"""
+    # Orders the stock can't cover wait for an admin
+    if not inventory.in_stock(data, order["amount"]):
+        return None
+    auto_rule = rules.evaluate(data, user_id, order, datetime.now())
+    if auto_rule:
+        order["status"] = OrderStatus.CONFIRMED.value
+        order["confirmed_by"] = f"auto:{auto_rule}"
+        order["confirmed_at"] = datetime.now().isoformat()
+        order["auto_rule"] = auto_rule
+        take_stock(data, order, stock_alerts)
+        stats.record_order_confirmed(data, order, order["confirmed_by"])
+        mark_for_fulfillment(order)
+        logger.info("order auto-confirmed", extra={"user_id": user_id, "order_id": order["order_id"], "rule": auto_rule})
+    return auto_rule
+
+async def place_order(context, user, chat_id, game_id, server_id, amount, reply):
+    """Price and charge the order, store it and notify admins; reply sends text back to the user"""
+    user_id = str(user.id)
+
+    # Pricing, pause, balance check and charge happen under one lock so concurrent
+    # orders can't overspend, slip in after an SKU is paused or miss a price change
+    order = None
+    stock_alerts = []
+    with data_transaction() as data:
+        price = pricing.price_for(data, user_id, amount)
+        paused = not price or inventory.is_paused(data, amount)
+        user_balance = data["users"].get(user_id, {}).get("balance", 0)
+        if not paused and user_balance >= price:
+            # Process order
+            order_id = f"ORD{records.id_stamp()}"
+            order = Order(
+                order_id=order_id,
+                game_id=game_id,
+                server_id=server_id,
+                amount=amount,
+                price=price,
+                status=OrderStatus.PENDING,
+                timestamp=records.now_timestamp(),
+                user_id=user_id,
+                chat_id=chat_id  # Store chat ID where order was placed
+            ).to_dict()
+
+            # Deduct balance
+            ledger.post(data, user_id, ledger.KIND_ORDER, -price, ref=order_id)
+            data["users"][user_id]["orders"].append(order)
+            stats.record_order_created(data, order)
+
+            # Low-risk orders skip the admin Confirm button
+            auto_rule = apply_auto_confirm(data, user_id, order, stock_alerts)
+            new_balance = data["users"][user_id]["balance"]
+            admin_list = data.get("admin_ids", [ADMIN_ID])
+
+    if paused:
+        await reply(
+            f"⛔ **{amount}** ကို ယာယီ ရပ်နားထားပါတယ်။\n\n"
+            "📦 Stock ပြန်ဖြည့်ပြီးရင် ထပ်မှာလို့ရပါမယ်။",
+            parse_mode="Markdown"
+        )
+        return
+
+    if order is None:
+        await reply(
+            messages.render(
+                "insufficient_balance",
+                price=price, balance=user_balance, shortfall=price - user_balance
+            ),
+            parse_mode="Markdown"
+        )
+        return
+
+    remember_recent_order((user_id, game_id, server_id, amount))
+    if not auto_rule:
+        pending_index.add_order(user_id, order)
+    event_bus.publish(
+        events.OrderCreated(user_id, user.first_name or "Unknown", (order,), tuple(admin_list)),
+        context.bot
+    )
+    publish_stock_alerts(stock_alerts, admin_list, context.bot)
+
+    state = "confirmed" if auto_rule else "pending"
+    await reply(
+        messages.render(
+            "order_placed",
+            order_id=order_id, game_id=game_id, server_id=server_id, amount=amount,
+            price=price, balance=new_balance,
+            status=messages.render(f"order_status_{state}"),
+            next_step=messages.render(f"order_next_{state}")
+        ),
+        parse_mode="Markdown"
+    )
+
+# Most lines accepted in one cart; also keeps the admin keyboard within Telegram's limits
+CART_MAX_ITEMS = 50
+
+def parse_cart_lines(lines, prices, paused=frozenset()):
+    """Validate and price every cart line against the user's {sku: price}; returns (items, errors)"""
+    items = []
+    errors = []
+    for line_no, line in enumerate(lines, 1):
+        parts = line.replace(",", " ").split()
+        if not parts:
+            continue
+        if len(parts) != 3:
+            errors.append(f"{line_no}: format မှားနေပါတယ်")
+            continue
+        game_id, server_id, amount = parts
+        if not validate_game_id(game_id):
+            errors.append(f"{line_no}: Game ID မှားနေပါတယ် ({messages.escape(game_id)})")
+            continue
+        if not validate_server_id(server_id):
+            errors.append(f"{line_no}: Server ID မှားနေပါတယ် ({messages.escape(server_id)})")
+            continue
+        if is_banned_account(game_id):
+            errors.append(f"{line_no}: Account Ban ဖြစ်နေပါတယ် ({game_id})")
+            continue
+        price = prices.get(amount)
+        if not price:
+            errors.append(f"{line_no}: Diamond amount မှားနေပါတယ် ({messages.escape(amount)})")
+            continue
+        if amount in paused:
+            errors.append(f"{line_no}: {amount} ယာယီ ရပ်နားထားပါတယ်")
+            continue
+        items.append((game_id, server_id, amount, price))
+    return items, errors
+
+async def place_cart_order(context, user, chat_id, lines, reply):
+    """Validate, price and place several orders with a single charge, save and admin card"""
+    user_id = str(user.id)
+    tier, tables = user_price_tables(user_id)
+    items, errors = parse_cart_lines(lines, tables.prices(tier, user_id), inventory.paused_skus(load_data()))
+
+    if errors:
+        await reply(
+            "❌ **အော်ဒါ မတင်ရသေးပါ!** အောက်ပါ lines များ မှားနေပါတယ်:\n\n"
+            + "\n".join(errors[:20])
+            + ("\n…" if len(errors) > 20 else ""),
+            parse_mode="Markdown"
+        )
+        return
+
+    if not items or len(items) > CART_MAX_ITEMS:
+        await reply(
+            f"❌ တစ်ခါတည်း အော်ဒါ 1 - {CART_MAX_ITEMS} ခုသာ မှာလို့ရပါတယ်။\n\n"
+            "**ဥပမာ**:\n"
+            "`/mmb`\n`123456789 12345 wp1`\n`987654321 4321 86`",
+            parse_mode="Markdown"
+        )
+        return
+
+    orders = []
+    stock_alerts = []
+    with data_transaction() as data:
+        # Price and pause state as of this transaction; either may have changed since the check above
+        items = [(game_id, server_id, amount, pricing.price_for(data, user_id, amount)) for game_id, server_id, amount, _ in items]
+        paused = sorted({amount for _, _, amount, price in items if not price or inventory.is_paused(data, amount)})
+        total = sum(price or 0 for _, _, _, price in items)
+        user_balance = data["users"].get(user_id, {}).get("balance", 0)
+        if not paused and user_balance >= total:
+            # One charge for the whole cart, then one order per line
+            stamp = records.id_stamp()
+            batch_id = f"CART{stamp}"
+            ledger.post(data, user_id, ledger.KIND_ORDER, -total, ref=batch_id)
+
+            for index, (game_id, server_id, amount, price) in enumerate(items, 1):
+                order = Order(
+                    order_id=f"ORD{stamp}-{index}",
+                    game_id=game_id,
+                    server_id=server_id,
+                    amount=amount,
+                    price=price,
+                    status=OrderStatus.PENDING,
+                    timestamp=records.now_timestamp(),
+                    user_id=user_id,
+                    chat_id=chat_id,
+                    extra={"batch_id": batch_id}
+                ).to_dict()
+                data["users"][user_id]["orders"].append(order)
+                stats.record_order_created(data, order)
+                apply_auto_confirm(data, user_id, order, stock_alerts)
+                orders.append(order)
+            new_balance = data["users"][user_id]["balance"]
+            admin_list = data.get("admin_ids", [ADMIN_ID])
+
+    if paused:
+        await reply(
+            f"⛔ **{', '.join(paused)}** ကို ယာယီ ရပ်နားထားပါတယ်။ အော်ဒါ မတင်ရသေးပါ!\n\n"
+            "📦 Stock ပြန်ဖြည့်ပြီးရင် ထပ်မှာလို့ရပါမယ်။",
+            parse_mode="Markdown"
+        )
+        return
+
+    if not orders:
+        await reply(
             f"❌ လက်ကျန်ငွေ မလုံလောက်ပါ!\n\n"
-            f"💰 လိုအပ်တဲ့ငွေ: {price:,} MMK\n"
+            f"💰 လိုအပ်တဲ့ငွေ: {total:,} MMK ({len(items)} ခု)\n"
             f"💳 သင့်လက်ကျန်: {user_balance:,} MMK\n"
-            f"❗ လိုအပ်သေးတာ: {price - user_balance:,} MMK\n\n"
+            f"❗ လိုအပ်သေးတာ: {total - user_balance:,} MMK\n\n"
             "ငွေဖြည့်ရန် `/topup amount` သုံးပါ။",
             parse_mode="Markdown"
         )
         return
 
-    # Process order
-    order_id = f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    order = {
-        "order_id": order_id,
-        "game_id": game_id,
-        "server_id": server_id,
-        "amount": amount,
-        "price": price,
-        "status": "pending",
-        "timestamp": datetime.now().isoformat(),
-        "user_id": user_id,
-        "chat_id": update.effective_chat.id  # Store chat ID where order was placed
-    }
-
-    # Deduct balance
-    data["users"][user_id]["balance"] -= price
-    data["users"][user_id]["orders"].append(order)
-    save_data(data)
-
-    # Create confirm/cancel buttons for admin
-    keyboard = [
-        [
-            InlineKeyboardButton("✅ Confirm", callback_data=f"order_confirm_{order_id}"),
-            InlineKeyboardButton("❌ Cancel", callback_data=f"order_cancel_{order_id}")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    for game_id, server_id, amount, _ in items:
+        remember_recent_order((user_id, game_id, server_id, amount))
+    for order in orders:
+        if order["status"] == OrderStatus.PENDING:
+            pending_index.add_order(user_id, order)
+    event_bus.publish(
+        events.OrderCreated(user_id, user.first_name or "Unknown", tuple(orders), tuple(admin_list), batch_id),
+        context.bot
+    )
+    publish_stock_alerts(stock_alerts, admin_list, context.bot)
 
-    # Notify admin
-    admin_msg = (
-        f"🔔 **အော်ဒါအသစ်ရောက်ပါပြီ!**\n\n"
-        f"📝 Order ID: `{order_id}`\n"
-        f"👤 User: [{update.effective_user.first_name}](tg://user?id={user_id})\n\n"
-        f"🆔 User ID: `{user_id}`\n"
-        f"🎮 Game ID: `{game_id}`\n"
-        f"🌐 Server ID: `{server_id}`\n"
-        f"💎 Amount: {amount}\n"
-        f"💰 Price: {price:,} MMK\n"
-        f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        f"📊 Status: ⏳ စောင့်ဆိုင်းနေသည်"
+    pending = sum(order["status"] == OrderStatus.PENDING for order in orders)
+    if not pending:
+        next_step = messages.render("order_next_confirmed")
+    elif pending == len(orders):
+        next_step = messages.render("order_next_pending")
+    else:
+        next_step = (
+            f"{messages.render('order_status_confirmed')}: {len(orders) - pending} ခု - {messages.render('order_next_confirmed')}\n"
+            f"{messages.render('order_status_pending')}: {pending} ခု - {messages.render('order_next_pending')}"
+        )
+    await reply(
+        f"✅ **Cart အော်ဒါ အောင်မြင်ပါပြီ!**\n\n"
+        f"📦 Cart ID: `{batch_id}`\n"
+        f"🛒 အော်ဒါ: {len(orders)} ခု\n"
+        f"💰 ကုန်ကျစရိတ်: {total:,} MMK\n"
+        f"💳 လက်ကျန်ငွေ: {new_balance:,} MMK\n\n"
+        f"{next_step}\n"
+        "📞 ပြဿနာရှိရင် admin ကို ဆက်သွယ်ပါ။",
+        parse_mode="Markdown"
     )
 
-    # Send to all admins (with buttons for everyone)
-    data = load_data()
-    admin_list = data.get("admin_ids", [ADMIN_ID])
-    for admin_id in admin_list:
-        try:
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=admin_msg,
-                parse_mode="Markdown",
-                reply_markup=reply_markup
-            )
-        except:
-            pass
+async def mmb_document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cart order from a .txt/.csv upload captioned /mmb, one order per line"""
+    user_id = str(update.effective_user.id)
 
-    # Notify admin group
-    await notify_group_order(order, update.effective_user.first_name or "Unknown", user_id)
+    if not await check_order_access(update, user_id):
+        return
 
-    await update.message.reply_text(
-        f"✅ **အော်ဒါ အောင်မြင်ပါပြီ!**\n\n"
-        f"📝 Order ID: `{order_id}`\n"
-        f"🎮 Game ID: `{game_id}`\n"
-        f"🌐 Server ID: `{server_id}`\n"
-        f"💎 Diamond: {amount}\n"
-        f"💰 ကုန်ကျစရိတ်: {price:,} MMK\n"
-        f"💳 လက်ကျန်ငွေ: {data['users'][user_id]['balance']:,} MMK\n"
-        f"📊 Status: ⏳ စောင့်ဆိုင်းနေသည်\n\n"
-        "⚠️ Admin က confirm လုပ်ပြီးမှ diamonds များ ရရှိပါမယ်။\n"
-        "📞 ပြဿနာရှိရင် admin ကို ဆက်သွယ်ပါ။",
-        parse_mode="Markdown"
+    file = await context.bot.get_file(update.message.document.file_id)
+    content = bytes(await file.download_as_bytearray()).decode("utf-8", errors="ignore")
+    await place_cart_order(
+        context, update.effective_user, update.effective_chat.id,
+        content.splitlines(), update.message.reply_text
     )
 
 async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -553,24 +1035,12 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check authorization
     load_authorized_users()
     if not is_user_authorized(user_id):
-        keyboard = [[InlineKeyboardButton("👑 Contact Owner", url=f"tg://user?id={ADMIN_ID}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
-            "🚫 **အသုံးပြုခွင့် မရှိပါ!**\n\n"
-            "Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ။",
-            reply_markup=reply_markup
-        )
+        await send_unauthorized(update)
         return
 
     # Check if user is restricted after screenshot
     if user_id in user_states and user_states[user_id] == "waiting_approval":
-        await update.message.reply_text(
-            "⏳ **Screenshot ပို့ပြီးပါပြီ!**\n\n"
-            "❌ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ commands တွေ အသုံးပြုလို့ မရပါ။\n\n"
-            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
-            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။",
-            parse_mode="Markdown"
-        )
+        await send_restricted(update)
         return
 
     # Check for pending topups first
@@ -594,7 +1064,7 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pending_amount = 0
 
     for topup in user_data.get("topups", []):
-        if topup.get("status") == "pending":
+        if topup.get("status") == TopupStatus.PENDING:
             pending_topups_count += 1
             pending_amount += topup.get("amount", 0)
 
@@ -602,9 +1072,8 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     name = user_data.get('name', 'Unknown')
     username = user_data.get('username', 'None')
 
-    # Remove or escape problematic characters for Markdown
-    name = name.replace('*', '').replace('_', '').replace('`', '').replace('[', '').replace(']', '')
-    username = username.replace('*', '').replace('_', '').replace('`', '').replace('[', '').replace(']', '')
+    name = messages.escape(name)
+    username = messages.escape(username)
 
     status_msg = ""
     if pending_topups_count > 0:
@@ -642,7 +1111,8 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode="Markdown",
                 reply_markup=reply_markup
             )
-    except:
+    except Exception as e:
+        logger.warning("balance card photo failed; sending text only", extra={"user_id": user_id, "error": str(e)})
         # If error getting photo, send text only
         await update.message.reply_text(
             balance_text,
@@ -656,13 +1126,7 @@ async def topup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check authorization
     load_authorized_users()
     if not is_user_authorized(user_id):
-        keyboard = [[InlineKeyboardButton("👑 Contact Owner", url=f"tg://user?id={ADMIN_ID}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
-            "🚫 **အသုံးပြုခွင့် မရှိပါ!**\n\n"
-            "Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ။",
-            reply_markup=reply_markup
-        )
+        await send_unauthorized(update)
         return
 
     # Check maintenance mode
@@ -672,13 +1136,7 @@ async def topup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Check if user is restricted after screenshot
     if user_id in user_states and user_states[user_id] == "waiting_approval":
-        await update.message.reply_text(
-            "⏳ **Screenshot ပို့ပြီးပါပြီ!**\n\n"
-            "❌ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ commands တွေ အသုံးပြုလို့ မရပါ။\n\n"
-            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
-            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။",
-            parse_mode="Markdown"
-        )
+        await send_restricted(update)
         return
 
     # Check for pending topups first
@@ -689,19 +1147,12 @@ async def topup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     args = context.args
 
     if not args:
-        # Create payment buttons
-        keyboard = [
-            [InlineKeyboardButton("📱 Copy KPay Number", callback_data="copy_kpay")],
-            [InlineKeyboardButton("📱 Copy Wave Number", callback_data="copy_wave")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
         await update.message.reply_text(
             "❌ ငွေပမာဏ ထည့်ပါ!\n\n"
             "**ဥပမာ**: `/topup 50000`\n\n"
             "💳 ငွေလွှဲရန် အောက်က buttons များကို သုံးပါ။",
             parse_mode="Markdown",
-            reply_markup=reply_markup
+            reply_markup=payment_markup()
         )
         return
 
@@ -720,24 +1171,10 @@ async def topup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "timestamp": datetime.now().isoformat()
     }
 
-    # Create payment buttons
-    keyboard = [
-        [InlineKeyboardButton("📱 Copy KPay Number", callback_data="copy_kpay")],
-        [InlineKeyboardButton("📱 Copy Wave Number", callback_data="copy_wave")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
+    reply_markup = payment_markup()
     topup_msg = (
-        "💳 **ငွေဖြည့်လုပ်ငန်းစဉ်**\n\n"
-        f"💰 ပမာဏ: `{amount:,} MMK`\n\n"
-        "**အဆင့် 1**: ငွေပမာဏ ရေးပါ\n"
-        "`/topup amount` ဥပမာ: `/topup 50000`\n\n"
-        "**အဆင့် 2**: ငွေလွှဲပါ\n"
-        f"🔵 KBZ Pay: `{payment_info['kpay_number']}` ({payment_info['kpay_name']})\n"
-        f"📱 Wave Money: `{payment_info['wave_number']}` ({payment_info['wave_name']})\n\n"
-        "**အဆင့် 3**: Screenshot တင်ပါ\n"
-        "ငွေလွှဲပြီးရင် screenshot ကို ဒီမှာ တင်ပေးပါ။\n\n"
-        "⏰ 24 နာရီအတွင်း confine လုပ်ပါမယ်။"
+        messages.render("topup_header_amount", amount=amount)
+        + messages.render("topup_steps", **state_items(payment_info))
     )
 
     # Send KPay QR if available
@@ -750,8 +1187,8 @@ async def topup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         f"👤 နာမည်: {payment_info['kpay_name']}",
                 parse_mode="Markdown"
             )
-        except:
-            pass
+        except Exception as e:
+            logger.warning("KPay QR code send failed", extra={"error": str(e)})
 
     # Send Wave QR if available
     if payment_info.get("wave_image"):
@@ -763,8 +1200,8 @@ async def topup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         f"👤 နာမည်: {payment_info['wave_name']}",
                 parse_mode="Markdown"
             )
-        except:
-            pass
+        except Exception as e:
+            logger.warning("Wave QR code send failed", extra={"error": str(e)})
 
     await update.message.reply_text(
         topup_msg,
@@ -772,88 +1209,26 @@ async def topup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
-async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = str(update.effective_user.id)
-
-    # Check authorization
-    load_authorized_users()
-    if not is_user_authorized(user_id):
-        keyboard = [[InlineKeyboardButton("👑 Contact Owner", url=f"tg://user?id={ADMIN_ID}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
-            "🚫 **အသုံးပြုခွင့် မရှိပါ!**\n\n"
-            "Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ။",
-            reply_markup=reply_markup
-        )
-        return
-
-    # Check if user is restricted after screenshot
-    if user_id in user_states and user_states[user_id] == "waiting_approval":
-        await update.message.reply_text(
-            "⏳ **Screenshot ပို့ပြီးပါပြီ!**\n\n"
-            "❌ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ commands တွေ အသုံးပြုလို့ မရပါ။\n\n"
-            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
-            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။",
-            parse_mode="Markdown"
-        )
-        return
-
-    # Get custom prices
-    custom_prices = load_prices()
-
-    # Default prices
-    default_prices = {
-        # Weekly Pass
-        "wp1": 6000, "wp2": 12000, "wp3": 18000, "wp4": 24000, "wp5": 30000,
-        "wp6": 36000, "wp7": 42000, "wp8": 48000, "wp9": 54000, "wp10": 60000,
-        # Regular Diamonds
-        "11": 950, "22": 1900, "33": 2850, "56": 4200, "86": 5100, "112": 8200,
-        "172": 10200, "257": 15300, "343": 20400, "429": 25500, "514": 30600,
-        "600": 35700, "706": 40800, "878": 51000, "963": 56100, "1049": 61200,
-        "1135": 66300, "1412": 81600, "2195": 122400, "3688": 204000,
-        "5532": 306000, "9288": 510000, "12976": 714000,
-        # 2X Diamond Pass
-        "55": 3500, "165": 10000, "275": 16000, "565": 33000
-    }
-
-    # Merge custom prices with defaults (custom overrides default)
-    current_prices = {**default_prices, **custom_prices}
-
+def render_price_list(prices):
+    """/price text for one {sku: price} map"""
     price_msg = "💎 **MLBB Diamond ဈေးနှုန်းများ**\n\n"
-
-    # Weekly Pass section
-    price_msg += "🎟️ **Weekly Pass**:\n"
-    for i in range(1, 11):
-        wp_key = f"wp{i}"
-        if wp_key in current_prices:
-            price_msg += f"• {wp_key} = {current_prices[wp_key]:,} MMK\n"
-    price_msg += "\n"
-
-    # Regular Diamonds section
-    price_msg += "💎 **Regular Diamonds**:\n"
-    regular_diamonds = ["11", "22", "33", "56", "86", "112", "172", "257", "343", 
-                       "429", "514", "600", "706", "878", "963", "1049", "1135", 
-                       "1412", "2195", "3688", "5532", "9288", "12976"]
-
-    for diamond in regular_diamonds:
-        if diamond in current_prices:
-            price_msg += f"• {diamond} = {current_prices[diamond]:,} MMK\n"
-    price_msg += "\n"
-
-    # 2X Diamond Pass section
-    price_msg += "💎 **2X Diamond Pass**:\n"
-    double_pass = ["55", "165", "275", "565"]
-    for dp in double_pass:
-        if dp in current_prices:
-            price_msg += f"• {dp} = {current_prices[dp]:,} MMK\n"
-    price_msg += "\n"
+    sections = (
+        ("🎟️ **Weekly Pass**", pricing.WEEKLY_PASS),
+        ("💎 **Regular Diamonds**", pricing.DIAMONDS),
+        ("💎 **2X Diamond Pass**", pricing.DOUBLE_PASS),
+    )
+    for title, skus in sections:
+        price_msg += f"{title}:\n"
+        for sku in skus:
+            if sku in prices:
+                price_msg += f"• {sku} = {prices[sku]:,} MMK\n"
+        price_msg += "\n"
 
     # Show any other custom items not in default categories
-    other_customs = {k: v for k, v in custom_prices.items() 
-                    if k not in default_prices}
-    if other_customs:
+    other_items = {k: v for k, v in prices.items() if k not in pricing.DEFAULT_PRICES}
+    if other_items:
         price_msg += "🔥 **Special Items**:\n"
-        for item, price in other_customs.items():
+        for item, price in other_items.items():
             price_msg += f"• {item} = {price:,} MMK\n"
         price_msg += "\n"
 
@@ -864,33 +1239,56 @@ async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "`/mmb 123456789 12345 wp1`\n"
         "`/mmb 123456789 12345 86`"
     )
+    return price_msg
+
+async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check authorization
+    load_authorized_users()
+    if not is_user_authorized(user_id):
+        await send_unauthorized(update)
+        return
+
+    # Check if user is restricted after screenshot
+    if user_id in user_states and user_states[user_id] == "waiting_approval":
+        await send_restricted(update)
+        return
+
+    tier, tables = user_price_tables(user_id)
+    price_msg = tables.render(tier, user_id, render_price_list)
+    promos = [promo for promo in tables.promos if "tiers" not in promo or tier in promo["tiers"]]
+    if promos:
+        price_msg = "".join(
+            f"🔥 **{promo['name']}** -{promo['percent']}% ({promo['end'][:16].replace('T', ' ')} အထိ)\n"
+            for promo in promos
+        ) + "\n" + price_msg
 
     await update.message.reply_text(price_msg, parse_mode="Markdown")
 
+HISTORY_STATUS_EMOJI = {
+    OrderStatus.CONFIRMED: "✅",
+    OrderStatus.PROCESSING: "✅",
+    OrderStatus.DELIVERED: "✅",
+    OrderStatus.FAILED: "❌",
+    OrderStatus.CANCELLED: "❌",
+    OrderStatus.EXPIRED: "❌",
+    TopupStatus.APPROVED: "✅",
+    TopupStatus.EXPIRED: "❌",
+}
+
 async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
 
     # Check authorization
     load_authorized_users()
     if not is_user_authorized(user_id):
-        keyboard = [[InlineKeyboardButton("👑 Contact Owner", url=f"tg://user?id={ADMIN_ID}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
-            "🚫 **အသုံးပြုခွင့် မရှိပါ!**\n\n"
-            "Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ။",
-            reply_markup=reply_markup
-        )
+        await send_unauthorized(update)
         return
 
     # Check if user is restricted after screenshot
     if user_id in user_states and user_states[user_id] == "waiting_approval":
-        await update.message.reply_text(
-            "⏳ **Screenshot ပို့ပြီးပါပြီ!**\n\n"
-            "❌ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ commands တွေ အသုံးပြုလို့ မရပါ။\n\n"
-            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
-            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။",
-            parse_mode="Markdown"
-        )
+        await send_restricted(update)
         return
 
     # Check for pending topups first
@@ -898,15 +1296,14 @@ async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await send_pending_topup_warning(update)
         return
 
-    data = load_data()
-    user_data = data["users"].get(user_id)
+    user = load_user(user_id)
 
-    if not user_data:
+    if not user:
         await update.message.reply_text("❌ အရင်ဆုံး /start နှိပ်ပါ။")
         return
 
-    orders = user_data.get("orders", [])
-    topups = user_data.get("topups", [])
+    orders = user.orders or []
+    topups = user.topups or []
 
     if not orders and not topups:
         await update.message.reply_text("📋 သင့်မှာ မည်သည့် မှတ်တမ်းမှ မရှိသေးပါ။")
@@ -917,15 +1314,16 @@ async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if orders:
         msg += "🛒 **အော်ဒါများ** (နောက်ဆုံး 5 ခု):\n"
         for order in orders[-5:]:
-            status_emoji = "✅" if order.get("status") == "completed" else "⏳"
-            msg += f"{status_emoji} {order['order_id']} - {order['amount']} ({order['price']:,} MMK)\n"
+            status_emoji = HISTORY_STATUS_EMOJI.get(order.status, "⏳")
+            msg += f"{status_emoji} {order.order_id} - {order.amount} ({order.price:,} MMK)\n"
         msg += "\n"
 
     if topups:
         msg += "💳 **ငွေဖြည့်များ** (နောက်ဆုံး 5 ခု):\n"
         for topup in topups[-5:]:
-            status_emoji = "✅" if topup.get("status") == "approved" else "⏳"
-            msg += f"{status_emoji} {topup['amount']:,} MMK - {topup.get('timestamp', 'Unknown')[:10]}\n"
+            status_emoji = HISTORY_STATUS_EMOJI.get(topup.status, "⏳")
+            day = records.format_timestamp(topup.timestamp)[:10] if topup.timestamp is not None else "Unknown"
+            msg += f"{status_emoji} {topup.amount:,} MMK - {day}\n"
 
     await update.message.reply_text(msg, parse_mode="Markdown")
 
@@ -955,52 +1353,38 @@ async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ ငွေပမာဏမှားနေပါတယ်!")
         return
 
-    data = load_data()
+    with data_transaction() as data:
+        user_found = target_user_id in data["users"]
+        if user_found:
+            # Add balance to user
+            ledger.post(data, target_user_id, ledger.KIND_TOPUP, amount, ref=f"approve:{user_id}")
 
-    if target_user_id not in data["users"]:
+            # Update topup status
+            topups = data["users"][target_user_id]["topups"]
+            for topup in reversed(topups):
+                if topup["status"] == TopupStatus.PENDING and topup["amount"] == amount:
+                    topup["status"] = TopupStatus.APPROVED.value
+                    topup["approved_at"] = datetime.now().isoformat()
+                    stats.record_topup_approved(data, topup)
+                    break
+
+    if not user_found:
         await update.message.reply_text("❌ User မတွေ့ရှိပါ!")
         return
 
-    # Add balance to user
-    data["users"][target_user_id]["balance"] += amount
-
-    # Update topup status
-    topups = data["users"][target_user_id]["topups"]
-    for topup in reversed(topups):
-        if topup["status"] == "pending" and topup["amount"] == amount:
-            topup["status"] = "approved"
-            topup["approved_at"] = datetime.now().isoformat()
-            break
-
-    save_data(data)
-
     # Clear user restriction state after approval
     if target_user_id in user_states:
         del user_states[target_user_id]
 
-    # Notify user
-    try:
-        user_msg = (
-            f"✅ **ငွေဖြည့်မှု အတည်ပြုပါပြီ!** 🎉\n\n"
-            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            f"💰 **ပမာဏ:** `{amount:,} MMK`\n"
-            f"💳 **လက်ကျန်ငွေ:** `{data['users'][target_user_id]['balance']:,} MMK`\n"
-            f"⏰ **အချိန်:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            "🎉 **ယခုအခါ diamonds များ ဝယ်ယူနိုင်ပါပြီ!** 💎\n\n"
-            "⚡ အမြန်ဆုံး diamonds များကို `/mmb` command နဲ့ မှာယူပါ ⚡\n\n"
-            "🔓 **Bot လုပ်ဆောင်ချက်များ ပြန်လည် အသုံးပြုနိုင်ပါပြီ!**"
-        )
-        await context.bot.send_message(chat_id=int(target_user_id), text=user_msg, parse_mode="Markdown")
-    except:
-        pass
+    new_balance = data["users"][target_user_id]["balance"]
+    event_bus.publish(events.TopupApproved(target_user_id, amount, new_balance, user_id), context.bot)
 
     # Confirm to admin
     await update.message.reply_text(
         f"✅ **Approve အောင်မြင်ပါပြီ!**\n\n"
         f"👤 User ID: `{target_user_id}`\n"
         f"💰 Amount: `{amount:,} MMK`\n"
-        f"💳 User's new balance: `{data['users'][target_user_id]['balance']:,} MMK`\n"
+        f"💳 User's new balance: `{new_balance:,} MMK`\n"
         f"🔓 User restrictions cleared!",
         parse_mode="Markdown"
     )
@@ -1032,14 +1416,17 @@ async def deduct_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ ငွေပမာဏမှားနေပါတယ်!")
         return
 
-    data = load_data()
+    with data_transaction() as data:
+        user_found = target_user_id in data["users"]
+        current_balance = data["users"][target_user_id]["balance"] if user_found else 0
+        if user_found and current_balance >= amount:
+            # Deduct balance from user
+            ledger.post(data, target_user_id, ledger.KIND_DEDUCT, -amount, ref=f"deduct:{user_id}")
 
-    if target_user_id not in data["users"]:
+    if not user_found:
         await update.message.reply_text("❌ User မတွေ့ရှိပါ!")
         return
 
-    current_balance = data["users"][target_user_id]["balance"]
-
     if current_balance < amount:
         await update.message.reply_text(
             f"❌ **နှုတ်လို့မရပါ!**\n\n"
@@ -1051,29 +1438,804 @@ async def deduct_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Deduct balance from user
-    data["users"][target_user_id]["balance"] -= amount
-    save_data(data)
-
-    # Notify user
-    try:
-        user_msg = (
-            f"⚠️ **လက်ကျန်ငွေ နှုတ်ခံရမှု**\n\n"
-            f"💰 နှုတ်ခံရတဲ့ပမာဏ: `{amount:,} MMK`\n"
-            f"💳 လက်ကျန်ငွေ: `{data['users'][target_user_id]['balance']:,} MMK`\n"
-            f"⏰ အချိန်: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            "📞 မေးခွန်းရှိရင် admin ကို ဆက်သွယ်ပါ။"
-        )
-        await context.bot.send_message(chat_id=int(target_user_id), text=user_msg, parse_mode="Markdown")
-    except:
-        pass
+    new_balance = data["users"][target_user_id]["balance"]
+    event_bus.publish(events.BalanceDeducted(target_user_id, amount, new_balance, user_id), context.bot)
 
     # Confirm to admin
     await update.message.reply_text(
         f"✅ **Balance နှုတ်ခြင်း အောင်မြင်ပါပြီ!**\n\n"
         f"👤 User ID: `{target_user_id}`\n"
         f"💰 နှုတ်ခဲ့တဲ့ပမာဏ: `{amount:,} MMK`\n"
-        f"💳 User လက်ကျန်ငွေ: `{data['users'][target_user_id]['balance']:,} MMK`",
+        f"💳 User လက်ကျန်ငွေ: `{new_balance:,} MMK`",
+        parse_mode="Markdown"
+    )
+
+# Upper bound on in-flight Telegram sends during a bulk fan-out
+NOTIFY_CONCURRENCY = 20
+
+async def send_many(bot, messages):
+    """Send (chat_id, text) pairs concurrently; returns how many were delivered"""
+    semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+
+    async def send_one(chat_id, text):
+        async with semaphore:
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown")
+                return True
+            except Exception as e:
+                logger.info("notice send failed", extra={"chat_id": chat_id, "error": str(e), "sample": "notify"})
+                return False
+
+    results = await asyncio.gather(*(send_one(chat_id, text) for chat_id, text in messages))
+    return sum(results)
+
+def select_pending_orders(data, min_age_hours=0, game_id=None):
+    """Yield (user_id, order) for pending orders older than min_age_hours, optionally for one game_id"""
+    now = datetime.now()
+    for uid, user_data in data["users"].items():
+        for order in user_data.get("orders", []):
+            if order.get("status") != OrderStatus.PENDING:
+                continue
+            if game_id and order.get("game_id") != game_id:
+                continue
+            if min_age_hours:
+                placed_at = datetime.fromisoformat(order["timestamp"])
+                if (now - placed_at).total_seconds() < min_age_hours * 3600:
+                    continue
+            yield uid, order
+
+def parse_bulk_order_filter(args):
+    """Parse `[hours] [game_id]` for /confirmall and /cancelall; returns None if invalid"""
+    if len(args) > 2:
+        return None
+    min_age_hours = 0
+    game_id = None
+    if args:
+        try:
+            min_age_hours = float(args[0])
+        except ValueError:
+            return None
+        if min_age_hours < 0:
+            return None
+    if len(args) == 2:
+        game_id = args[1]
+        if not validate_game_id(game_id):
+            return None
+    return min_age_hours, game_id
+
+async def approveall_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if not args or not all(arg.isdigit() for arg in args):
+        await update.message.reply_text(
+            "❌ အမှားရှိပါတယ်!\n\n"
+            "**မှန်ကန်တဲ့ format**: `/approveall user_id [user_id ...]`\n"
+            "**ဥပမာ**: `/approveall 123456789 987654321`\n\n"
+            "User တစ်ယောက်ချင်းစီရဲ့ pending topup အားလုံးကို approve လုပ်ပါမယ်။",
+            parse_mode="Markdown"
+        )
+        return
+
+    approved = {}
+    now = datetime.now()
+
+    # Apply every approval in one load/save cycle
+    with data_transaction() as data:
+        for target_user_id in dict.fromkeys(args):
+            user_data = data["users"].get(target_user_id)
+            if not user_data:
+                continue
+            total = 0
+            count = 0
+            for topup in user_data.get("topups", []):
+                if topup.get("status") == TopupStatus.PENDING:
+                    topup["status"] = TopupStatus.APPROVED.value
+                    topup["approved_at"] = now.isoformat()
+                    stats.record_topup_approved(data, topup)
+                    ledger.post(data, target_user_id, ledger.KIND_TOPUP, topup["amount"], ref=f"approve:{user_id}")
+                    total += topup["amount"]
+                    count += 1
+            if count:
+                approved[target_user_id] = (count, total, user_data["balance"])
+
+    # Clear user restriction state after approval
+    for target_user_id in approved:
+        user_states.pop(target_user_id, None)
+
+    messages = [
+        (
+            int(target_user_id),
+            f"✅ **ငွေဖြည့်မှု အတည်ပြုပါပြီ!** 🎉\n\n"
+            f"💰 **ပမာဏ:** `{total:,} MMK` ({count} ခု)\n"
+            f"💳 **လက်ကျန်ငွေ:** `{balance:,} MMK`\n"
+            f"⏰ **အချိန်:** {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            "🔓 **Bot လုပ်ဆောင်ချက်များ ပြန်လည် အသုံးပြုနိုင်ပါပြီ!**"
+        )
+        for target_user_id, (count, total, balance) in approved.items()
+    ]
+    delivered = await send_many(context.bot, messages)
+
+    topup_count = sum(count for count, _, _ in approved.values())
+    topup_total = sum(total for _, total, _ in approved.values())
+    await update.message.reply_text(
+        f"✅ **Bulk Approve အောင်မြင်ပါပြီ!**\n\n"
+        f"👥 Users: {len(approved)} / {len(set(args))}\n"
+        f"💳 Topups: {topup_count} ခု\n"
+        f"💰 Total: `{topup_total:,} MMK`\n"
+        f"📨 Notified: {delivered}",
+        parse_mode="Markdown"
+    )
+
+async def confirmall_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await bulk_order_command(update, context, OrderStatus.CONFIRMED.value)
+
+async def cancelall_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await bulk_order_command(update, context, OrderStatus.CANCELLED.value)
+
+async def bulk_order_command(update: Update, context: ContextTypes.DEFAULT_TYPE, new_status):
+    """Confirm or cancel (with refund) every matching pending order in one transaction"""
+    user_id = str(update.effective_user.id)
+    command = "confirmall" if new_status == OrderStatus.CONFIRMED else "cancelall"
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    order_filter = parse_bulk_order_filter(context.args)
+    if order_filter is None:
+        await update.message.reply_text(
+            "❌ အမှားရှိပါတယ်!\n\n"
+            f"**မှန်ကန်တဲ့ format**: `/{command} [hours] [game_id]`\n\n"
+            "**ဥပမာ**:\n"
+            f"• `/{command}` - pending order အားလုံး\n"
+            f"• `/{command} 2` - 2 နာရီထက် ကြာနေတဲ့ order များ\n"
+            f"• `/{command} 0 123456789` - Game ID တစ်ခုတည်းရဲ့ order များ",
+            parse_mode="Markdown"
+        )
+        return
+    min_age_hours, game_id = order_filter
+
+    admin_name = update.effective_user.first_name or "Admin"
+    now = datetime.now().isoformat()
+    processed = []
+    stock_alerts = []
+
+    with data_transaction() as data:
+        for uid, order in list(select_pending_orders(data, min_age_hours, game_id)):
+            order["status"] = new_status
+            order["rev"] = order.get("rev", 0) + 1
+            if new_status == OrderStatus.CONFIRMED:
+                order["confirmed_by"] = admin_name
+                order["confirmed_at"] = now
+                take_stock(data, order, stock_alerts)
+                stats.record_order_confirmed(data, order, admin_name)
+                mark_for_fulfillment(order)
+            else:
+                order["cancelled_by"] = admin_name
+                order["cancelled_at"] = now
+                stats.record_order_cancelled(data, order, admin_name)
+                # Refund balance
+                ledger.post(data, uid, ledger.KIND_REFUND, order["price"], ref=order["order_id"])
+            processed.append((uid, order, data["users"][uid].get("name", "Unknown")))
+        admin_list = data.get("admin_ids", [ADMIN_ID])
+
+    publish_stock_alerts(stock_alerts, admin_list, context.bot)
+
+    # Notices, admin cards and fulfillment follow from the events, as for the buttons
+    for uid, order, name in processed:
+        if new_status == OrderStatus.CONFIRMED:
+            event = events.OrderConfirmed(uid, name, order, user_id, admin_name, tuple(admin_list))
+        else:
+            event = events.OrderCancelled(uid, name, order, user_id, admin_name, tuple(admin_list), order["price"])
+        event_bus.publish(event, context.bot)
+
+    status_text = "✅ လက်ခံပြီး" if new_status == OrderStatus.CONFIRMED else "❌ ငြင်းပယ်ပြီး"
+    summary = (
+        f"✅ **Bulk Order Update အောင်မြင်ပါပြီ!**\n\n"
+        f"📊 Status: {status_text}\n"
+        f"📦 Orders: {len(processed)} ခု\n"
+        f"💰 Total: `{sum(order['price'] for _, order, _ in processed):,} MMK`"
+    )
+    await update.message.reply_text(summary, parse_mode="Markdown")
+
+async def retry_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await resolve_failed_order(update, context, "retry")
+
+async def refund_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await resolve_failed_order(update, context, "refund")
+
+async def resolve_failed_order(update: Update, context: ContextTypes.DEFAULT_TYPE, action):
+    """Send a failed (or stalled processing) order back to the pool, or cancel it with a refund"""
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    if len(context.args) != 1:
+        await update.message.reply_text(
+            f"❌ မှန်ကန်တဲ့ format: `/{action} <order_id>`\n\n"
+            "Fulfillment မအောင်မြင်တဲ့ (failed) order သို့မဟုတ် processing မှာ တစ်နာရီကျော် ရပ်နေတဲ့ order အတွက်သာ။",
+            parse_mode="Markdown"
+        )
+        return
+    if action == "retry" and not fulfillment_pool:
+        await update.message.reply_text("❌ Fulfillment provider မဖွင့်ထားပါ! (FULFILLMENT_PROVIDER)")
+        return
+
+    order_id = context.args[0]
+    admin_name = update.effective_user.first_name or "Admin"
+    now = datetime.now()
+    with data_transaction() as data:
+        if action == "retry":
+            target_user_id, order, applied = fulfillment.reopen(data, order_id, now)
+        else:
+            target_user_id, order = find_order(data, order_id)
+            applied = False
+            if order is not None and fulfillment.is_resolvable(order, now):
+                # Compare-and-set from the status just checked, under the same lock
+                target_user_id, order, applied = transition_order(
+                    data, order_id, (order["status"],), OrderStatus.CANCELLED.value,
+                    cancelled_by=admin_name, cancelled_at=now.isoformat(), refunded_at=now.isoformat()
+                )
+            if applied:
+                stats.record_order_refunded(data, order, admin_name)
+                ledger.post(data, target_user_id, ledger.KIND_REFUND, order["price"], ref=order_id)
+        user_name = data["users"][target_user_id].get("name", "Unknown") if order else None
+        admin_list = data.get("admin_ids", [ADMIN_ID])
+
+    if order is None:
+        await update.message.reply_text("❌ Order မတွေ့ရှိပါ!")
+        return
+    if not applied:
+        await update.message.reply_text(
+            f"❌ `{order_id}` ကို {action} လုပ်လို့ မရပါ! (status: {order.get('status')})\n"
+            "Failed သို့မဟုတ် processing မှာ ရပ်နေတဲ့ order သာ ရပါတယ်။",
+            parse_mode="Markdown"
+        )
+        return
+
+    if action == "retry":
+        submit_for_fulfillment(order_id)
+        await update.message.reply_text(
+            f"🔁 `{order_id}` ကို ပြန်ပို့နေပါပြီ! (retry {order['retries']})",
+            parse_mode="Markdown"
+        )
+        return
+
+    event_bus.publish(
+        events.OrderCancelled(
+            target_user_id, user_name, order, user_id, admin_name, tuple(admin_list), order["price"]
+        ),
+        context.bot
+    )
+    await update.message.reply_text(
+        f"↩️ `{order_id}` ကို cancel လုပ်ပြီး `{order['price']:,} MMK` ပြန်အမ်းပါပြီ!",
+        parse_mode="Markdown"
+    )
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    import export, tempfile
+
+    args = context.args
+    if not args or args[0] not in export.EXPORT_KINDS:
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့ format: `/export <orders/topups/balances> [csv/jsonl] [from] [to] [status]`\n\n"
+            "**ဥပမာ**:\n"
+            "• `/export orders csv 2025-09-01 2025-09-30 confirmed`\n"
+            "• `/export topups jsonl 2025-09-01`\n"
+            "• `/export balances`",
+            parse_mode="Markdown"
+        )
+        return
+
+    kind = args[0]
+    fmt = "csv"
+    dates = []
+    status = None
+    for arg in args[1:]:
+        if arg in export.EXPORT_FORMATS:
+            fmt = arg
+        elif len(dates) < 2 and len(arg) == 10 and arg[4] == "-" and arg[7] == "-":
+            dates.append(arg)
+        elif status is None and arg in export.STATUSES[kind]:
+            status = arg
+        else:
+            statuses = ", ".join(export.STATUSES[kind]) or "မရှိပါ"
+            await update.message.reply_text(
+                f"❌ `{messages.escape(arg, messages.CODE)}` ကို နားမလည်ပါ!\n\n"
+                f"**{kind} status**: {statuses}",
+                parse_mode="Markdown"
+            )
+            return
+
+    try:
+        start = export.parse_date(dates[0]) if dates else None
+        end = export.parse_date(dates[1], end=True) if len(dates) > 1 else None
+    except ValueError:
+        await update.message.reply_text("❌ ရက်စွဲ format မှားနေပါတယ်! (YYYY-MM-DD)")
+        return
+
+    # Stream into a temporary file on disk rather than building the document in memory
+    with tempfile.TemporaryFile("w+", newline="", encoding="utf-8") as out:
+        # Walking the whole store is blocking work; keep it off the event loop
+        count = await asyncio.to_thread(export.export, kind, out, fmt, start, end, status)
+        out.flush()
+        out.buffer.seek(0)
+        filename = f"{kind}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{fmt}"
+        await context.bot.send_document(
+            chat_id=update.effective_chat.id,
+            document=out.buffer,
+            filename=filename,
+            caption=f"📊 {kind}: {count} rows"
+        )
+
+async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    day_key = args[0] if args else datetime.now().strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(day_key, "%Y-%m-%d")
+    except ValueError:
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့ format: `/report [YYYY-MM-DD]`\n\n"
+            "**ဥပမာ**: `/report 2025-09-02`",
+            parse_mode="Markdown"
+        )
+        return
+
+    data = load_data()
+    day = stats.get_day(data, day_key)
+    if not day:
+        await update.message.reply_text(f"📊 {day_key} အတွက် မှတ်တမ်း မရှိပါ။")
+        return
+
+    msg = (
+        f"📊 **Sales Report - {day_key}**\n\n"
+        f"📦 Orders: {day['orders']}\n"
+        f"✅ Confirmed: {day['confirmed']}\n"
+        f"❌ Cancelled: {day['cancelled']}\n"
+        f"💰 Revenue: `{day['revenue']:,} MMK`\n"
+        f"💳 Topups: {day['topups']} (`{day['topup_volume']:,} MMK`)\n"
+    )
+    day_margin = stats.margin(day)
+    if day_margin:
+        profit, percent = day_margin
+        msg += f"📈 Margin: `{profit:,} MMK` ({percent:.1f}%, cost သိတဲ့ `{day['costed_revenue']:,} MMK` အပေါ်)\n"
+
+    if day["sku_revenue"]:
+        msg += "\n💎 **Revenue by Item:**\n"
+        for sku, revenue in sorted(day["sku_revenue"].items(), key=lambda item: -item[1]):
+            msg += f"• {messages.escape(sku)} = {revenue:,} MMK\n"
+
+    if day["admins"]:
+        msg += "\n👤 **Admins:**\n"
+        for admin_name, counts in day["admins"].items():
+            # Telegram first names and auto:<rule> labels may contain Markdown characters
+            msg += f"• {messages.escape(admin_name)}: ✅ {counts['confirmed']} / ❌ {counts['cancelled']}\n"
+
+    hours = stats.get_hours(data, day_key)
+    if hours:
+        msg += "\n⏰ **By Hour:**\n"
+        for hour, bucket in hours:
+            msg += f"• {hour:02d}:00 - {bucket['orders']} orders, {bucket['revenue']:,} MMK\n"
+
+    await update.message.reply_text(msg, parse_mode="Markdown")
+
+async def rebuildstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    with data_transaction() as data:
+        rebuilt = stats.rebuild_stats(data)
+
+    await update.message.reply_text(
+        f"✅ **Report data ပြန်လည်တွက်ချက်ပြီးပါပြီ!**\n\n"
+        f"📅 Days: {len(rebuilt['days'])}\n"
+        f"⏰ Hours: {len(rebuilt['hours'])}",
+        parse_mode="Markdown"
+    )
+
+LEDGER_KIND_LABELS = {
+    ledger.KIND_OPENING: "📂 Opening",
+    ledger.KIND_TOPUP: "💳 Topup",
+    ledger.KIND_ORDER: "🛒 Order",
+    ledger.KIND_REFUND: "↩️ Refund",
+    ledger.KIND_DEDUCT: "➖ Deduct",
+}
+
+# Longest statement sent in one message; older lines are summarised
+STATEMENT_MAX_LINES = 30
+
+async def statement_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check authorization
+    load_authorized_users()
+    if not is_user_authorized(user_id):
+        await update.message.reply_text("❌ အသုံးပြုခွင့် မရှိပါ!")
+        return
+
+    import export
+
+    args = list(context.args)
+    target_user_id = user_id
+
+    # Admins may look at any user's statement
+    if args and args[0].isdigit() and is_admin(user_id):
+        target_user_id = args.pop(0)
+
+    try:
+        start = export.parse_date(args[0]) if args else None
+        end = export.parse_date(args[1], end=True) if len(args) > 1 else None
+    except ValueError:
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့ format: `/statement [from] [to]`\n\n"
+            "**ဥပမာ**: `/statement 2025-09-01 2025-09-30`",
+            parse_mode="Markdown"
+        )
+        return
+
+    data = load_data()
+    if target_user_id not in data["users"]:
+        await update.message.reply_text("❌ User မတွေ့ရှိပါ!")
+        return
+
+    entries = list(ledger.entries_between(data, target_user_id, start, end))
+    if not entries:
+        await update.message.reply_text("📋 ဒီကာလအတွင်း မှတ်တမ်း မရှိပါ။")
+        return
+
+    opening = ledger.balance_before(data, target_user_id, start)
+    msg = (
+        f"📒 **Statement**\n\n"
+        f"🆔 User ID: `{target_user_id}`\n"
+        f"📂 Opening: `{opening:,} MMK`\n\n"
+    )
+
+    if len(entries) > STATEMENT_MAX_LINES:
+        msg += f"… {len(entries) - STATEMENT_MAX_LINES} entries earlier\n"
+    for entry in entries[-STATEMENT_MAX_LINES:]:
+        label = LEDGER_KIND_LABELS.get(entry["kind"], entry["kind"])
+        msg += (
+            f"{entry['timestamp'][:16].replace('T', ' ')} {label} "
+            f"{entry['amount']:+,} → {entry['balance']:,}\n"
+        )
+
+    msg += f"\n💳 Closing: `{entries[-1]['balance']:,} MMK`"
+    await update.message.reply_text(msg, parse_mode="Markdown")
+
+async def checkledger_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    deep = bool(context.args) and context.args[0] == "deep"
+    data = load_data()
+    mismatches, untracked = ledger.check(data, deep=deep)
+
+    msg = (
+        f"🔍 **Ledger Check{' (deep)' if deep else ''}**\n\n"
+        f"👥 Users: {len(data['users'])}\n"
+        f"❌ Mismatches: {len(mismatches)}\n"
+        f"📂 Not yet in ledger: {len(untracked)}\n"
+    )
+    for target_user_id, stored, expected in mismatches[:20]:
+        msg += f"• `{target_user_id}`: stored {stored:,} / ledger {expected:,}\n"
+
+    await update.message.reply_text(msg, parse_mode="Markdown")
+
+async def settier_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if len(args) != 2 or not args[0].isdigit():
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့ format: `/settier <user_id> <tier>`\n\n"
+            "**ဥပမာ**: `/settier 123456789 gold`",
+            parse_mode="Markdown"
+        )
+        return
+
+    target_user_id, tier = args[0], args[1].lower()
+    with data_transaction() as data:
+        found = target_user_id in data["users"]
+        if found:
+            data["users"][target_user_id]["tier"] = tier
+
+    if not found:
+        await update.message.reply_text("❌ User မတွေ့ရှိပါ!")
+        return
+
+    await update.message.reply_text(
+        f"✅ **Tier ပြောင်းလဲပါပြီ!**\n\n"
+        f"👤 User ID: `{target_user_id}`\n"
+        f"🏷️ Tier: `{tier}`",
+        parse_mode="Markdown"
+    )
+
+async def addrule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Only owner can change auto-confirm rules
+    if not is_owner(user_id):
+        await update.message.reply_text("❌ Owner သာ auto-confirm rule ပြင်နိုင်ပါတယ်!")
+        return
+
+    args = context.args
+    try:
+        if not args:
+            raise ValueError("rule name required")
+        rule = rules.parse_rule(args[0], args[1:])
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\n"
+            "**မှန်ကန်တဲ့ format**: `/addrule <name> [tiers=a,b] [skus=wp1,86] [max_price=N] [max_daily=N] [hours=8-22]`\n\n"
+            "**ဥပမာ**: `/addrule trusted tiers=gold max_price=20000 max_daily=100000 hours=8-22`",
+            parse_mode="Markdown"
+        )
+        return
+
+    with data_transaction() as data:
+        current = [r for r in data.get("auto_confirm", {}).get("rules", []) if r["name"] != rule["name"]]
+        current.append(rule)
+        rules.set_rules(data, current)
+
+    await update.message.reply_text(
+        f"✅ **Auto-confirm rule ထည့်ပြီးပါပြီ!**\n\n"
+        f"📜 `{rule['name']}`: {rules.describe_rule(rule)}",
+        parse_mode="Markdown"
+    )
+
+async def delrule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Only owner can change auto-confirm rules
+    if not is_owner(user_id):
+        await update.message.reply_text("❌ Owner သာ auto-confirm rule ပြင်နိုင်ပါတယ်!")
+        return
+
+    args = context.args
+    if len(args) != 1:
+        await update.message.reply_text("❌ မှန်ကန်တဲ့ format: `/delrule <name>`", parse_mode="Markdown")
+        return
+
+    with data_transaction() as data:
+        current = data.get("auto_confirm", {}).get("rules", [])
+        remaining = [r for r in current if r["name"] != args[0]]
+        if len(remaining) != len(current):
+            rules.set_rules(data, remaining)
+
+    if len(remaining) == len(current):
+        await update.message.reply_text(f"❌ `{args[0]}` rule မတွေ့ပါ!", parse_mode="Markdown")
+        return
+    await update.message.reply_text(f"✅ `{args[0]}` rule ဖျက်ပြီးပါပြီ!", parse_mode="Markdown")
+
+async def rules_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    current = load_data().get("auto_confirm", {}).get("rules", [])
+    if not current:
+        await update.message.reply_text("📜 Auto-confirm rule မရှိပါ။ Order အားလုံး admin confirm လိုပါတယ်။")
+        return
+
+    msg = "📜 **Auto-confirm Rules** (အပေါ်ကနေ စစ်ပါတယ်)\n\n"
+    for rule in current:
+        msg += f"• `{rule['name']}`: {rules.describe_rule(rule)}\n"
+    await update.message.reply_text(msg, parse_mode="Markdown")
+
+async def addreply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    # Keep the response's own line breaks: parse the raw text, not context.args
+    parts = update.message.text.split(None, 1)
+    try:
+        rule = autoreply.parse_rule(parts[1] if len(parts) > 1 else "")
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\n"
+            "**မှန်ကန်တဲ့ format**: `/addreply <name> <keyword1,keyword2> | <reply>`\n\n"
+            "**ဥပမာ**: `/addreply kpay kpay,ငွေလွှဲ | 💳 ငွေဖြည့်ရန် /topup ကို သုံးပါ`",
+            parse_mode="Markdown"
+        )
+        return
+
+    with data_transaction() as data:
+        current = [r for r in autoreply.get_rules(data) if r["name"] != rule["name"]]
+        current.append(rule)
+        autoreply.set_rules(data, current)
+    load_auto_replies()
+
+    await update.message.reply_text(
+        f"✅ **Auto-reply ထည့်ပြီးပါပြီ!**\n\n"
+        f"💬 `{rule['name']}`: {', '.join(rule['keywords'])}",
+        parse_mode="Markdown"
+    )
+
+async def delreply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if len(args) != 1:
+        await update.message.reply_text("❌ မှန်ကန်တဲ့ format: `/delreply <name>`", parse_mode="Markdown")
+        return
+
+    with data_transaction() as data:
+        current = autoreply.get_rules(data)
+        remaining = [r for r in current if r["name"] != args[0]]
+        if len(remaining) != len(current):
+            autoreply.set_rules(data, remaining)
+    load_auto_replies()
+
+    if len(remaining) == len(current):
+        await update.message.reply_text(f"❌ `{args[0]}` auto-reply မရှိပါ!", parse_mode="Markdown")
+        return
+    await update.message.reply_text(f"✅ `{args[0]}` auto-reply ဖျက်ပြီးပါပြီ!", parse_mode="Markdown")
+
+async def replies_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    current = autoreply.get_rules(load_data())
+    if not current:
+        await update.message.reply_text("💬 Auto-reply မရှိပါ။ Default reply သာ ပို့ပါမယ်။")
+        return
+
+    msg = "💬 **Auto-replies** (အပေါ်ကနေ စစ်ပါတယ်)\n\n"
+    for rule in current:
+        msg += f"• `{rule['name']}`: {messages.escape(', '.join(rule['keywords']))}\n"
+    msg += f"\n⏱️ Group cooldown: {AUTO_REPLY_COOLDOWN}s"
+    await update.message.reply_text(msg, parse_mode="Markdown")
+
+async def ban_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if not args or not all(validate_game_id(arg) for arg in args):
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့ format: `/ban <game_id> [game_id ...]`\n\n"
+            "**ဥပမာ**: `/ban 123456789 987654321`\n\n"
+            "📄 ဖိုင်နဲ့ အများကြီး ထည့်ရန် .txt ဖိုင်ကို reply လုပ်ပြီး `/banimport` သုံးပါ။",
+            parse_mode="Markdown"
+        )
+        return
+
+    with data_transaction() as data:
+        added = update_banned_ids(data, add=args)
+    load_banned_ids(data)
+
+    await update.message.reply_text(
+        f"✅ **Game ID Ban လုပ်ပြီးပါပြီ!**\n\n"
+        f"🚫 အသစ်: {len(added)}\n"
+        f"📝 Total banned: {len(BANNED_GAME_IDS)}",
+        parse_mode="Markdown"
+    )
+
+async def unban_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if not args:
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့ format: `/unban <game_id> [game_id ...]`",
+            parse_mode="Markdown"
+        )
+        return
+
+    with data_transaction() as data:
+        removed = update_banned_ids(data, remove=args)
+    load_banned_ids(data)
+
+    await update.message.reply_text(
+        f"✅ **Game ID Unban လုပ်ပြီးပါပြီ!**\n\n"
+        f"🔓 ဖယ်ရှားပြီး: {len(removed)}\n"
+        f"📝 Total banned: {len(BANNED_GAME_IDS)}",
+        parse_mode="Markdown"
+    )
+
+async def banimport_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    # Check if message is a reply to a document
+    reply = update.message.reply_to_message
+    if not reply or not reply.document:
+        await update.message.reply_text(
+            "❌ Game ID ဖိုင်ကို reply လုပ်ပြီး `/banimport` command သုံးပါ\n\n"
+            "📄 တစ်ကြောင်းလျှင် Game ID တစ်ခု (.txt / .csv)",
+            parse_mode="Markdown"
+        )
+        return
+
+    file = await context.bot.get_file(reply.document.file_id)
+    content = bytes(await file.download_as_bytearray()).decode("utf-8", errors="ignore")
+
+    valid = set()
+    invalid = 0
+    for line in content.splitlines():
+        game_id = line.split(",", 1)[0].strip()
+        if not game_id:
+            continue
+        if validate_game_id(game_id):
+            valid.add(game_id)
+        else:
+            invalid += 1
+
+    with data_transaction() as data:
+        added = update_banned_ids(data, add=valid)
+    load_banned_ids(data)
+
+    await update.message.reply_text(
+        f"✅ **Ban List Import အောင်မြင်ပါပြီ!**\n\n"
+        f"🚫 အသစ်: {len(added)}\n"
+        f"⚠️ မှားနေသော lines: {invalid}\n"
+        f"📝 Total banned: {len(BANNED_GAME_IDS)}",
         parse_mode="Markdown"
     )
 
@@ -1097,7 +2259,8 @@ async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text="🙏 ဝယ်ယူအားပေးမှုအတွက် ကျေးဇူးအများကြီးတင်ပါတယ်။\n\n✅ Order Done! 🎉"
         )
         await update.message.reply_text("✅ User ထံ message ပေးပြီးပါပြီ။")
-    except:
+    except Exception as e:
+        logger.warning("done message failed", extra={"user_id": target_user_id, "error": str(e)})
         await update.message.reply_text("❌ User ID မှားနေပါတယ်။ Message မပို့နိုင်ပါ။")
 
 async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1121,7 +2284,8 @@ async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text=message
         )
         await update.message.reply_text("✅ Message ပေးပြီးပါပြီ။")
-    except:
+    except Exception as e:
+        logger.warning("reply to user failed", extra={"user_id": target_user_id, "error": str(e)})
         await update.message.reply_text("❌ Message မပို့နိုင်ပါ။")
 
 async def authorize_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1138,15 +2302,14 @@ async def authorize_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     target_user_id = args[0]
-    load_authorized_users()
+    with data_transaction() as data:
+        added = update_authorized_users(data, add=[target_user_id])
+    load_authorized_users(data)
 
-    if target_user_id in AUTHORIZED_USERS:
+    if not added:
         await update.message.reply_text("ℹ️ User ကို အရင်က authorize လုပ်ထားပြီးပါပြီ။")
         return
 
-    AUTHORIZED_USERS.add(target_user_id)
-    save_authorized_users()
-
     # Clear any restrictions when authorizing
     if target_user_id in user_states:
         del user_states[target_user_id]
@@ -1159,8 +2322,8 @@ async def authorize_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                  "✅ Owner က သင့်ကို bot အသုံးပြုခွင့် ပေးပါပြီ။\n\n"
                  "🚀 ယခုအခါ `/start` နှိပ်ပြီး bot ကို အသုံးပြုနိုင်ပါပြီ!"
         )
-    except:
-        pass
+    except Exception as e:
+        logger.warning("authorization notice failed", extra={"user_id": target_user_id, "error": str(e)})
 
     await update.message.reply_text(
         f"✅ **User Authorize အောင်မြင်ပါပြီ!**\n\n"
@@ -1184,15 +2347,14 @@ async def unauthorize_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     target_user_id = args[0]
-    load_authorized_users()
+    with data_transaction() as data:
+        removed = update_authorized_users(data, remove=[target_user_id])
+    load_authorized_users(data)
 
-    if target_user_id not in AUTHORIZED_USERS:
+    if not removed:
         await update.message.reply_text("ℹ️ User သည် authorize မလုပ်ထားပါ။")
         return
 
-    AUTHORIZED_USERS.remove(target_user_id)
-    save_authorized_users()
-
     # Notify user
     try:
         await context.bot.send_message(
@@ -1201,8 +2363,8 @@ async def unauthorize_command(update: Update, context: ContextTypes.DEFAULT_TYPE
                  "❌ Owner က သင့်ရဲ့ bot အသုံးပြုခွင့်ကို ရုပ်သိမ်းလိုက်ပါပြီ။\n\n"
                  "📞 ပြန်လည် အသုံးပြုရန် Owner ကို ဆက်သွယ်ပါ။"
         )
-    except:
-        pass
+    except Exception as e:
+        logger.warning("unauthorization notice failed", extra={"user_id": target_user_id, "error": str(e)})
 
     await update.message.reply_text(
         f"✅ **User Unauthorize အောင်မြင်ပါပြီ!**\n\n"
@@ -1265,7 +2427,121 @@ async def maintenance_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         parse_mode="Markdown"
     )
 
-async def setprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def setprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if len(args) != 2:
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့အတိုင်း: `/setprice <item> <price>`\n\n"
+            "**ဥပမာ:**\n"
+            "• `/setprice wp1 7000`\n"
+            "• `/setprice 86 5500`\n"
+            "• `/setprice 12976 750000`"
+        )
+        return
+
+    item = args[0]
+    try:
+        price = int(args[1])
+        if price < 0:
+            await update.message.reply_text("❌ ဈေးနှုန်း သုညထက် ကြီးရမည်!")
+            return
+    except ValueError:
+        await update.message.reply_text("❌ ဈေးနှုန်း ကိန်းဂဏန်းဖြင့် ထည့်ပါ!")
+        return
+
+    with data_transaction() as data:
+        pricing.set_custom_price(data, item, price)
+
+    await update.message.reply_text(
+        f"✅ **ဈေးနှုန်း ပြောင်းလဲပါပြီ!**\n\n"
+        f"💎 Item: `{item}`\n"
+        f"💰 New Price: `{price:,} MMK`\n\n"
+        f"📝 Users တွေ `/price` နဲ့ အသစ်တွေ့မယ်။",
+        parse_mode="Markdown"
+    )
+
+async def removeprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if len(args) != 1:
+        await update.message.reply_text(
+            "❌ မှန်ကန်တဲ့အတိုင်း: `/removeprice <item>`\n\n"
+            "**ဥပမာ:** `/removeprice wp1`"
+        )
+        return
+
+    item = args[0]
+    with data_transaction() as data:
+        removed = pricing.set_custom_price(data, item, None)
+
+    if not removed:
+        await update.message.reply_text(f"❌ `{item}` မှာ custom price မရှိပါ!")
+        return
+
+    await update.message.reply_text(
+        f"✅ **Custom Price ဖျက်ပါပြီ!**\n\n"
+        f"💎 Item: `{item}`\n"
+        f"🔄 Default price ကို ပြန်သုံးပါမယ်။",
+        parse_mode="Markdown"
+    )
+
+async def override_price_command(update, context, command, example):
+    """Shared body of /tierprice and /userprice: `<owner> <item> <price|off>`"""
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if len(args) != 3 or not (args[2].isdigit() or args[2] == "off"):
+        await update.message.reply_text(
+            f"❌ မှန်ကန်တဲ့အတိုင်း: `/{command} <{'tier' if command == 'tierprice' else 'user_id'}> <item> <price|off>`\n\n"
+            f"**ဥပမာ:** `/{command} {example} 86 4900`",
+            parse_mode="Markdown"
+        )
+        return
+
+    owner, item = args[0].lower(), args[1]
+    price = None if args[2] == "off" else int(args[2])
+    with data_transaction() as data:
+        if command == "tierprice":
+            changed = pricing.set_tier_price(data, owner, item, price)
+        else:
+            changed = owner in data["users"] and pricing.set_user_price(data, owner, item, price)
+
+    if not changed:
+        await update.message.reply_text(f"❌ `{owner}` မှာ `{item}` price မရှိပါ!", parse_mode="Markdown")
+        return
+    await update.message.reply_text(
+        f"✅ **ဈေးနှုန်း ပြောင်းလဲပါပြီ!**\n\n"
+        f"🏷️ {'Tier' if command == 'tierprice' else 'User'}: `{owner}`\n"
+        f"💎 Item: `{item}`\n"
+        + (f"💰 New Price: `{price:,} MMK`" if price is not None else "🔄 ပုံမှန်ဈေးကို ပြန်သုံးပါမယ်။"),
+        parse_mode="Markdown"
+    )
+
+async def tierprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await override_price_command(update, context, "tierprice", "gold")
+
+async def userprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await override_price_command(update, context, "userprice", "123456789")
+
+async def promo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
 
     # Check if user is any admin
@@ -1274,39 +2550,29 @@ async def setprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     args = context.args
-    if len(args) != 2:
+    try:
+        if not args:
+            raise ValueError("promo name required")
+        promo = pricing.parse_promo(args[0], args[1:], datetime.now())
+    except ValueError as e:
         await update.message.reply_text(
-            "❌ မှန်ကန်တဲ့အတိုင်း: `/setprice <item> <price>`\n\n"
-            "**ဥပမာ:**\n"
-            "• `/setprice wp1 7000`\n"
-            "• `/setprice 86 5500`\n"
-            "• `/setprice 12976 750000`"
+            f"❌ {e}\n\n"
+            "**မှန်ကန်တဲ့ format**: `/promo <name> percent=N hours=N|until=YYYY-MM-DDTHH:MM [start=...] [skus=a,b] [tiers=a,b]`\n\n"
+            "**ဥပမာ**: `/promo thingyan percent=10 hours=48 skus=86,172`",
+            parse_mode="Markdown"
         )
         return
 
-    item = args[0]
-    try:
-        price = int(args[1])
-        if price < 0:
-            await update.message.reply_text("❌ ဈေးနှုန်း သုညထက် ကြီးရမည်!")
-            return
-    except ValueError:
-        await update.message.reply_text("❌ ဈေးနှုန်း ကိန်းဂဏန်းဖြင့် ထည့်ပါ!")
-        return
-
-    custom_prices = load_prices()
-    custom_prices[item] = price
-    save_prices(custom_prices)
+    with data_transaction() as data:
+        pricing.set_promo(data, promo)
 
     await update.message.reply_text(
-        f"✅ **ဈေးနှုန်း ပြောင်းလဲပါပြီ!**\n\n"
-        f"💎 Item: `{item}`\n"
-        f"💰 New Price: `{price:,} MMK`\n\n"
-        f"📝 Users တွေ `/price` နဲ့ အသစ်တွေ့မယ်။",
+        f"✅ **Promo ထည့်ပြီးပါပြီ!**\n\n"
+        f"🔥 `{promo['name']}`: {pricing.describe_promo(promo)}",
         parse_mode="Markdown"
     )
 
-async def removeprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def endpromo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
 
     # Check if user is any admin
@@ -1316,26 +2582,77 @@ async def removeprice_command(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     args = context.args
     if len(args) != 1:
-        await update.message.reply_text(
-            "❌ မှန်ကန်တဲ့အတိုင်း: `/removeprice <item>`\n\n"
-            "**ဥပမာ:** `/removeprice wp1`"
-        )
+        await update.message.reply_text("❌ မှန်ကန်တဲ့ format: `/endpromo <name>`", parse_mode="Markdown")
         return
 
-    item = args[0]             
-    custom_prices = load_prices()
-    
-    if item not in custom_prices:                
-        await update.message.reply_text(f"❌ `{item}` မှာ custom price မရှိပါ!")
+    with data_transaction() as data:
+        removed = pricing.remove_promo(data, args[0])
+
+    if not removed:
+        await update.message.reply_text(f"❌ `{args[0]}` promo မတွေ့ပါ!", parse_mode="Markdown")
+        return
+    await update.message.reply_text(f"✅ `{args[0]}` promo ဖျက်ပြီးပါပြီ!", parse_mode="Markdown")
+
+async def promos_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    config = load_data().get("pricing", {})
+    msg = "🏷️ **Pricing**\n\n"
+    for tier, prices in sorted(config.get("tiers", {}).items()):
+        msg += f"• Tier `{tier}`: " + ", ".join(f"{sku}={price:,}" for sku, price in prices.items()) + "\n"
+    for owner, prices in config.get("users", {}).items():
+        msg += f"• User `{owner}`: " + ", ".join(f"{sku}={price:,}" for sku, price in prices.items()) + "\n"
+    for promo in config.get("promos", []):
+        msg += f"• Promo `{promo['name']}`: {pricing.describe_promo(promo)}\n"
+    if msg.endswith("\n\n"):
+        msg += "Tier/user price နဲ့ promo မရှိပါ။"
+    await update.message.reply_text(msg, parse_mode="Markdown")
+
+async def inventory_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    # Check if user is any admin
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ သင်သည် admin မဟုတ်ပါ!")
+        return
+
+    args = context.args
+    if not args:
+        current = load_data().get("inventory", {})
+        if not current:
+            await update.message.reply_text("📦 Inventory မှတ်ထားတာ မရှိပါ။")
+            return
+        msg = "📦 **Inventory**\n\n"
+        for sku, entry in sorted(current.items()):
+            msg += f"• `{sku}`: {inventory.describe(entry)}\n"
+        await update.message.reply_text(msg, parse_mode="Markdown")
+        return
+
+    try:
+        change = inventory.parse_update(args[1:])
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\n"
+            "**မှန်ကန်တဲ့ format**: `/inventory <item> [stock=N|balance=N] [add=N] [cost=N] [low=N] [maintenance=on/off]`\n\n"
+            "**ဥပမာ**:\n"
+            "• `/inventory 86 stock=100 cost=4600 low=10`\n"
+            "• `/inventory wp1 balance=500000 cost=5600`\n"
+            "• `/inventory 86 add=50`",
+            parse_mode="Markdown"
+        )
         return
 
-    del custom_prices[item]
-    save_prices(custom_prices)
+    with data_transaction() as data:
+        entry = dict(inventory.apply_update(data, args[0], change))
 
     await update.message.reply_text(
-        f"✅ **Custom Price ဖျက်ပါပြီ!**\n\n"
-        f"💎 Item: `{item}`\n"
-        f"🔄 Default price ကို ပြန်သုံးပါမယ်။",
+        f"✅ **Inventory ပြင်ပြီးပါပြီ!**\n\n"
+        f"💎 `{args[0]}`: {inventory.describe(entry)}",
         parse_mode="Markdown"
     )
 
@@ -1578,18 +2895,17 @@ async def addadm_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     new_admin_id = int(args[0])
     
-    # Load data
-    data = load_data()
-    admin_list = data.get("admin_ids", [ADMIN_ID])
-    
-    if new_admin_id in admin_list:
+    with data_transaction() as data:
+        admin_list = data.get("admin_ids", [ADMIN_ID])
+        already_admin = new_admin_id in admin_list
+        if not already_admin:
+            admin_list.append(new_admin_id)
+            data["admin_ids"] = admin_list
+
+    if already_admin:
         await update.message.reply_text("ℹ️ User သည် admin ဖြစ်နေပြီးပါပြီ။")
         return
 
-    admin_list.append(new_admin_id)
-    data["admin_ids"] = admin_list
-    save_data(data)
-
     # Notify new admin
     try:
         await context.bot.send_message(
@@ -1602,8 +2918,8 @@ async def addadm_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                  "• Admin များကို ဖြုတ်လို့ မရပါ\n"
                  "• ကျန်တဲ့ commands တွေ အသုံးပြုလို့ ရပါတယ်"
         )
-    except:
-        pass
+    except Exception as e:
+        logger.warning("admin appointment notice failed", extra={"user_id": new_admin_id, "error": str(e)})
 
     await update.message.reply_text(
         f"✅ **Admin ထပ်မံထည့်သွင်းပါပြီ!**\n\n"
@@ -1636,18 +2952,17 @@ async def unadm_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Owner ကို ဖြုတ်လို့ မရပါ!")
         return
     
-    # Load data
-    data = load_data()
-    admin_list = data.get("admin_ids", [ADMIN_ID])
-    
-    if target_admin_id not in admin_list:
+    with data_transaction() as data:
+        admin_list = data.get("admin_ids", [ADMIN_ID])
+        is_listed = target_admin_id in admin_list
+        if is_listed:
+            admin_list.remove(target_admin_id)
+            data["admin_ids"] = admin_list
+
+    if not is_listed:
         await update.message.reply_text("ℹ️ User သည် admin မဟုတ်ပါ။")
         return
 
-    admin_list.remove(target_admin_id)
-    data["admin_ids"] = admin_list
-    save_data(data)
-
     # Notify removed admin
     try:
         await context.bot.send_message(
@@ -1656,8 +2971,8 @@ async def unadm_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                  "❌ Owner က သင့်ရဲ့ admin ရာထူးကို ရုပ်သိမ်းလိုက်ပါပြီ။\n\n"
                  "📞 အကြောင်းရင်း သိရှိရန် Owner ကို ဆက်သွယ်ပါ။"
         )
-    except:
-        pass
+    except Exception as e:
+        logger.warning("admin removal notice failed", extra={"user_id": target_admin_id, "error": str(e)})
 
     await update.message.reply_text(
         f"✅ **Admin ဖြုတ်ခြင်း အောင်မြင်ပါပြီ!**\n\n"
@@ -1702,7 +3017,8 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     parse_mode="Markdown"
                 )
                 user_success += 1
-            except:
+            except Exception as e:
+                logger.info("broadcast photo failed", extra={"user_id": uid, "error": str(e), "sample": "broadcast"})
                 user_fail += 1
         
         # Get all groups where bot is member (from order history)
@@ -1727,7 +3043,8 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     group_success += 1
                 else:
                     group_fail += 1
-            except:
+            except Exception as e:
+                logger.info("broadcast photo failed", extra={"chat_id": chat_id, "error": str(e), "sample": "broadcast"})
                 group_fail += 1
         
         # Report results
@@ -1771,7 +3088,8 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode="Markdown"
             )
             user_success += 1
-        except:
+        except Exception as e:
+            logger.info("broadcast failed", extra={"user_id": uid, "error": str(e), "sample": "broadcast"})
             user_fail += 1
     
     # Get all groups where bot is member (from order history)
@@ -1795,7 +3113,8 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 group_success += 1
             else:
                 group_fail += 1
-        except:
+        except Exception as e:
+            logger.info("broadcast failed", extra={"chat_id": chat_id, "error": str(e), "sample": "broadcast"})
             group_fail += 1
     
     # Report results
@@ -1824,16 +3143,39 @@ async def adminhelp_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         help_msg += (
             "👑 **Owner Commands:**\n"
             "• `/addadm <user_id>` - Admin ထပ်မံထည့်သွင်း\n"
-            "• `/unadm <user_id>` - Admin ဖြုတ်ခြင်း\n\n"
+            "• `/unadm <user_id>` - Admin ဖြုတ်ခြင်း\n"
+            "• `/addrule <name> [conditions]` - Auto-confirm rule ထည့်\n"
+            "• `/delrule <name>` - Auto-confirm rule ဖျက်\n\n"
         )
     
     help_msg += (
         "👥 **User Management:**\n"
         "• `/authorize <user_id>` - User အသုံးပြုခွင့်ပေး\n"
-        "• `/unauthorize <user_id>` - User အသုံးပြုခွင့်ရုပ်သိမ်း\n\n"
+        "• `/unauthorize <user_id>` - User အသုံးပြုခွင့်ရုပ်သိမ်း\n"
+        "• `/settier <user_id> <tier>` - User tier သတ်မှတ်\n"
+        "• `/rules` - Auto-confirm rules ကြည့်\n"
+        "• `/addreply name kw1,kw2 | reply` - Auto-reply ထည့်/ပြင်\n"
+        "• `/delreply name` - Auto-reply ဖျက်\n"
+        "• `/replies` - Auto-replies ကြည့်\n\n"
+        "🚫 **Banned Game IDs:**\n"
+        "• `/ban <game_id> [game_id ...]` - Game ID ban\n"
+        "• `/unban <game_id> [game_id ...]` - Game ID unban\n"
+        "• ဖိုင်ကို reply လုပ်ပြီး `/banimport` - ဖိုင်မှ အများကြီး ban\n\n"
         "💰 **Balance Management:**\n"
         "• `/approve <user_id> <amount>` - Topup approve လုပ်\n"
-        "• `/deduct <user_id> <amount>` - Balance နှုတ်ခြင်း\n\n"
+        "• `/deduct <user_id> <amount>` - Balance နှုတ်ခြင်း\n"
+        "• `/approveall <user_id> [user_id ...]` - Pending topup အားလုံး approve\n"
+        "• `/statement <user_id> [from] [to]` - User ရဲ့ ငွေစာရင်း\n"
+        "• `/checkledger [deep]` - Balance နဲ့ ledger ကိုက်ညီမှု စစ်\n\n"
+        "📦 **Bulk Orders:**\n"
+        "• `/confirmall [hours] [game_id]` - Pending order များ အားလုံး confirm\n"
+        "• `/cancelall [hours] [game_id]` - Pending order များ အားလုံး cancel (ငွေပြန်အမ်း)\n"
+        "• `/retry <order_id>` - Fulfillment failed order ကို ပြန်ပို့\n"
+        "• `/refund <order_id>` - Fulfillment failed order ကို cancel (ငွေပြန်အမ်း)\n\n"
+        "📊 **Reports:**\n"
+        "• `/export <orders/topups/balances> [csv/jsonl] [from] [to] [status]` - Data ထုတ်ယူ\n"
+        "• `/report [YYYY-MM-DD]` - နေ့စဉ် အရောင်း report\n"
+        "• `/rebuildstats` - Report data ကို history မှ ပြန်တွက်\n\n"
         "💬 **Communication:**\n"
         "• `/reply <user_id> <message>` - User ကို message ပို့\n"
         "• `/done <user_id>` - Order complete message ပို့\n"
@@ -1845,7 +3187,13 @@ async def adminhelp_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• `/maintenance <orders/topups/general> <on/off>` - Features ဖွင့်ပိတ်\n\n"
         "💎 **Price Management:**\n"
         "• `/setprice <item> <price>` - Custom price ထည့်\n"
-        "• `/removeprice <item>` - Custom price ဖျက်\n\n"
+        "• `/removeprice <item>` - Custom price ဖျက်\n"
+        "• `/tierprice <tier> <item> <price|off>` - Tier ဈေးနှုန်း\n"
+        "• `/userprice <user_id> <item> <price|off>` - User ဈေးနှုန်း\n"
+        "• `/promo <name> percent=N hours=N` - Promo ထည့်\n"
+        "• `/endpromo <name>` - Promo ဖျက်\n"
+        "• `/promos` - Tier/user prices နဲ့ promos ကြည့်\n"
+        "• `/inventory [item key=value ...]` - Stock/cost ကြည့်/ပြင်\n\n"
         "💳 **Payment Management:**\n"
         "• `/setwavenum <number>` - Wave နံပါတ် ပြောင်း\n"
         "• `/setkpaynum <number>` - KPay နံပါတ် ပြောင်း\n"
@@ -1908,74 +3256,64 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Set user state to restricted
     user_states[user_id] = "waiting_approval"
+    del pending_topups[user_id]
 
-    # Notify admin about topup request with user profile photo
-    admin_msg = (
-        f"💳 **ငွေဖြည့်တောင်းဆိုမှု**\n\n"
-        f"👤 User: [{update.effective_user.first_name}](tg://user?id={user_id})\n"
-        f"🆔 User ID: `{user_id}`\n"
-        f"💰 Amount: `{amount:,} MMK`\n"
-        f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        f"Screenshot ပါ ပါပါတယ်။ Approve လုပ်ရန်:\n"
-        f"`/approve {user_id} {amount}`"
+    await update.message.reply_text(
+        messages.render(
+            "screenshot_received", amount=amount,
+            time=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        ),
+        parse_mode="Markdown"
     )
 
+    # Downloading and checking the screenshot takes seconds; do it after the
+    # reply, in a task, so the updates queued behind this one aren't held up
+    context.application.create_task(
+        submit_topup(
+            context.bot, user_id, update.effective_user.first_name or "Unknown", amount,
+            update.message.photo, update.effective_chat.id, update.message.message_id
+        ),
+        update=update
+    )
+
+async def submit_topup(bot, user_id, user_name, amount, photo_sizes, chat_id, message_id):
+    """Hash and OCR a topup screenshot, store the topup and publish TopupSubmitted"""
     try:
-        # Try to send user's profile photo first
-        try:
-            user_photos = await context.bot.get_user_profile_photos(user_id=int(user_id), limit=1)
-            if user_photos.total_count > 0:
-                await context.bot.send_photo(
-                    chat_id=ADMIN_ID,
-                    photo=user_photos.photos[0][0].file_id,
-                    caption=admin_msg,
-                    parse_mode="Markdown"
-                )
-            else:
-                await context.bot.send_message(chat_id=ADMIN_ID, text=admin_msg, parse_mode="Markdown")
-        except:
-            await context.bot.send_message(chat_id=ADMIN_ID, text=admin_msg, parse_mode="Markdown")
-        
-        # Forward payment screenshot
-        await context.bot.forward_message(
-            chat_id=ADMIN_ID,
-            from_chat_id=update.effective_chat.id,
-            message_id=update.message.message_id
+        # Hash the screenshot against earlier receipts and OCR it, concurrently
+        receipt_hash, ocr_receipt = await asyncio.gather(
+            hash_receipt(bot, photo_sizes),
+            scan_receipt(bot, photo_sizes),
         )
-    except:
-        pass
-
-    # Save topup request first
-    data = load_data()
-    if user_id not in data["users"]:
-        data["users"][user_id] = {"name": "", "username": "", "balance": 0, "orders": [], "topups": []}
-
-    topup_request = {
-        "amount": amount,
-        "status": "pending",
-        "timestamp": datetime.now().isoformat()
-    }
-    data["users"][user_id]["topups"].append(topup_request)
-    save_data(data)
-
-    # Notify admin group
-    await notify_group_topup(topup_request, update.effective_user.first_name or "Unknown", user_id)
-
-    del pending_topups[user_id]
-
-    await update.message.reply_text(
-        f"✅ **Screenshot လက်ခံပါပြီ!**\n\n"
-        f"💰 ပမာဏ: `{amount:,} MMK`\n"
-        f"⏰ အချိန်: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        "🔒 **အသုံးပြုမှု ယာယီ ကန့်သတ်ပါ**\n"
-        "❌ Screenshot ပို့ပြီးပါပြီ။ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ:\n\n"
-        "❌ Commands အသုံးပြုလို့ မရပါ\n"
-        "❌ စာသား ပို့လို့ မရပါ\n"
-        "❌ Voice, Sticker, GIF, Video ပို့လို့ မရပါ\n"
-        "❌ Emoji ပို့လို့ မရပါ\n\n"
-        "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
-        "📞 ပြဿနာရှိရင် admin ကို ဆက်သွယ်ပါ။",
-        parse_mode="Markdown"
+    except Exception as e:
+        # The user already has their answer; the topup must still reach the admins
+        logger.warning("topup screenshot check failed", extra={"user_id": user_id, "error": str(e)})
+        receipt_hash = ocr_receipt = None
+    duplicates = receipt_index.find(receipt_hash) if receipt_hash else []
+    if duplicates:
+        logger.warning("topup screenshot matches earlier receipts", extra={"user_id": user_id, "matches": len(duplicates)})
+
+    topup_request = Topup(
+        amount=amount,
+        status=TopupStatus.PENDING,
+        timestamp=records.now_timestamp(),
+        receipt_hash=receipt_hash
+    ).to_dict()
+    if receipt_hash:
+        if duplicates:
+            topup_request["duplicate_of"] = [uid for _, uid, _, _ in duplicates]
+    if ocr_receipt:
+        topup_request["ocr"] = dict(ocr_receipt, verdict=ocr.verdict(ocr_receipt, amount))
+    with data_transaction() as data:
+        if user_id not in data["users"]:
+            data["users"][user_id] = {"name": "", "username": "", "balance": 0, "orders": [], "topups": []}
+        data["users"][user_id]["topups"].append(topup_request)
+    pending_index.add_topup(user_id, topup_request)
+    if receipt_hash:
+        receipt_index.add(receipt_hash, user_id, topup_request["timestamp"], amount)
+
+    event_bus.publish(
+        events.TopupSubmitted(user_id, user_name, topup_request, chat_id, message_id, tuple(duplicates)),
+        bot
     )
 
 async def send_to_group_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -2008,22 +3346,35 @@ async def send_to_group_command(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def notify_group_order(order_data, user_name, user_id):
     """Notify admin group about new order"""
+    try:
+        bot = Bot(token=BOT_TOKEN)
+        message = messages.render(
+            "group_new_order",
+            order_id=order_data['order_id'], user_name=user_name, user_id=user_id,
+            game_id=order_data['game_id'], server_id=order_data['server_id'],
+            amount=order_data['amount'], price=order_data['price'],
+            time=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        await bot.send_message(chat_id=ADMIN_GROUP_ID, text=message, parse_mode="Markdown")
+    except Exception as e:
+        logger.warning("group notification failed", extra={"error": str(e)})
+
+async def notify_group_cart(orders, batch_id, user_name, user_id):
+    """Notify admin group about a cart order with one message"""
     try:
         bot = Bot(token=BOT_TOKEN)
         message = (
-            f"🛒 **အော်ဒါအသစ် ရောက်ပါပြီ!**\n\n"
-            f"📝 Order ID: `{order_data['order_id']}`\n"
+            f"🛒 **Cart အော်ဒါအသစ် ရောက်ပါပြီ!**\n\n"
+            f"📦 Cart ID: `{batch_id}`\n"
             f"👤 User: [{user_name}](tg://user?id={user_id})\n"
-            f"🎮 Game ID: `{order_data['game_id']}`\n"
-            f"🌐 Server ID: `{order_data['server_id']}`\n"
-            f"💎 Amount: {order_data['amount']}\n"
-            f"💰 Price: {order_data['price']:,} MMK\n"
+            f"🛒 Orders: {len(orders)}\n"
+            f"💰 Total: {sum(order['price'] for order in orders):,} MMK\n"
             f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            f"#NewOrder #MLBB"
+            f"#NewOrder #Cart #MLBB"
         )
         await bot.send_message(chat_id=ADMIN_GROUP_ID, text=message, parse_mode="Markdown")
     except Exception as e:
-        print(f"Group notification error: {e}")
+        logger.warning("group notification failed", extra={"error": str(e)})
 
 async def notify_group_topup(topup_data, user_name, user_id):
     """Notify admin group about new topup request"""
@@ -2038,9 +3389,354 @@ async def notify_group_topup(topup_data, user_name, user_id):
             f"Approve လုပ်ရန်: `/approve {user_id} {topup_data['amount']}`\n\n"
             f"#TopupRequest #Payment"
         )
+        if topup_data.get("ocr"):
+            message += f"\n\n{OCR_VERDICT_TEXT[topup_data['ocr']['verdict']]}"
+        if topup_data.get("duplicate_of"):
+            message += (
+                f"\n\n⚠️ Screenshot ထပ်နေပါသည် - users: {', '.join(topup_data['duplicate_of'])}\n"
+                f"#DuplicateReceipt"
+            )
         await bot.send_message(chat_id=ADMIN_GROUP_ID, text=message, parse_mode="Markdown")
     except Exception as e:
-        print(f"Group topup notification error: {e}")
+        logger.warning("group topup notification failed", extra={"error": str(e)})
+
+async def send_quietly(bot, **kwargs):
+    """send_message that logs instead of raising; returns the sent Message, or None"""
+    try:
+        return await bot.send_message(**kwargs)
+    except Exception as e:
+        logger.warning("message send failed", extra={"chat_id": kwargs.get("chat_id"), "error": str(e)})
+        return None
+
+async def edit_quietly(bot, **kwargs):
+    """edit_message_text that logs instead of raising"""
+    try:
+        await bot.edit_message_text(**kwargs)
+    except Exception as e:
+        logger.warning("message edit failed", extra={"chat_id": kwargs.get("chat_id"), "message_id": kwargs.get("message_id"), "error": str(e)})
+
+def format_record_time(record):
+    """'YYYY-MM-DD HH:MM:SS' from a record's ISO timestamp"""
+    return record["timestamp"][:19].replace("T", " ")
+
+def order_status_text(order):
+    """Status line of a single-order admin card"""
+    status = order["status"]
+    if status == OrderStatus.PENDING:
+        return messages.render("order_status_pending")
+    if status == OrderStatus.CANCELLED:
+        return f"❌ ငြင်းပယ်ပြီး ({order.get('cancelled_by', '?')})"
+    if status in (OrderStatus.CONFIRMED, OrderStatus.PROCESSING, OrderStatus.DELIVERED):
+        if order.get("auto_rule"):
+            return f"✅ Auto-confirmed ({order['auto_rule']})"
+        return f"✅ လက်ခံပြီး ({order.get('confirmed_by', '?')})"
+    return f"{HISTORY_STATUS_EMOJI.get(status, '⏳')} {status}"
+
+def order_admin_card(user_id, user_name, orders, batch_id=None):
+    """Admin card text and buttons for a single or cart order, reflecting current statuses"""
+    if batch_id:
+        card_lines = []
+        keyboard = []
+        for index, order in enumerate(orders, 1):
+            mark = HISTORY_STATUS_EMOJI.get(order["status"], "⏳")
+            card_lines.append(
+                f"{index}. `{order['order_id']}` | {order['game_id']} ({order['server_id']}) | "
+                f"{order['amount']} | {order['price']:,} MMK {mark}"
+            )
+            if order["status"] == OrderStatus.PENDING:
+                keyboard.append([
+                    InlineKeyboardButton(f"✅ {index}", callback_data=f"order_confirm_{order['order_id']}"),
+                    InlineKeyboardButton(f"❌ {index}", callback_data=f"order_cancel_{order['order_id']}")
+                ])
+        text = (
+            f"🛒 **Cart အော်ဒါအသစ်ရောက်ပါပြီ!** ({len(orders)} ခု)\n\n"
+            f"📦 Cart ID: `{batch_id}`\n"
+            f"👤 User: [{user_name}](tg://user?id={user_id})\n"
+            f"🆔 User ID: `{user_id}`\n"
+            f"💰 Total: {sum(order['price'] for order in orders):,} MMK\n"
+            f"⏰ Time: {format_record_time(orders[0])}\n\n"
+            + "\n".join(card_lines)
+        )
+        return text, InlineKeyboardMarkup(keyboard) if keyboard else None
+
+    order = orders[0]
+    reply_markup = None
+    if order["status"] == OrderStatus.PENDING:
+        # Confirm/cancel buttons for every admin
+        reply_markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ Confirm", callback_data=f"order_confirm_{order['order_id']}"),
+            InlineKeyboardButton("❌ Cancel", callback_data=f"order_cancel_{order['order_id']}")
+        ]])
+    text = messages.render(
+        "admin_new_order",
+        order_id=order["order_id"], user_name=user_name, user_id=user_id,
+        game_id=order["game_id"], server_id=order["server_id"], amount=order["amount"],
+        price=order["price"], time=format_record_time(order), status=order_status_text(order)
+    )
+    return text, reply_markup
+
+def record_admin_cards(user_id, order_ids, cards):
+    """Store [admin_id, message_id] of every admin's card on its orders, for later edits"""
+    with data_transaction() as data:
+        for order in reversed(data["users"].get(user_id, {}).get("orders", [])):
+            if order["order_id"] in order_ids:
+                order["admin_cards"] = cards
+
+@event_bus.subscribe(events.OrderCreated)
+async def notify_admins_new_order(event, bot):
+    text, reply_markup = order_admin_card(event.user_id, event.user_name, event.orders, event.batch_id)
+    sent = await asyncio.gather(*(
+        send_quietly(bot, chat_id=admin_id, text=text, parse_mode="Markdown", reply_markup=reply_markup)
+        for admin_id in event.admin_ids
+    ))
+    cards = [[admin_id, message.message_id] for admin_id, message in zip(event.admin_ids, sent) if message]
+    if cards:
+        record_admin_cards(event.user_id, {order["order_id"] for order in event.orders}, cards)
+
+@event_bus.subscribe(events.OrderCreated)
+async def notify_group_new_order(event, bot):
+    if event.batch_id:
+        await notify_group_cart(list(event.orders), event.batch_id, event.user_name, event.user_id)
+    else:
+        await notify_group_order(event.orders[0], event.user_name, event.user_id)
+
+@event_bus.subscribe(events.OrderCreated)
+async def fulfill_auto_confirmed(event, bot):
+    for order in event.orders:
+        if order["status"] == OrderStatus.CONFIRMED:
+            submit_for_fulfillment(order["order_id"])
+
+@event_bus.subscribe(events.OrderConfirmed)
+async def fulfill_confirmed(event, bot):
+    submit_for_fulfillment(event.order["order_id"])
+
+async def notify_other_admins(bot, event):
+    """Old-style notice to every admin except the one who acted, for cards without stored message IDs"""
+    order = event.order
+    if isinstance(event, events.OrderConfirmed):
+        title, acted, status_line = "✅ **Order Confirmed!**", "Confirmed", "✅ လက်ခံပြီး"
+        money_line = f"💰 Price: {order['price']:,} MMK"
+    else:
+        title, acted, status_line = "❌ **Order Cancelled!**", "Cancelled", "❌ ငြင်းပယ်ပြီး"
+        money_line = f"💰 Refunded: {event.refund:,} MMK"
+    sends = []
+    for admin_id in event.admin_ids:
+        if event.admin_id is not None and admin_id == int(event.admin_id):
+            continue
+        text = f"{title}\n\n📝 Order ID: `{order['order_id']}`\n"
+        if admin_id == ADMIN_ID:
+            text += f"👤 {acted} by: {messages.escape(event.admin_name)}\n"
+        text += (
+            f"🎮 Game ID: `{order['game_id']}`\n"
+            f"🌐 Server ID: `{order['server_id']}`\n"
+            f"💎 Amount: {messages.escape(order['amount'])}\n"
+            f"{money_line}\n"
+            f"📊 Status: {status_line}"
+        )
+        sends.append(send_quietly(bot, chat_id=admin_id, text=text, parse_mode="Markdown"))
+    await asyncio.gather(*sends)
+
+# (chat_id, message_id) -> [lock, version last shown] for admin cards edited by update_admin_cards
+admin_card_edits = OrderedDict()
+
+async def edit_admin_card(bot, chat_id, message_id, version, **kwargs):
+    """
+    Edit one admin card unless this or a newer version of it was already shown.
+    Edits of a card run one at a time, so a slow edit of an older render
+    can't land after a newer one. (Only within this process.)
+    """
+    key = (chat_id, message_id)
+    entry = admin_card_edits.setdefault(key, [asyncio.Lock(), -1])
+    admin_card_edits.move_to_end(key)
+    while len(admin_card_edits) > RECENT_ORDERS_MAX:
+        admin_card_edits.popitem(last=False)
+    async with entry[0]:
+        if version <= entry[1]:
+            return
+        await edit_quietly(bot, chat_id=chat_id, message_id=message_id, **kwargs)
+        entry[1] = version
+
+def render_order_card(data, user_id, order):
+    """(text, reply_markup, version) of the admin card for an order, or for its whole cart"""
+    user_data = data["users"].get(user_id, {})
+    batch_id = order.get("batch_id")
+    orders = [order]
+    if batch_id:
+        # A cart card lists every order of the cart with its current status
+        orders = [o for o in user_data.get("orders", []) if o.get("batch_id") == batch_id] or orders
+    text, reply_markup = order_admin_card(user_id, user_data.get("name", "Unknown"), orders, batch_id)
+    # Every status change bumps an order's rev, so a later state of the card has a higher sum
+    return text, reply_markup, sum(o.get("rev", 0) for o in orders)
+
+async def edit_own_card(bot, message, data, user_id, order):
+    """Re-render the card the admin pressed, from the store as the press left it"""
+    text, reply_markup, version = render_order_card(data, user_id, order)
+    await edit_admin_card(
+        bot, message.chat_id, message.message_id, version,
+        text=text, parse_mode="Markdown", reply_markup=reply_markup
+    )
+
+@event_bus.subscribe(events.OrderConfirmed)
+@event_bus.subscribe(events.OrderCancelled)
+async def update_admin_cards(event, bot):
+    """
+    Edit every admin's card in place. The pressing admin's card was already
+    edited by the callback at this version, so edit_admin_card skips it;
+    bulk commands and expiry have no callback and rely on this.
+    """
+    order = event.order
+    cards = order.get("admin_cards")
+    if not cards:
+        # Expired orders are summed up for the admins by expire_pending_job
+        if not getattr(event, "expired", False):
+            await notify_other_admins(bot, event)
+        return
+    text, reply_markup, version = render_order_card(load_data(), event.user_id, order)
+    await asyncio.gather(*(
+        edit_admin_card(
+            bot, chat_id, message_id, version, text=text,
+            parse_mode="Markdown", reply_markup=reply_markup
+        )
+        for chat_id, message_id in cards
+    ))
+
+@event_bus.subscribe(events.OrderConfirmed)
+async def notify_chat_order_confirmed(event, bot):
+    """Update the chat where the order was placed"""
+    order = event.order
+    await send_quietly(
+        bot,
+        chat_id=order.get("chat_id", int(event.user_id)),
+        text=f"✅ **Order လက်ခံပြီးပါပြီ!**\n\n"
+             f"📝 Order ID: `{order['order_id']}`\n"
+             f"👤 User: {messages.escape(event.user_name)}\n"
+             f"🎮 Game ID: `{order['game_id']}`\n"
+             f"🌐 Server ID: `{order['server_id']}`\n"
+             f"💎 Amount: {messages.escape(order['amount'])}\n"
+             f"📊 Status: ✅ လက်ခံပြီး\n\n"
+             "💎 Diamonds များကို 5-30 မိနစ်အတွင်း ရရှိပါမယ်။",
+        parse_mode="Markdown"
+    )
+
+@event_bus.subscribe(events.OrderCancelled)
+async def notify_chat_order_cancelled(event, bot):
+    """Update the chat where the order was placed"""
+    order = event.order
+    if event.expired:
+        await send_quietly(
+            bot,
+            chat_id=order.get("chat_id", int(event.user_id)),
+            text=f"⌛ **Order သက်တမ်းကုန်သွားပါပြီ!**\n\n"
+                 f"📝 Order ID: `{order['order_id']}`\n"
+                 f"🎮 Game ID: `{order['game_id']}`\n"
+                 f"💎 Amount: {messages.escape(order['amount'])}\n"
+                 f"💰 ငွေပြန်အမ်း: {event.refund:,} MMK\n\n"
+                 "📞 မေးခွန်းရှိရင် admin ကို ဆက်သွယ်ပါ။",
+            parse_mode="Markdown"
+        )
+        return
+    await send_quietly(
+        bot,
+        chat_id=order.get("chat_id", int(event.user_id)),
+        text=f"❌ **Order ငြင်းပယ်ခံရပါပြီ!**\n\n"
+             f"📝 Order ID: `{order['order_id']}`\n"
+             f"👤 User: {messages.escape(event.user_name)}\n"
+             f"🎮 Game ID: `{order['game_id']}`\n"
+             f"🌐 Server ID: `{order['server_id']}`\n"
+             f"💎 Amount: {messages.escape(order['amount'])}\n"
+             f"📊 Status: ❌ ငြင်းပယ်ပြီး\n"
+             f"💰 ငွေပြန်အမ်း: {event.refund:,} MMK\n\n"
+             "📞 အကြောင်းရင်း သိရှိရန် admin ကို ဆက်သွယ်ပါ။",
+        parse_mode="Markdown"
+    )
+
+@event_bus.subscribe(events.TopupSubmitted)
+async def notify_admin_topup(event, bot):
+    """Topup request with the user's profile photo, then the forwarded screenshot"""
+    amount = event.topup["amount"]
+    admin_msg = (
+        f"💳 **ငွေဖြည့်တောင်းဆိုမှု**\n\n"
+        f"👤 User: [{event.user_name}](tg://user?id={event.user_id})\n"
+        f"🆔 User ID: `{event.user_id}`\n"
+        f"💰 Amount: `{amount:,} MMK`\n"
+        f"⏰ Time: {format_record_time(event.topup)}\n\n"
+        f"Screenshot ပါ ပါပါတယ်။ Approve လုပ်ရန်:\n"
+        f"`/approve {event.user_id} {amount}`"
+    )
+    if event.topup.get("ocr"):
+        admin_msg += "\n\n" + describe_ocr_receipt(event.topup["ocr"], amount)
+    if event.duplicates:
+        admin_msg += "\n\n" + describe_duplicate_receipts(event.duplicates)
+
+    try:
+        user_photos = await bot.get_user_profile_photos(user_id=int(event.user_id), limit=1)
+        if user_photos.total_count > 0:
+            await bot.send_photo(
+                chat_id=ADMIN_ID,
+                photo=user_photos.photos[0][0].file_id,
+                caption=admin_msg,
+                parse_mode="Markdown"
+            )
+        else:
+            await bot.send_message(chat_id=ADMIN_ID, text=admin_msg, parse_mode="Markdown")
+    except Exception:
+        await send_quietly(bot, chat_id=ADMIN_ID, text=admin_msg, parse_mode="Markdown")
+
+    await bot.forward_message(chat_id=ADMIN_ID, from_chat_id=event.chat_id, message_id=event.message_id)
+
+@event_bus.subscribe(events.TopupSubmitted)
+async def notify_group_new_topup(event, bot):
+    await notify_group_topup(event.topup, event.user_name, event.user_id)
+
+@event_bus.subscribe(events.TopupApproved)
+async def notify_user_topup_approved(event, bot):
+    await send_quietly(
+        bot,
+        chat_id=int(event.user_id),
+        text=f"✅ **ငွေဖြည့်မှု အတည်ပြုပါပြီ!** 🎉\n\n"
+             f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+             f"💰 **ပမာဏ:** `{event.amount:,} MMK`\n"
+             f"💳 **လက်ကျန်ငွေ:** `{event.balance:,} MMK`\n"
+             f"⏰ **အချိန်:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+             f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+             "🎉 **ယခုအခါ diamonds များ ဝယ်ယူနိုင်ပါပြီ!** 💎\n\n"
+             "⚡ အမြန်ဆုံး diamonds များကို `/mmb` command နဲ့ မှာယူပါ ⚡\n\n"
+             "🔓 **Bot လုပ်ဆောင်ချက်များ ပြန်လည် အသုံးပြုနိုင်ပါပြီ!**",
+        parse_mode="Markdown"
+    )
+
+@event_bus.subscribe(events.BalanceDeducted)
+async def notify_user_balance_deducted(event, bot):
+    await send_quietly(
+        bot,
+        chat_id=int(event.user_id),
+        text=f"⚠️ **လက်ကျန်ငွေ နှုတ်ခံရမှု**\n\n"
+             f"💰 နှုတ်ခံရတဲ့ပမာဏ: `{event.amount:,} MMK`\n"
+             f"💳 လက်ကျန်ငွေ: `{event.balance:,} MMK`\n"
+             f"⏰ အချိန်: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+             "📞 မေးခွန်းရှိရင် admin ကို ဆက်သွယ်ပါ။",
+        parse_mode="Markdown"
+    )
+
+@event_bus.subscribe(events.StockAlert)
+async def notify_admins_stock_alert(event, bot):
+    if event.kind == inventory.DEPLETED:
+        text = (
+            f"⛔ **Stock ကုန်သွားပါပြီ!**\n\n"
+            f"💎 Item: `{event.sku}`\n"
+            f"📦 Left: {event.units}\n\n"
+            f"🔧 Order အသစ်တွေ ယာယီ ရပ်ထားပါတယ်။ `/inventory {event.sku} add=N` နဲ့ ပြန်ဖြည့်ပါ။"
+        )
+    else:
+        text = (
+            f"⚠️ **Stock နည်းနေပါပြီ!**\n\n"
+            f"💎 Item: `{event.sku}`\n"
+            f"📦 Left: {event.units}"
+        )
+    await asyncio.gather(*(
+        send_quietly(bot, chat_id=admin_id, text=text, parse_mode="Markdown")
+        for admin_id in event.admin_ids
+    ))
 
 async def handle_restricted_content(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all non-command messages for restricted users"""
@@ -2051,8 +3747,7 @@ async def handle_restricted_content(update: Update, context: ContextTypes.DEFAUL
     if not is_user_authorized(user_id):
         # For unauthorized users, give AI reply
         if update.message.text:
-            reply = simple_reply(update.message.text)
-            await update.message.reply_text(reply, parse_mode="Markdown")
+            await send_auto_reply(update)
         return
 
     # Check if user is restricted after sending screenshot
@@ -2063,23 +3758,12 @@ async def handle_restricted_content(update: Update, context: ContextTypes.DEFAUL
             return
 
         # Block all other content types
-        await update.message.reply_text(
-            "❌ **အသုံးပြုမှု ကန့်သတ်ထားပါ!**\n\n"
-            "🔒 Screenshot ပို့ပြီးပါပြီ။ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ:\n\n"
-            "❌ Commands အသုံးပြုလို့ မရပါ\n"
-            "❌ စာသား ပို့လို့ မရပါ\n"
-            "❌ Voice, Sticker, GIF, Video ပို့လို့ မရပါ\n"
-            "❌ Emoji ပို့လို့ မရပါ\n\n"
-            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
-            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။",
-            parse_mode="Markdown"
-        )
+        await update.message.reply_text(messages.render("restricted_content"), parse_mode="Markdown")
         return
 
     # For authorized users, provide simple auto-reply
     if update.message.text:
-        reply = simple_reply(update.message.text)
-        await update.message.reply_text(reply, parse_mode="Markdown")
+        await send_auto_reply(update)
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -2087,103 +3771,47 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     admin_name = query.from_user.first_name or "Admin"
 
     # Handle order confirm/cancel
+    if query.data.startswith(("order_confirm_", "order_cancel_")) and not first_delivery(query.id):
+        await query.answer()
+        return
+
     if query.data.startswith("order_confirm_"):
         order_id = query.data.replace("order_confirm_", "")
-        data = load_data()
-        
-        # Check if order already processed
-        order_found = False
-        target_user_id = None
-        order_details = None
-        
-        for uid, user_data in data["users"].items():
-            for order in user_data.get("orders", []):
-                if order["order_id"] == order_id:
-                    # Check if already processed
-                    if order.get("status") in ["confirmed", "cancelled"]:
-                        await query.answer("⚠️ Order ကို လုပ်ဆောင်ပြီးပါပြီ!", show_alert=True)
-                        # Remove buttons from current message
-                        try:
-                            await query.edit_message_reply_markup(reply_markup=None)
-                        except:
-                            pass
-                        return
-                    
-                    order["status"] = "confirmed"
-                    order["confirmed_by"] = admin_name
-                    order["confirmed_at"] = datetime.now().isoformat()
-                    order_found = True
-                    target_user_id = uid
-                    order_details = order
-                    break
-            if order_found:
-                break
-        
-        if order_found:
-            save_data(data)
-            
-            # Remove buttons from current admin's message
-            try:
-                await query.edit_message_text(
-                    text=query.message.text.replace("⏳ စောင့်ဆိုင်းနေသည်", "✅ လက်ခံပြီး"),
-                    parse_mode="Markdown",
-                    reply_markup=None
-                )
-            except:
-                pass
-            
-            # Notify all other admins and remove their buttons
-            admin_list = data.get("admin_ids", [ADMIN_ID])
-            for admin_id in admin_list:
-                if admin_id != int(user_id):
-                    try:
-                        if admin_id == ADMIN_ID:
-                            notification_msg = (
-                                f"✅ **Order Confirmed!**\n\n"
-                                f"📝 Order ID: `{order_id}`\n"
-                                f"👤 Confirmed by: {admin_name}\n"
-                                f"🎮 Game ID: `{order_details['game_id']}`\n"
-                                f"🌐 Server ID: `{order_details['server_id']}`\n"
-                                f"💎 Amount: {order_details['amount']}\n"
-                                f"💰 Price: {order_details['price']:,} MMK\n"
-                                f"📊 Status: ✅ လက်ခံပြီး"
-                            )
-                        else:
-                            notification_msg = (
-                                f"✅ **Order Confirmed!**\n\n"
-                                f"📝 Order ID: `{order_id}`\n"
-                                f"🎮 Game ID: `{order_details['game_id']}`\n"
-                                f"🌐 Server ID: `{order_details['server_id']}`\n"
-                                f"💎 Amount: {order_details['amount']}\n"
-                                f"💰 Price: {order_details['price']:,} MMK\n"
-                                f"📊 Status: ✅ လက်ခံပြီး"
-                            )
-                        await context.bot.send_message(
-                            chat_id=admin_id,
-                            text=notification_msg,
-                            parse_mode="Markdown"
-                        )
-                    except:
-                        pass
-            
-            # Update status in the chat where order was placed
+        # Only a pending order can be confirmed; a racing Cancel that committed first wins
+        stock_alerts = []
+        with data_transaction() as data:
+            target_user_id, order_details, applied = transition_order(
+                data, order_id, (OrderStatus.PENDING,), OrderStatus.CONFIRMED.value,
+                confirmed_by=admin_name, confirmed_at=datetime.now().isoformat()
+            )
+            if applied:
+                take_stock(data, order_details, stock_alerts)
+                stats.record_order_confirmed(data, order_details, admin_name)
+                mark_for_fulfillment(order_details)
+        order_found = order_details is not None
+        already_processed = order_found and not applied
+
+        if already_processed:
+            await query.answer(describe_processed_order(order_details), show_alert=True)
+            # Remove buttons from current message
             try:
-                chat_id = order_details.get("chat_id", int(target_user_id))
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=f"✅ **Order လက်ခံပြီးပါပြီ!**\n\n"
-                         f"📝 Order ID: `{order_id}`\n"
-                         f"👤 User: {data['users'][target_user_id].get('name', 'Unknown')}\n"
-                         f"🎮 Game ID: `{order_details['game_id']}`\n"
-                         f"🌐 Server ID: `{order_details['server_id']}`\n"
-                         f"💎 Amount: {order_details['amount']}\n"
-                         f"📊 Status: ✅ လက်ခံပြီး\n\n"
-                         "💎 Diamonds များကို 5-30 မိနစ်အတွင်း ရရှိပါမယ်။",
-                    parse_mode="Markdown"
-                )
-            except:
-                pass
-            
+                await query.edit_message_reply_markup(reply_markup=None)
+            except Exception as e:
+                logger.warning("order card button removal failed", extra={"order_id": order_id, "error": str(e)})
+            return
+
+        if order_found:
+            event_bus.publish(
+                events.OrderConfirmed(
+                    target_user_id, data["users"][target_user_id].get("name", "Unknown"), order_details,
+                    user_id, admin_name, tuple(data.get("admin_ids", [ADMIN_ID]))
+                ),
+                context.bot
+            )
+            publish_stock_alerts(stock_alerts, data.get("admin_ids", [ADMIN_ID]), context.bot)
+
+            await edit_own_card(context.bot, query.message, data, target_user_id, order_details)
+
             await query.answer("✅ Order လက်ခံပါပြီ!", show_alert=True)
         else:
             await query.answer("❌ Order မတွေ့ရှိပါ!", show_alert=True)
@@ -2191,106 +3819,41 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif query.data.startswith("order_cancel_"):
         order_id = query.data.replace("order_cancel_", "")
-        data = load_data()
-        
-        # Check if order already processed
-        order_found = False
-        target_user_id = None
         refund_amount = 0
-        order_details = None
-        
-        for uid, user_data in data["users"].items():
-            for order in user_data.get("orders", []):
-                if order["order_id"] == order_id:
-                    # Check if already processed
-                    if order.get("status") in ["confirmed", "cancelled"]:
-                        await query.answer("⚠️ Order ကို လုပ်ဆောင်ပြီးပါပြီ!", show_alert=True)
-                        # Remove buttons from current message
-                        try:
-                            await query.edit_message_reply_markup(reply_markup=None)
-                        except:
-                            pass
-                        return
-                    
-                    order["status"] = "cancelled"
-                    order["cancelled_by"] = admin_name
-                    order["cancelled_at"] = datetime.now().isoformat()
-                    refund_amount = order["price"]
-                    order_found = True
-                    target_user_id = uid
-                    order_details = order
-                    # Refund balance
-                    data["users"][uid]["balance"] += refund_amount
-                    break
-            if order_found:
-                break
-        
-        if order_found:
-            save_data(data)
-            
-            # Remove buttons from current admin's message
-            try:
-                await query.edit_message_text(
-                    text=query.message.text.replace("⏳ စောင့်ဆိုင်းနေသည်", "❌ ငြင်းပယ်ပြီး"),
-                    parse_mode="Markdown",
-                    reply_markup=None
-                )
-            except:
-                pass
-            
-            # Notify all other admins and remove their buttons
-            admin_list = data.get("admin_ids", [ADMIN_ID])
-            for admin_id in admin_list:
-                if admin_id != int(user_id):
-                    try:
-                        if admin_id == ADMIN_ID:
-                            notification_msg = (
-                                f"❌ **Order Cancelled!**\n\n"
-                                f"📝 Order ID: `{order_id}`\n"
-                                f"👤 Cancelled by: {admin_name}\n"
-                                f"🎮 Game ID: `{order_details['game_id']}`\n"
-                                f"🌐 Server ID: `{order_details['server_id']}`\n"
-                                f"💎 Amount: {order_details['amount']}\n"
-                                f"💰 Refunded: {refund_amount:,} MMK\n"
-                                f"📊 Status: ❌ ငြင်းပယ်ပြီး"
-                            )
-                        else:
-                            notification_msg = (
-                                f"❌ **Order Cancelled!**\n\n"
-                                f"📝 Order ID: `{order_id}`\n"
-                                f"🎮 Game ID: `{order_details['game_id']}`\n"
-                                f"🌐 Server ID: `{order_details['server_id']}`\n"
-                                f"💎 Amount: {order_details['amount']}\n"
-                                f"💰 Refunded: {refund_amount:,} MMK\n"
-                                f"📊 Status: ❌ ငြင်းပယ်ပြီး"
-                            )
-                        await context.bot.send_message(
-                            chat_id=admin_id,
-                            text=notification_msg,
-                            parse_mode="Markdown"
-                        )
-                    except:
-                        pass
-            
-            # Update status in the chat where order was placed
+        # The refund is posted only if this press is the one that moves the order out of pending
+        with data_transaction() as data:
+            target_user_id, order_details, applied = transition_order(
+                data, order_id, (OrderStatus.PENDING,), OrderStatus.CANCELLED.value,
+                cancelled_by=admin_name, cancelled_at=datetime.now().isoformat()
+            )
+            if applied:
+                stats.record_order_cancelled(data, order_details, admin_name)
+                refund_amount = order_details["price"]
+                # Refund balance
+                ledger.post(data, target_user_id, ledger.KIND_REFUND, refund_amount, ref=order_id)
+        order_found = order_details is not None
+        already_processed = order_found and not applied
+
+        if already_processed:
+            await query.answer(describe_processed_order(order_details), show_alert=True)
+            # Remove buttons from current message
             try:
-                chat_id = order_details.get("chat_id", int(target_user_id))
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=f"❌ **Order ငြင်းပယ်ခံရပါပြီ!**\n\n"
-                         f"📝 Order ID: `{order_id}`\n"
-                         f"👤 User: {data['users'][target_user_id].get('name', 'Unknown')}\n"
-                         f"🎮 Game ID: `{order_details['game_id']}`\n"
-                         f"🌐 Server ID: `{order_details['server_id']}`\n"
-                         f"💎 Amount: {order_details['amount']}\n"
-                         f"📊 Status: ❌ ငြင်းပယ်ပြီး\n"
-                         f"💰 ငွေပြန်အမ်း: {refund_amount:,} MMK\n\n"
-                         "📞 အကြောင်းရင်း သိရှိရန် admin ကို ဆက်သွယ်ပါ။",
-                    parse_mode="Markdown"
-                )
-            except:
-                pass
-            
+                await query.edit_message_reply_markup(reply_markup=None)
+            except Exception as e:
+                logger.warning("order card button removal failed", extra={"order_id": order_id, "error": str(e)})
+            return
+
+        if order_found:
+            event_bus.publish(
+                events.OrderCancelled(
+                    target_user_id, data["users"][target_user_id].get("name", "Unknown"), order_details,
+                    user_id, admin_name, tuple(data.get("admin_ids", [ADMIN_ID])), refund_amount
+                ),
+                context.bot
+            )
+
+            await edit_own_card(context.bot, query.message, data, target_user_id, order_details)
+
             await query.answer("❌ Order ငြင်းပယ်ပြီး ငွေပြန်အမ်းပါပြီ!", show_alert=True)
         else:
             await query.answer("❌ Order မတွေ့ရှိပါ!", show_alert=True)
@@ -2301,6 +3864,34 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer("❌ Screenshot ပို့ပြီးပါပြီ! Admin approve စောင့်ပါ။", show_alert=True)
         return
 
+    if query.data.startswith("dup_confirm_") or query.data.startswith("dup_cancel_"):
+        token = query.data.split("_", 2)[2]
+        held = repeat_orders.get(token)
+        if held and held[0][0] != user_id:
+            await query.answer("❌ ဒီအော်ဒါက သင့်အော်ဒါ မဟုတ်ပါ!", show_alert=True)
+            return
+        held = take_repeat_order(token)
+        try:
+            await query.edit_message_reply_markup(reply_markup=None)
+        except Exception as e:
+            logger.warning("repeat order prompt button removal failed", extra={"error": str(e)})
+        if not held:
+            await query.answer("⌛ သက်တမ်းကုန်သွားပါပြီ။ /mmb ကို ပြန်ရိုက်ပါ။", show_alert=True)
+            return
+        if query.data.startswith("dup_cancel_"):
+            await query.answer("❌ အော်ဒါ မတင်တော့ပါ။")
+            return
+        if not await check_maintenance_mode("orders"):
+            await query.answer("⏸️ အော်ဒါတင်ခြင်း ယာယီပိတ်ထားပါသည်။", show_alert=True)
+            return
+        (_, game_id, server_id, amount), chat_id, _ = held
+        await query.answer()
+        await place_order(
+            context, query.from_user, chat_id,
+            game_id, server_id, amount, query.message.reply_text
+        )
+        return
+
     if query.data == "copy_kpay":
         await query.answer(f"📱 KPay Number copied! {payment_info['kpay_number']}", show_alert=True)
         await query.message.reply_text(
@@ -2322,57 +3913,80 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     elif query.data == "topup_button":
+        topup_msg = messages.render("topup_header") + messages.render("topup_steps", **state_items(payment_info))
         try:
-            keyboard = [
-                [InlineKeyboardButton("📱 Copy KPay Number", callback_data="copy_kpay")],
-                [InlineKeyboardButton("📱 Copy Wave Number", callback_data="copy_wave")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
             await query.edit_message_text(
-                text="💳 **ငွေဖြည့်လုပ်ငန်းစဉ်**\n\n"
-                     "**အဆင့် 1**: ငွေပမာဏ ရေးပါ\n"
-                     "`/topup amount` ဥပမာ: `/topup 50000`\n\n"
-                     "**အဆင့် 2**: ငွေလွှဲပါ\n"
-                     f"📱 KBZ Pay: `{payment_info['kpay_number']}` ({payment_info['kpay_name']})\n"
-                     f"📱 Wave Money: `{payment_info['wave_number']}` ({payment_info['wave_name']})\n\n"
-                     "**အဆင့် 3**: Screenshot တင်ပါ\n"
-                     "ငွေလွှဲပြီးရင် screenshot ကို ဒီမှာ တင်ပေးပါ။\n\n"
-                     "⏰ 24 နာရီအတွင်း confirm လုပ်ပါမယ်။",
+                text=topup_msg,
                 parse_mode="Markdown",
-                reply_markup=reply_markup
+                reply_markup=payment_markup()
             )
         except Exception as e:
             # If edit fails, send new message
-            keyboard = [
-                [InlineKeyboardButton("📱 Copy KPay Number", callback_data="copy_kpay")],
-                [InlineKeyboardButton("📱 Copy Wave Number", callback_data="copy_wave")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
             await query.message.reply_text(
-                text="💳 **ငွေဖြည့်လုပ်ငန်းစဉ်**\n\n"
-                     "**အဆင့် 1**: ငွေပမာဏ ရေးပါ\n"
-                     "`/topup amount` ဥပမာ: `/topup 50000`\n\n"
-                     "**အဆင့် 2**: ငွေလွှဲပါ\n"
-                     f"📱 KBZ Pay: `{payment_info['kpay_number']}` ({payment_info['kpay_name']})\n"
-                     f"📱 Wave Money: `{payment_info['wave_number']}` ({payment_info['wave_name']})\n\n"
-                     "**အဆင့် 3**: Screenshot တင်ပါ\n"
-                     "ငွေလွှဲပြီးရင် screenshot ကို ဒီမှာ တင်ပေးပါ။\n\n"
-                     "⏰ 24 နာရီအတွင်း confirm လုပ်ပါမယ်။",
+                text=topup_msg,
                 parse_mode="Markdown",
-                reply_markup=reply_markup
+                reply_markup=payment_markup()
             )
 
-def main():
-    if not BOT_TOKEN:
-        print("❌ BOT_TOKEN environment variable မရှိပါ!")
-        return
-
-    application = Application.builder().token(BOT_TOKEN).build()
+# How often shared-state workers pick up bans/auto-replies/receipts changed by other workers
+SHARED_CACHE_REFRESH = 30
 
-    # Load authorized users on startup
-    load_authorized_users()
+async def refresh_shared_caches(context: ContextTypes.DEFAULT_TYPE):
+    data = load_data()
+    load_banned_ids(data)
+    load_auto_replies(data)
+    receipt_index.rebuild(data)
+
+first_update_seen = False
+
+async def report_first_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Log time-to-first-update once; runs ahead of every other handler"""
+    global first_update_seen
+    if not first_update_seen:
+        first_update_seen = True
+        logger.info("first update handled", extra={"ms_since_start": round((time.perf_counter() - PROCESS_STARTED) * 1000)})
+
+def log_startup_report(phases):
+    total = time.perf_counter() - PROCESS_STARTED
+    logger.info("startup", extra={
+        "phases_ms": {name: round(seconds * 1000) for name, seconds in phases},
+        "total_ms": round(total * 1000),
+    })
+
+def build_application(polling=True):
+    """Create the Application with every handler and job registered"""
+    phases = [("imports", IMPORTS_DONE - PROCESS_STARTED)]
+    mark = time.perf_counter()
+
+    builder = Application.builder().token(BOT_TOKEN).post_init(start_fulfillment).post_shutdown(stop_workers)
+    if not polling:
+        # Cluster workers are fed updates by the webhook front process
+        builder = builder.updater(None)
+    application = builder.build()
+
+    # One store load feeds every startup cache
+    startup_data = load_data()
+    phases.append(("store", time.perf_counter() - mark))
+    mark = time.perf_counter()
+
+    # Compile message templates once, then load authorized users and banned game IDs
+    messages.compile_all()
+    load_authorized_users(startup_data)
+    load_banned_ids(startup_data)
+    load_auto_replies(startup_data)
+
+    # Index pending items once, then expire them on a schedule
+    pending_index.rebuild(startup_data)
+    receipt_index.rebuild(startup_data)
+    phases.append(("caches", time.perf_counter() - mark))
+    mark = time.perf_counter()
+
+    application.add_handler(TypeHandler(Update, report_first_update), group=-1)
+    application.job_queue.run_repeating(expire_pending_job, interval=EXPIRY_INTERVAL, first=EXPIRY_INTERVAL)
+    if SHARED_STATE:
+        application.job_queue.run_repeating(
+            refresh_shared_caches, interval=SHARED_CACHE_REFRESH, first=SHARED_CACHE_REFRESH
+        )
 
     # Command handlers
     application.add_handler(CommandHandler("start", start))
@@ -2381,11 +3995,31 @@ def main():
     application.add_handler(CommandHandler("topup", topup_command))
     application.add_handler(CommandHandler("price", price_command))
     application.add_handler(CommandHandler("history", history_command))
+    application.add_handler(CommandHandler("statement", statement_command))
 
 
     # Admin commands
     application.add_handler(CommandHandler("approve", approve_command))
     application.add_handler(CommandHandler("deduct", deduct_command))
+    application.add_handler(CommandHandler("approveall", approveall_command))
+    application.add_handler(CommandHandler("confirmall", confirmall_command))
+    application.add_handler(CommandHandler("cancelall", cancelall_command))
+    application.add_handler(CommandHandler("retry", retry_command))
+    application.add_handler(CommandHandler("refund", refund_command))
+    application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(CommandHandler("report", report_command))
+    application.add_handler(CommandHandler("rebuildstats", rebuildstats_command))
+    application.add_handler(CommandHandler("checkledger", checkledger_command))
+    application.add_handler(CommandHandler("settier", settier_command))
+    application.add_handler(CommandHandler("addrule", addrule_command))
+    application.add_handler(CommandHandler("delrule", delrule_command))
+    application.add_handler(CommandHandler("rules", rules_command))
+    application.add_handler(CommandHandler("addreply", addreply_command))
+    application.add_handler(CommandHandler("delreply", delreply_command))
+    application.add_handler(CommandHandler("replies", replies_command))
+    application.add_handler(CommandHandler("ban", ban_command))
+    application.add_handler(CommandHandler("unban", unban_command))
+    application.add_handler(CommandHandler("banimport", banimport_command))
     application.add_handler(CommandHandler("done", done_command))
     application.add_handler(CommandHandler("reply", reply_command))
     application.add_handler(CommandHandler("authorize", authorize_command))
@@ -2396,6 +4030,12 @@ def main():
     application.add_handler(CommandHandler("maintenance", maintenance_command))
     application.add_handler(CommandHandler("setprice", setprice_command))
     application.add_handler(CommandHandler("removeprice", removeprice_command))
+    application.add_handler(CommandHandler("tierprice", tierprice_command))
+    application.add_handler(CommandHandler("userprice", userprice_command))
+    application.add_handler(CommandHandler("promo", promo_command))
+    application.add_handler(CommandHandler("endpromo", endpromo_command))
+    application.add_handler(CommandHandler("promos", promos_command))
+    application.add_handler(CommandHandler("inventory", inventory_command))
     application.add_handler(CommandHandler("setwavenum", setwavenum_command))
     application.add_handler(CommandHandler("setkpaynum", setkpaynum_command))
     application.add_handler(CommandHandler("setwavename", setwavename_command))
@@ -2410,6 +4050,13 @@ def main():
     # Callback query handler
     application.add_handler(CallbackQueryHandler(button_callback))
 
+    # Cart orders uploaded as a .txt/.csv file captioned /mmb
+    application.add_handler(MessageHandler(
+        (filters.Document.FileExtension("txt") | filters.Document.FileExtension("csv"))
+        & filters.CaptionRegex(r"^/mmb"),
+        mmb_document_handler
+    ))
+
     # Photo handler (for payment screenshots)
     application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
 
@@ -2419,10 +4066,21 @@ def main():
          filters.ANIMATION | filters.AUDIO | filters.Document.ALL) & ~filters.COMMAND, 
         handle_restricted_content
     ))
+    jsonlog.log_handler_calls(application)
+
+    phases.append(("handlers", time.perf_counter() - mark))
+    log_startup_report(phases)
+    return application
+
+def main():
+    jsonlog.setup()
+    if not BOT_TOKEN:
+        logger.error("❌ BOT_TOKEN environment variable မရှိပါ!")
+        return
+
+    application = build_application()
 
-    print("🤖 Bot စတင်နေပါသည် - 24/7 Running Mode")
-    print("✅ Orders, Topups နဲ့ AI စလုံးအဆင်သင့်ပါ")
-    print("🔧 Admin commands များ အသုံးပြုနိုင်ပါပြီ")
+    logger.info("🤖 Bot စတင်နေပါသည် - 24/7 Running Mode")
     application.run_polling()
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+"""
+Message templates for the bot's user-facing text.
+
+Templates use str.format fields and are compiled once: the literal text
+is split from the fields up front, and each field remembers whether it
+sits inside a `code span`, a [link text] or plain text, so values are
+escaped for Telegram's Markdown where they are inserted instead of ad hoc
+in every handler. Templates without fields are rendered once and cached.
+
+Each template may have per-locale variants; a locale without its own
+variant falls back to Burmese.
+"""
+from string import Formatter
+
+DEFAULT_LOCALE = "my"
+
+PLAIN = "plain"
+CODE = "code"
+LINK = "link"
+
+TEMPLATES = {
+    "my": {
+        "unauthorized": (
+            "🚫 **အသုံးပြုခွင့် မရှိပါ!**\n\n"
+            "Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ။"
+        ),
+        "unauthorized_start": (
+            "🚫 **Bot အသုံးပြုခွင့် မရှိပါ!**\n\n"
+            "👋 မင်္ဂလာပါ `{name}`!\n"
+            "🆔 Your ID: `{user_id}`\n\n"
+            "❌ သင်သည် ဤ bot ကို အသုံးပြုခွင့် မရှိသေးပါ။\n\n"
+            "**လုပ်ရမည့်အရာများ**:\n"
+            "• အောက်က 'Contact Owner' button ကို နှိပ်ပါ\n"
+            "• Owner ထံ bot အသုံးပြုခွင့် တောင်းဆိုပါ\n"
+            "• သင့် User ID ကို ပေးပို့ပါ\n\n"
+            "✅ Owner က approve လုပ်ပြီးမှ bot ကို အသုံးပြုနိုင်ပါမယ်။"
+        ),
+        "restricted": (
+            "⏳ **Screenshot ပို့ပြီးပါပြီ!**\n\n"
+            "❌ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ commands တွေ အသုံးပြုလို့ မရပါ။\n\n"
+            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
+            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။"
+        ),
+        "restricted_content": (
+            "❌ **အသုံးပြုမှု ကန့်သတ်ထားပါ!**\n\n"
+            "🔒 Screenshot ပို့ပြီးပါပြီ။ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ:\n\n"
+            "❌ Commands အသုံးပြုလို့ မရပါ\n"
+            "❌ စာသား ပို့လို့ မရပါ\n"
+            "❌ Voice, Sticker, GIF, Video ပို့လို့ မရပါ\n"
+            "❌ Emoji ပို့လို့ မရပါ\n\n"
+            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
+            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။"
+        ),
+        "pending_topup_warning": (
+            "⏳ **Pending Topup ရှိနေပါတယ်!**\n\n"
+            "❌ သင့်မှာ admin က approve မလုပ်သေးတဲ့ topup ရှိနေပါတယ်။\n\n"
+            "**လုပ်ရမည့်အရာများ**:\n"
+            "• Admin က topup ကို approve လုပ်ပေးတဲ့အထိ စောင့်ပါ\n"
+            "• Approve ရပြီးမှ command တွေကို ပြန်အသုံးပြုနိုင်ပါမယ်\n\n"
+            "📞 အရေးပေါ်ဆိုရင် admin ကို ဆက်သွယ်ပါ။\n"
+            "💡 `/balance` နဲ့ status စစ်ကြည့်နိုင်ပါတယ်။"
+        ),
+        "topup_header": "💳 **ငွေဖြည့်လုပ်ငန်းစဉ်**\n\n",
+        "topup_header_amount": (
+            "💳 **ငွေဖြည့်လုပ်ငန်းစဉ်**\n\n"
+            "💰 ပမာဏ: `{amount:,} MMK`\n\n"
+        ),
+        "topup_steps": (
+            "**အဆင့် 1**: ငွေပမာဏ ရေးပါ\n"
+            "`/topup amount` ဥပမာ: `/topup 50000`\n\n"
+            "**အဆင့် 2**: ငွေလွှဲပါ\n"
+            "📱 KBZ Pay: `{kpay_number}` ({kpay_name})\n"
+            "📱 Wave Money: `{wave_number}` ({wave_name})\n\n"
+            "**အဆင့် 3**: Screenshot တင်ပါ\n"
+            "ငွေလွှဲပြီးရင် screenshot ကို ဒီမှာ တင်ပေးပါ။\n\n"
+            "⏰ 24 နာရီအတွင်း confirm လုပ်ပါမယ်။"
+        ),
+        "screenshot_received": (
+            "✅ **Screenshot လက်ခံပါပြီ!**\n\n"
+            "💰 ပမာဏ: `{amount:,} MMK`\n"
+            "⏰ အချိန်: {time}\n\n"
+            "🔒 **အသုံးပြုမှု ယာယီ ကန့်သတ်ပါ**\n"
+            "❌ Screenshot ပို့ပြီးပါပြီ။ Admin က လက်ခံပြီးကြောင်း အတည်ပြုတဲ့အထိ:\n\n"
+            "❌ Commands အသုံးပြုလို့ မရပါ\n"
+            "❌ စာသား ပို့လို့ မရပါ\n"
+            "❌ Voice, Sticker, GIF, Video ပို့လို့ မရပါ\n"
+            "❌ Emoji ပို့လို့ မရပါ\n\n"
+            "⏰ Admin က approve လုပ်ပြီးမှ ပြန်လည် အသုံးပြုနိုင်ပါမယ်။\n"
+            "📞 ပြဿနာရှိရင် admin ကို ဆက်သွယ်ပါ။"
+        ),
+        "insufficient_balance": (
+            "❌ လက်ကျန်ငွေ မလုံလောက်ပါ!\n\n"
+            "💰 လိုအပ်တဲ့ငွေ: {price:,} MMK\n"
+            "💳 သင့်လက်ကျန်: {balance:,} MMK\n"
+            "❗ လိုအပ်သေးတာ: {shortfall:,} MMK\n\n"
+            "ငွေဖြည့်ရန် `/topup amount` သုံးပါ။"
+        ),
+        "order_placed": (
+            "✅ **အော်ဒါ အောင်မြင်ပါပြီ!**\n\n"
+            "📝 Order ID: `{order_id}`\n"
+            "🎮 Game ID: `{game_id}`\n"
+            "🌐 Server ID: `{server_id}`\n"
+            "💎 Diamond: {amount}\n"
+            "💰 ကုန်ကျစရိတ်: {price:,} MMK\n"
+            "💳 လက်ကျန်ငွေ: {balance:,} MMK\n"
+            "📊 Status: {status}\n\n"
+            "{next_step}\n"
+            "📞 ပြဿနာရှိရင် admin ကို ဆက်သွယ်ပါ။"
+        ),
+        "order_status_confirmed": "✅ လက်ခံပြီး",
+        "order_status_pending": "⏳ စောင့်ဆိုင်းနေသည်",
+        "order_next_confirmed": "💎 Diamonds များကို 5-30 မိနစ်အတွင်း ရရှိပါမယ်။",
+        "order_next_pending": "⚠️ Admin က confirm လုပ်ပြီးမှ diamonds များ ရရှိပါမယ်။",
+        "admin_new_order": (
+            "🔔 **အော်ဒါအသစ်ရောက်ပါပြီ!**\n\n"
+            "📝 Order ID: `{order_id}`\n"
+            "👤 User: [{user_name}](tg://user?id={user_id})\n\n"
+            "🆔 User ID: `{user_id}`\n"
+            "🎮 Game ID: `{game_id}`\n"
+            "🌐 Server ID: `{server_id}`\n"
+            "💎 Amount: {amount}\n"
+            "💰 Price: {price:,} MMK\n"
+            "⏰ Time: {time}\n"
+            "📊 Status: {status}"
+        ),
+        "group_new_order": (
+            "🛒 **အော်ဒါအသစ် ရောက်ပါပြီ!**\n\n"
+            "📝 Order ID: `{order_id}`\n"
+            "👤 User: [{user_name}](tg://user?id={user_id})\n"
+            "🎮 Game ID: `{game_id}`\n"
+            "🌐 Server ID: `{server_id}`\n"
+            "💎 Amount: {amount}\n"
+            "💰 Price: {price:,} MMK\n"
+            "⏰ Time: {time}\n\n"
+            "#NewOrder #MLBB"
+        ),
+    },
+    "en": {
+        "unauthorized": (
+            "🚫 **Not authorized!**\n\n"
+            "Ask the owner for access to this bot."
+        ),
+        "restricted": (
+            "⏳ **Screenshot already sent!**\n\n"
+            "❌ Commands are disabled until an admin approves your topup.\n\n"
+            "⏰ You can use the bot again once it is approved.\n"
+            "📞 Contact an admin if it is urgent."
+        ),
+        "pending_topup_warning": (
+            "⏳ **You have a pending topup!**\n\n"
+            "❌ An admin has not approved your topup yet.\n\n"
+            "• Wait for the admin to approve it\n"
+            "• Commands work again after approval\n\n"
+            "📞 Contact an admin if it is urgent.\n"
+            "💡 Check the status with `/balance`."
+        ),
+    },
+}
+
+_formatter = Formatter()
+_compiled = {}
+
+
+def escape(value, context=PLAIN):
+    """Make a value safe to insert into Telegram Markdown at the given position"""
+    text = str(value)
+    if context == CODE:
+        # Nothing can be escaped inside a code span; just keep it closed
+        return text.replace("`", "'")
+    if context == LINK:
+        text = text.replace("[", "(").replace("]", ")")
+    for char in ("_", "*", "`", "["):
+        text = text.replace(char, "\\" + char)
+    return text
+
+
+def _advance(context, literal):
+    """Markdown context after reading literal text in the given context"""
+    for char in literal:
+        if context == CODE:
+            if char == "`":
+                context = PLAIN
+        elif char == "`":
+            context = CODE
+        elif char == "[":
+            context = LINK
+        elif char == "]" and context == LINK:
+            context = PLAIN
+    return context
+
+
+class Template:
+    __slots__ = ("parts", "static")
+
+    def __init__(self, text):
+        self.parts = []
+        context = PLAIN
+        for literal, field, spec, _ in _formatter.parse(text):
+            context = _advance(context, literal)
+            self.parts.append((literal, field, spec, context))
+        self.static = None
+        if all(field is None for _, field, _, _ in self.parts):
+            self.static = "".join(literal for literal, _, _, _ in self.parts)
+
+    def render(self, fields):
+        if self.static is not None:
+            return self.static
+        out = []
+        for literal, field, spec, context in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(escape(format(fields[field], spec), context))
+        return "".join(out)
+
+
+def compile_all():
+    """Compile every template up front (called once at startup)"""
+    for locale, templates in TEMPLATES.items():
+        for name, text in templates.items():
+            _compiled[(locale, name)] = Template(text)
+
+
+def register(name, text, locale=DEFAULT_LOCALE):
+    TEMPLATES.setdefault(locale, {})[name] = text
+    _compiled[(locale, name)] = Template(text)
+
+
+def get_template(name, locale=None):
+    key = (locale or DEFAULT_LOCALE, name)
+    template = _compiled.get(key)
+    if template is None:
+        if key[0] not in TEMPLATES or name not in TEMPLATES[key[0]]:
+            key = (DEFAULT_LOCALE, name)
+        template = _compiled.get(key)
+        if template is None:
+            template = _compiled[key] = Template(TEMPLATES[key[0]][name])
+    return template
+
+
+def render(name, locale=None, **fields):
+    return get_template(name, locale).render(fields)
+
+
+def user_locale(user):
+    """Locale for a Telegram user, from their app language when we have a variant for it"""
+    code = (getattr(user, "language_code", None) or "").split("-")[0]
+    return code if code in TEMPLATES else DEFAULT_LOCALE
@@ -0,0 +1,127 @@
+"""
+Offline OCR of KPay/Wave payment screenshots.
+
+The screenshot is read with a local Tesseract install (pytesseract +
+Pillow, no network) in a process pool, so OCR never blocks the bot's
+event loop or competes with it for the GIL. The recognised text is
+parsed for the transferred amount, transaction ID and time, and compared
+with the amount the user asked to top up.
+
+OCR is off unless RECEIPT_OCR=1 and both optional packages import. They
+are imported on first use, not at bot startup; so is the process pool
+machinery, which is most of this module's import time.
+"""
+import asyncio, io, os, re
+
+MATCH = "match"
+MISMATCH = "mismatch"
+UNKNOWN = "unknown"
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+# Seconds a topup waits for its OCR result before going to the admins without it
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "20"))
+
+# "-50,000.00 Ks", "50000 MMK", "Amount 50,000"
+AMOUNT_PATTERNS = [
+    re.compile(r"(?:amount|ပမာဏ)\s*[:\-]?\s*-?\s*([\d,]+(?:\.\d{1,2})?)", re.IGNORECASE),
+    re.compile(r"-?\s*([\d,]+(?:\.\d{1,2})?)\s*(?:ks|mmk|kyats?)\b", re.IGNORECASE),
+]
+TRANSACTION_PATTERN = re.compile(
+    r"(?:transaction|trans\.?|txn)\s*(?:no\.?|id|number)?\s*[:\-]?\s*((?=[0-9A-Z]*\d)[0-9A-Z]{8,})",
+    re.IGNORECASE,
+)
+TIMESTAMP_PATTERN = re.compile(
+    r"(\d{1,2}/\d{1,2}/\d{4}\s+\d{1,2}:\d{2}(?::\d{2})?(?:\s*[AP]M)?"
+    r"|\d{4}-\d{2}-\d{2}\s+\d{1,2}:\d{2}(?::\d{2})?)",
+    re.IGNORECASE,
+)
+
+_pool = None
+# Screenshots downloaded and scanned at once; the rest wait their turn before
+# downloading, so a burst doesn't hold every full-size image in memory
+scan_slots = asyncio.Semaphore(OCR_WORKERS)
+# (pytesseract, PIL.Image) once imported, False when they are missing
+_engine = None
+
+
+def _load_engine():
+    global _engine
+    if _engine is None:
+        try:
+            import pytesseract
+            from PIL import Image
+            _engine = (pytesseract, Image)
+        except ImportError:
+            _engine = False
+    return _engine
+
+
+def is_available():
+    return bool(_load_engine())
+
+
+def is_enabled():
+    return os.getenv("RECEIPT_OCR") == "1" and is_available()
+
+
+def extract_text(image_bytes):
+    """Run Tesseract on an image; executed inside a pool worker"""
+    pytesseract, Image = _load_engine()
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return pytesseract.image_to_string(image.convert("L"))
+
+
+def _parse_amount(text):
+    for pattern in AMOUNT_PATTERNS:
+        for match in pattern.finditer(text):
+            value = match.group(1).replace(",", "")
+            try:
+                amount = int(float(value))
+            except ValueError:
+                continue
+            if amount > 0:
+                return amount
+    return None
+
+
+def parse_receipt(text):
+    """Pull {"amount", "transaction_id", "timestamp"} out of OCR text; missing fields are None"""
+    transaction = TRANSACTION_PATTERN.search(text)
+    timestamp = TIMESTAMP_PATTERN.search(text)
+    return {
+        "amount": _parse_amount(text),
+        "transaction_id": transaction.group(1) if transaction else None,
+        "timestamp": timestamp.group(1) if timestamp else None,
+    }
+
+
+def scan_image(image_bytes):
+    """OCR and parse one screenshot; returns parse_receipt()'s dict"""
+    return parse_receipt(extract_text(image_bytes))
+
+
+def verdict(receipt, expected_amount):
+    if not receipt or receipt.get("amount") is None:
+        return UNKNOWN
+    return MATCH if receipt["amount"] == expected_amount else MISMATCH
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def scan(image_bytes):
+    """OCR a screenshot in the process pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), scan_image, image_bytes)
@@ -0,0 +1,253 @@
+"""
+Price resolution: default table, custom prices, tier and per-user
+overrides, and time-limited promotions.
+
+Everything but the default table lives in the data store:
+
+    data["prices"]             {sku: price}, custom prices for everyone
+    data["pricing"]["tiers"]   {tier: {sku: price}}, e.g. reseller tiers
+    data["pricing"]["users"]   {user_id: {sku: price}}, negotiated prices
+    data["pricing"]["promos"]  [{"name": "thingyan", "percent": 10,
+                                 "skus": ["86"], "tiers": ["gold"],
+                                 "start": iso, "end": iso}]
+
+A tier's price is its override, else the custom price, else the default,
+less the best active promo for that tier and SKU ("skus"/"tiers" left
+out match everything). A user's override is final; promos do not apply
+to it. Users without a tier use DEFAULT_TIER (as in rules.py), and tiers
+without overrides or promos of their own share its map.
+
+get_tables() precomputes one {sku: price} map per tier, so a lookup is
+two dict reads. The maps are rebuilt when data["pricing"]["version"]
+changes (every setter here bumps it) or when a promo starts or ends.
+"""
+from datetime import datetime, timedelta
+
+from rules import DEFAULT_TIER
+
+WEEKLY_PASS = tuple(f"wp{n}" for n in range(1, 11))
+DIAMONDS = (
+    "11", "22", "33", "56", "86", "112", "172", "257", "343", "429", "514",
+    "600", "706", "878", "963", "1049", "1135", "1412", "2195", "3688",
+    "5532", "9288", "12976",
+)
+DOUBLE_PASS = ("55", "165", "275", "565")
+
+DEFAULT_PRICES = {
+    **{sku: n * 6000 for n, sku in enumerate(WEEKLY_PASS, 1)},
+    "11": 950, "22": 1900, "33": 2850, "56": 4200, "86": 5100, "112": 8200,
+    "172": 10200, "257": 15300, "343": 20400, "429": 25500, "514": 30600,
+    "600": 35700, "706": 40800, "878": 51000, "963": 56100, "1049": 61200,
+    "1135": 66300, "1412": 81600, "2195": 122400, "3688": 204000,
+    "5532": 306000, "9288": 510000, "12976": 714000,
+    "55": 3500, "165": 10000, "275": 16000, "565": 33000,
+}
+
+_cached = {"version": None, "tables": None}
+
+
+class PriceTables:
+    def __init__(self, tiers, users, promos, built_at, valid_until):
+        self.tiers = tiers
+        self.users = users
+        # Promos active when the tables were built
+        self.promos = promos
+        # The tables hold between built_at and the next promo start or end
+        self.built_at = built_at
+        self.valid_until = valid_until
+        self.rendered = {}
+
+    def prices(self, tier, user_id=None):
+        """{sku: price} for a user of this tier"""
+        prices = self.tiers.get(tier) or self.tiers[DEFAULT_TIER]
+        overrides = self.users.get(user_id)
+        return {**prices, **overrides} if overrides else prices
+
+    def price(self, tier, user_id, sku):
+        overrides = self.users.get(user_id)
+        if overrides and sku in overrides:
+            return overrides[sku]
+        prices = self.tiers.get(tier) or self.tiers[DEFAULT_TIER]
+        return prices.get(sku)
+
+    def render(self, tier, user_id, render):
+        """render(prices) for the user's price list, cached per tier"""
+        if user_id in self.users:
+            return render(self.prices(tier, user_id))
+        key = tier if tier in self.tiers else DEFAULT_TIER
+        text = self.rendered.get(key)
+        if text is None:
+            text = self.rendered[key] = render(self.tiers[key])
+        return text
+
+
+def _promo_matches(promo, tier, sku):
+    return ("tiers" not in promo or tier in promo["tiers"]) and ("skus" not in promo or sku in promo["skus"])
+
+
+def build_tables(data, now):
+    config = data.get("pricing", {})
+    base = {**DEFAULT_PRICES, **data.get("prices", {})}
+    tier_overrides = config.get("tiers", {})
+
+    active = []
+    boundaries = []
+    for promo in config.get("promos", []):
+        start = datetime.fromisoformat(promo["start"])
+        end = datetime.fromisoformat(promo["end"])
+        if now < start:
+            boundaries.append(start)
+        elif now < end:
+            active.append(promo)
+            boundaries.append(end)
+
+    tier_names = {DEFAULT_TIER, *tier_overrides}
+    for promo in active:
+        tier_names.update(promo.get("tiers", ()))
+
+    tiers = {}
+    for tier in tier_names:
+        prices = {**base, **tier_overrides.get(tier, {})}
+        for sku, price in prices.items():
+            percent = max((p["percent"] for p in active if _promo_matches(p, tier, sku)), default=0)
+            if percent:
+                prices[sku] = price * (100 - percent) // 100
+        tiers[tier] = prices
+
+    return PriceTables(tiers, config.get("users", {}), tuple(active), now, min(boundaries, default=None))
+
+
+def get_tables(data, now=None):
+    """Price tables for the store, rebuilt only when pricing changes or a promo starts/ends"""
+    now = now or datetime.now()
+    version = data.get("pricing", {}).get("version", 0)
+    tables = _cached["tables"]
+    if (
+        _cached["version"] != version or tables is None or now < tables.built_at
+        or (tables.valid_until and now >= tables.valid_until)
+    ):
+        tables = _cached["tables"] = build_tables(data, now)
+        _cached["version"] = version
+    return tables
+
+
+def price_for(data, user_id, sku, now=None):
+    """Price of sku for this user, or None if it isn't sold"""
+    tier = data["users"].get(user_id, {}).get("tier", DEFAULT_TIER)
+    return get_tables(data, now).price(tier, user_id, sku)
+
+
+def _config(data):
+    config = data.setdefault("pricing", {})
+    config["version"] = config.get("version", 0) + 1
+    return config
+
+
+def set_custom_price(data, sku, price):
+    """Set (or with price=None remove) a custom price; returns whether anything changed"""
+    prices = data.setdefault("prices", {})
+    if price is None and sku not in prices:
+        return False
+    if price is None:
+        del prices[sku]
+    else:
+        prices[sku] = price
+    _config(data)
+    return True
+
+
+def set_custom_prices(data, prices, replace=False):
+    custom_prices = data.setdefault("prices", {})
+    if replace:
+        custom_prices.clear()
+    custom_prices.update(prices)
+    _config(data)
+
+
+def _set_override(data, key, owner, sku, price):
+    overrides = data.get("pricing", {}).get(key, {})
+    if price is None and sku not in overrides.get(owner, {}):
+        return False
+    overrides = _config(data).setdefault(key, {})
+    if price is None:
+        del overrides[owner][sku]
+        if not overrides[owner]:
+            del overrides[owner]
+    else:
+        overrides.setdefault(owner, {})[sku] = price
+    return True
+
+
+def set_tier_price(data, tier, sku, price):
+    """Set (or with price=None remove) a tier's price for sku; returns whether anything changed"""
+    return _set_override(data, "tiers", tier, sku, price)
+
+
+def set_user_price(data, user_id, sku, price):
+    """Set (or with price=None remove) a user's own price for sku; returns whether anything changed"""
+    return _set_override(data, "users", user_id, sku, price)
+
+
+def _parse_local(value):
+    """Naive local time from ISO text; promos are compared with datetime.now()"""
+    at = datetime.fromisoformat(value)
+    if at.tzinfo is not None:
+        raise ValueError(f"give a local time without a timezone: {value}")
+    return at
+
+
+def parse_promo(name, tokens, now):
+    """
+    Build a promo from `percent=N` plus `hours=N` or `until=YYYY-MM-DDTHH:MM`,
+    and optional `start=`, `skus=a,b`, `tiers=a,b`; raises ValueError on bad input
+    """
+    fields = {}
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        if not sep or key not in ("percent", "hours", "start", "until", "skus", "tiers"):
+            raise ValueError(f"unknown promo field: {token}")
+        fields[key] = value
+    if "percent" not in fields or not ("hours" in fields or "until" in fields):
+        raise ValueError("percent and hours or until are required")
+
+    percent = int(fields["percent"])
+    if not 0 < percent < 100:
+        raise ValueError(f"percent must be within 1-99: {percent}")
+    start = _parse_local(fields["start"]) if "start" in fields else now
+    if "until" in fields:
+        end = _parse_local(fields["until"])
+    else:
+        end = start + timedelta(hours=float(fields["hours"]))
+    if end <= start:
+        raise ValueError("promo ends before it starts")
+
+    promo = {"name": name, "percent": percent, "start": start.isoformat(), "end": end.isoformat()}
+    for key in ("skus", "tiers"):
+        if key in fields:
+            promo[key] = [item for item in fields[key].split(",") if item]
+    return promo
+
+
+def describe_promo(promo):
+    parts = [f"-{promo['percent']}%"]
+    for key in ("skus", "tiers"):
+        if key in promo:
+            parts.append(f"{key}={','.join(promo[key])}")
+    parts.append(f"{promo['start'][:16].replace('T', ' ')} → {promo['end'][:16].replace('T', ' ')}")
+    return " ".join(parts)
+
+
+def set_promo(data, promo):
+    """Add a promo, replacing one of the same name"""
+    config = _config(data)
+    config["promos"] = [p for p in config.get("promos", []) if p["name"] != promo["name"]] + [promo]
+
+
+def remove_promo(data, name):
+    promos = data.get("pricing", {}).get("promos", [])
+    remaining = [p for p in promos if p["name"] != name]
+    if len(remaining) == len(promos):
+        return False
+    _config(data)["promos"] = remaining
+    return True
+
@@ -0,0 +1,117 @@
+"""
+Duplicate detection for payment screenshots.
+
+Each screenshot is reduced to a 64-bit difference hash (dHash), which
+survives re-compression and resizing, so the same receipt sent twice
+hashes to (nearly) the same value. Hashes are kept on the topup record
+as "receipt_hash".
+
+ReceiptIndex splits every hash into four 16-bit bands. Two hashes within
+Hamming distance 3 must agree on at least one band (pigeonhole), so a
+lookup only compares against entries sharing a band instead of every
+receipt ever submitted.
+
+Pillow is optional and imported on first use: without it hash_image()
+returns None and screenshots are accepted unchecked.
+"""
+import io
+
+HASH_SIZE = 8
+BANDS = 4
+BAND_BITS = 64 // BANDS
+MAX_DISTANCE = BANDS - 1
+# Smallest PhotoSize side still worth hashing; Telegram's thumbnails are ~90px
+MIN_PHOTO_SIDE = 90
+
+# PIL.Image once imported, False when Pillow is missing
+_image_module = None
+
+
+def _load_image_module():
+    global _image_module
+    if _image_module is None:
+        try:
+            from PIL import Image
+            _image_module = Image
+        except ImportError:
+            _image_module = False
+    return _image_module
+
+
+def pick_photo_size(photo_sizes):
+    """Smallest PhotoSize that is still large enough to hash reliably"""
+    usable = [p for p in photo_sizes if min(p.width, p.height) >= MIN_PHOTO_SIDE]
+    if usable:
+        return min(usable, key=lambda p: p.width * p.height)
+    return max(photo_sizes, key=lambda p: p.width * p.height)
+
+
+def hash_image(image_bytes):
+    """
+    64-bit dHash of an image as a 16-char hex string, or None when Pillow
+    is missing or the bytes are not an image. CPU-bound; run it in a thread.
+    """
+    Image = _load_image_module()
+    if not Image:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            pixels = list(
+                image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS).getdata()
+            )
+    except Exception:
+        return None
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{value:016x}"
+
+
+def _bands(value):
+    mask = (1 << BAND_BITS) - 1
+    return [(band, (value >> (band * BAND_BITS)) & mask) for band in range(BANDS)]
+
+
+class ReceiptIndex:
+    def __init__(self):
+        self.entries = []
+        self.bands = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, receipt_hash, user_id, timestamp, amount=None):
+        value = int(receipt_hash, 16)
+        position = len(self.entries)
+        self.entries.append((value, user_id, timestamp, amount))
+        for key in _bands(value):
+            self.bands.setdefault(key, []).append(position)
+
+    def rebuild(self, data):
+        """Index the receipt hash of every topup in the store"""
+        self.entries = []
+        self.bands = {}
+        for uid, user_data in data["users"].items():
+            for topup in user_data.get("topups", []):
+                if topup.get("receipt_hash"):
+                    self.add(topup["receipt_hash"], uid, topup.get("timestamp"), topup.get("amount"))
+
+    def find(self, receipt_hash, max_distance=MAX_DISTANCE):
+        """
+        Previously submitted receipts within max_distance bits, closest
+        first, as [(distance, user_id, timestamp, amount)].
+        """
+        value = int(receipt_hash, 16)
+        candidates = set()
+        for key in _bands(value):
+            candidates.update(self.bands.get(key, ()))
+        matches = []
+        for position in candidates:
+            other, user_id, timestamp, amount = self.entries[position]
+            distance = bin(value ^ other).count("1")
+            if distance <= max_distance:
+                matches.append((distance, user_id, timestamp, amount))
+        matches.sort(key=lambda match: (match[0], match[2] or ""))
+        return matches
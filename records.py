@@ -0,0 +1,216 @@
+"""
+Typed records for users, orders and topups.
+
+The store keeps plain dicts (that is what data.json, the marshal snapshot
+and every transaction work on); these classes are the in-memory form for
+code that builds or holds records. They use __slots__, keep statuses as
+enums and timestamps as integer microseconds since 1970 (naive local
+time, like datetime.now()), and convert losslessly to and from the
+store's layout:
+
+    Order.from_dict(order).to_dict() == order
+
+Every field may be None, meaning the key is absent. Keys without a field,
+and values a field cannot hold exactly (a price that is not an int, a
+timestamp that would not format back identically) go to `extra` and are
+written back unchanged; an unknown status is kept as a plain string.
+"""
+import secrets
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from enum import Enum, StrEnum
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class OrderStatus(StrEnum):
+    PENDING = "pending"
+    CONFIRMED = "confirmed"
+    PROCESSING = "processing"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    EXPIRED = "expired"
+
+
+class TopupStatus(StrEnum):
+    PENDING = "pending"
+    APPROVED = "approved"
+    EXPIRED = "expired"
+
+
+def parse_timestamp(text):
+    """Microseconds for a naive ISO timestamp, or None if it would not format back identically"""
+    if type(text) is not str:
+        return None
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        return None
+    value = (moment - EPOCH) // MICROSECOND
+    return value if format_timestamp(value) == text else None
+
+
+def format_timestamp(value):
+    return (EPOCH + value * MICROSECOND).isoformat()
+
+
+def now_timestamp():
+    return (datetime.now() - EPOCH) // MICROSECOND
+
+
+def id_stamp(now=None):
+    """
+    Time-and-random part of a new order or cart ID: the second it was
+    placed plus 8 random hex digits, so IDs made in the same second (by
+    any user, on any worker) still differ
+    """
+    return f"{(now or datetime.now()).strftime('%Y%m%d%H%M%S')}{secrets.token_hex(4).upper()}"
+
+
+def _status(enum):
+    def convert(value):
+        if type(value) is not str:
+            return None
+        try:
+            return enum(value)
+        except ValueError:
+            return value
+    return convert
+
+
+def _exact(kind):
+    return lambda value: value if type(value) is kind else None
+
+
+class _Record:
+    __slots__ = ()
+    # key -> converter from the stored value, returning None when the field can't hold it
+    CONVERTERS = {}
+    TIMESTAMPS = frozenset()
+    # String fields whose values repeat across records (game IDs, packages)
+    SHARED = frozenset()
+
+    @classmethod
+    def from_dict(cls, data, strings=None):
+        """
+        Record for a store dict. Pass the same `strings` dict when
+        converting many records so repeated values are stored once.
+        """
+        values = {}
+        extra = {}
+        names = cls.field_names()
+        converters = cls.CONVERTERS
+        for key, value in data.items():
+            converted = None
+            if key in names and value is not None:
+                convert = converters.get(key)
+                converted = convert(value) if convert else value
+                if strings is not None and key in cls.SHARED and type(converted) is str:
+                    converted = strings.setdefault(converted, converted)
+            if converted is None:
+                extra[key] = value
+            else:
+                values[key] = converted
+        return cls(**values, extra=extra or None)
+
+    @classmethod
+    def field_names(cls):
+        names = cls.__dict__.get("_names")
+        if names is None:
+            names = frozenset(field.name for field in fields(cls) if field.name != "extra")
+            type.__setattr__(cls, "_names", names)
+        return names
+
+    def to_dict(self):
+        data = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value is None or field.name == "extra":
+                continue
+            if field.name in self.TIMESTAMPS:
+                value = format_timestamp(value)
+            elif isinstance(value, Enum):
+                value = value.value
+            data[field.name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Order(_Record):
+    order_id: str | None = None
+    game_id: str | None = None
+    server_id: str | None = None
+    amount: str | None = None
+    price: int | None = None
+    status: OrderStatus | str | None = None
+    timestamp: int | None = None
+    user_id: str | None = None
+    chat_id: int | None = None
+    confirmed_at: int | None = None
+    cancelled_at: int | None = None
+    extra: dict | None = None
+
+    CONVERTERS = {
+        "price": _exact(int),
+        "chat_id": _exact(int),
+        "status": _status(OrderStatus),
+        "timestamp": parse_timestamp,
+        "confirmed_at": parse_timestamp,
+        "cancelled_at": parse_timestamp,
+    }
+    TIMESTAMPS = frozenset({"timestamp", "confirmed_at", "cancelled_at"})
+    SHARED = frozenset({"game_id", "server_id", "amount", "user_id"})
+
+
+@dataclass(slots=True)
+class Topup(_Record):
+    amount: int | None = None
+    status: TopupStatus | str | None = None
+    timestamp: int | None = None
+    approved_at: int | None = None
+    receipt_hash: str | None = None
+    extra: dict | None = None
+
+    CONVERTERS = {
+        "amount": _exact(int),
+        "status": _status(TopupStatus),
+        "timestamp": parse_timestamp,
+        "approved_at": parse_timestamp,
+    }
+    TIMESTAMPS = frozenset({"timestamp", "approved_at"})
+
+
+@dataclass(slots=True)
+class User(_Record):
+    name: str | None = None
+    username: str | None = None
+    balance: int | None = None
+    orders: list | None = None
+    topups: list | None = None
+    extra: dict | None = None
+
+    CONVERTERS = {
+        "balance": _exact(int),
+        "orders": lambda items: _records(Order, items),
+        "topups": lambda items: _records(Topup, items),
+    }
+
+    def to_dict(self):
+        data = _Record.to_dict(self)
+        for key in ("orders", "topups"):
+            if key in data and not (self.extra and key in self.extra):
+                data[key] = [record.to_dict() for record in data[key]]
+        return data
+
+
+def _records(cls, items):
+    if type(items) is not list or not all(type(item) is dict for item in items):
+        return None
+    strings = {}
+    return [cls.from_dict(item, strings) for item in items]
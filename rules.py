@@ -0,0 +1,135 @@
+"""
+Auto-confirm rules for low-risk orders.
+
+Rules live in the data store under data["auto_confirm"]["rules"] as
+plain dicts, e.g.
+
+    {"name": "trusted-small", "tiers": ["gold"], "skus": ["wp1", "86"],
+     "max_price": 20000, "max_daily": 100000, "hours": [8, 22]}
+
+Any field left out is not checked. compile_rules() turns the list into a
+single predicate once; the compiled form is cached until the store's
+rules version changes.
+"""
+from records import OrderStatus
+
+RULE_FIELDS = ("tiers", "skus", "max_price", "max_daily", "hours")
+DEFAULT_TIER = "default"
+# Orders whose price went back to the user (a refunded failed order is cancelled)
+REFUNDED_STATUSES = frozenset((OrderStatus.CANCELLED, OrderStatus.EXPIRED))
+
+_compiled = {"version": None, "predicate": None}
+
+
+def parse_rule(name, tokens):
+    """Build a rule from `key=value` tokens; raises ValueError on bad input"""
+    rule = {"name": name}
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        if not sep or key not in RULE_FIELDS:
+            raise ValueError(f"unknown rule field: {token}")
+        if key in ("tiers", "skus"):
+            rule[key] = [item for item in value.split(",") if item]
+        elif key == "hours":
+            start, _, end = value.partition("-")
+            rule[key] = [int(start), int(end)]
+            if not all(0 <= hour <= 24 for hour in rule[key]):
+                raise ValueError(f"hours must be within 0-24: {value}")
+        else:
+            rule[key] = int(value)
+    return rule
+
+
+def describe_rule(rule):
+    parts = []
+    for key in RULE_FIELDS:
+        if key not in rule:
+            continue
+        value = rule[key]
+        if key in ("tiers", "skus"):
+            value = ",".join(value)
+        elif key == "hours":
+            value = f"{value[0]}-{value[1]}"
+        parts.append(f"{key}={value}")
+    return " ".join(parts) or "(matches everything)"
+
+
+def _compile_rule(rule):
+    checks = []
+    if "tiers" in rule:
+        tiers = frozenset(rule["tiers"])
+        checks.append(lambda ctx: ctx["tier"] in tiers)
+    if "skus" in rule:
+        skus = frozenset(rule["skus"])
+        checks.append(lambda ctx: ctx["sku"] in skus)
+    if "max_price" in rule:
+        max_price = rule["max_price"]
+        checks.append(lambda ctx: ctx["price"] <= max_price)
+    if "max_daily" in rule:
+        max_daily = rule["max_daily"]
+        checks.append(lambda ctx: ctx["daily_spend"] <= max_daily)
+    if "hours" in rule:
+        start, end = rule["hours"]
+        if start <= end:
+            checks.append(lambda ctx: start <= ctx["hour"] < end)
+        else:
+            # Window wraps past midnight, e.g. 22-6
+            checks.append(lambda ctx: ctx["hour"] >= start or ctx["hour"] < end)
+    return rule["name"], tuple(checks)
+
+
+def compile_rules(rules):
+    """Return predicate(ctx) -> name of the first matching rule, or None"""
+    compiled = tuple(_compile_rule(rule) for rule in rules)
+
+    def predicate(ctx):
+        for name, checks in compiled:
+            if all(check(ctx) for check in checks):
+                return name
+        return None
+
+    return predicate
+
+
+def get_predicate(data):
+    """Compiled predicate for the store's rules, rebuilt only when they change"""
+    config = data.get("auto_confirm", {})
+    version = config.get("version", 0)
+    if _compiled["version"] != version or _compiled["predicate"] is None:
+        _compiled["predicate"] = compile_rules(config.get("rules", []))
+        _compiled["version"] = version
+    return _compiled["predicate"]
+
+
+def set_rules(data, rules):
+    config = data.setdefault("auto_confirm", {"rules": [], "version": 0})
+    config["rules"] = rules
+    config["version"] = config.get("version", 0) + 1
+
+
+def daily_spend(user_data, day_key):
+    """Total price of the user's orders placed on day_key (YYYY-MM-DD) that were not refunded"""
+    total = 0
+    # Orders are appended as they are placed, so today's are at the end
+    for order in reversed(user_data.get("orders", [])):
+        timestamp = order.get("timestamp", "")
+        if not timestamp:
+            continue
+        if timestamp < day_key:
+            break
+        if timestamp.startswith(day_key) and order.get("status") not in REFUNDED_STATUSES:
+            total += order.get("price", 0)
+    return total
+
+
+def evaluate(data, user_id, order, now):
+    """Name of the rule that auto-confirms this (already appended) order, or None"""
+    user_data = data["users"][user_id]
+    ctx = {
+        "tier": user_data.get("tier", DEFAULT_TIER),
+        "sku": order["amount"],
+        "price": order["price"],
+        "daily_spend": daily_spend(user_data, now.strftime("%Y-%m-%d")),
+        "hour": now.hour,
+    }
+    return get_predicate(data)(ctx)
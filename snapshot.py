@@ -0,0 +1,265 @@
+"""
+Compact binary snapshot of the data store.
+
+data.json spends most of its bytes on repetition: every order repeats its
+field names, game/server IDs and package names as quoted strings, and its
+timestamp as a 26-character ISO string. A snapshot stores
+
+    header     magic, then (offset, length) of the four sections below
+    strings    marshal list of every distinct game_id/server_id/amount/status
+    index      marshal dict: user ID -> (offset, length) of its block
+    meta       marshal of the store without "users"
+    blocks     one block per user: the profile (marshal of the user without
+               "orders"), then each order as a fixed struct record holding
+               string-table indexes, integers and microsecond timestamps
+
+Snapshot() memory-maps the file and only reads the string table and the
+index up front; a user's block is decoded when that user is looked up.
+Anything a record cannot hold exactly (an aware or oddly formatted
+timestamp, a non-string game_id, extra keys such as confirmed_at) is kept
+in a per-order marshal dict, so load(write(data)) == data always.
+"""
+import marshal, mmap, os, struct
+from collections.abc import Mapping
+
+from records import EPOCH, MICROSECOND, parse_timestamp
+
+MAGIC = b"MMBSTOR1"
+HEADER = struct.Struct("<8s8Q")
+BLOCK = struct.Struct("<II")
+# flags, game_id, server_id, amount, status, price, timestamp, chat_id,
+# order_id length, extras length
+ORDER = struct.Struct("<BIIIIqqqHI")
+
+NO_STRING = 0xFFFFFFFF
+# Order count of a user block whose "orders" is kept whole in the profile
+RAW_ORDERS = 0xFFFFFFFF
+
+HAS_PRICE = 1
+HAS_TIMESTAMP = 2
+HAS_CHAT_ID = 4
+HAS_USER_ID = 8
+HAS_ORDER_ID = 16
+
+INTERNED = ("game_id", "server_id", "amount", "status")
+PACKED = frozenset(INTERNED + ("order_id", "price", "timestamp", "chat_id", "user_id"))
+
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def _is_int64(value):
+    return type(value) is int and INT64_MIN <= value <= INT64_MAX
+
+
+class _Writer:
+    def __init__(self):
+        self.strings = []
+        self.string_ids = {}
+
+    def intern(self, value):
+        index = self.string_ids.get(value)
+        if index is None:
+            index = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def order(self, uid, order):
+        extras = {key: value for key, value in order.items() if key not in PACKED}
+        ids = []
+        for key in INTERNED:
+            value = order.get(key)
+            if type(value) is str:
+                ids.append(self.intern(value))
+            else:
+                ids.append(NO_STRING)
+                if key in order:
+                    extras[key] = value
+
+        flags = 0
+        price = timestamp = chat_id = 0
+        if _is_int64(order.get("price")):
+            flags |= HAS_PRICE
+            price = order["price"]
+        elif "price" in order:
+            extras["price"] = order["price"]
+        if "timestamp" in order:
+            timestamp = parse_timestamp(order["timestamp"])
+            if timestamp is None:
+                timestamp = 0
+                extras["timestamp"] = order["timestamp"]
+            else:
+                flags |= HAS_TIMESTAMP
+        if _is_int64(order.get("chat_id")):
+            flags |= HAS_CHAT_ID
+            chat_id = order["chat_id"]
+        elif "chat_id" in order:
+            extras["chat_id"] = order["chat_id"]
+        if order.get("user_id") == uid:
+            flags |= HAS_USER_ID
+        elif "user_id" in order:
+            extras["user_id"] = order["user_id"]
+
+        order_id = order.get("order_id")
+        order_id = order_id.encode("utf-8", "surrogatepass") if type(order_id) is str else None
+        if order_id is not None and len(order_id) <= 0xFFFF:
+            flags |= HAS_ORDER_ID
+        else:
+            order_id = b""
+            if "order_id" in order:
+                extras["order_id"] = order["order_id"]
+        extra = marshal.dumps(extras) if extras else b""
+        return ORDER.pack(flags, *ids, price, timestamp, chat_id, len(order_id), len(extra)) + order_id + extra
+
+    def user(self, uid, user_data):
+        orders = user_data.get("orders")
+        if not isinstance(orders, list) or not all(type(order) is dict for order in orders):
+            return self._block(user_data, RAW_ORDERS, [])
+        profile = {key: value for key, value in user_data.items() if key != "orders"}
+        return self._block(profile, len(orders), [self.order(uid, order) for order in orders])
+
+    @staticmethod
+    def _block(profile, count, records):
+        blob = marshal.dumps(profile)
+        return BLOCK.pack(len(blob), count) + blob + b"".join(records)
+
+
+def dumps(data):
+    """The store as snapshot bytes"""
+    writer = _Writer()
+    users = data.get("users", {})
+    blocks = []
+    index = {}
+    offset = 0
+    for uid, user_data in users.items():
+        block = writer.user(uid, user_data)
+        index[uid] = (offset, len(block))
+        offset += len(block)
+        blocks.append(block)
+    meta = marshal.dumps({key: value for key, value in data.items() if key != "users"})
+    sections = [marshal.dumps(writer.strings), marshal.dumps(index), meta]
+
+    position = HEADER.size
+    layout = []
+    for section in sections:
+        layout += [position, len(section)]
+        position += len(section)
+    layout += [position, offset]
+    return b"".join([HEADER.pack(MAGIC, *layout), *sections, *blocks])
+
+
+def write(data, path):
+    """Write a snapshot of the store atomically"""
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(dumps(data))
+    os.replace(tmp_file, path)
+
+
+def _decode_orders(buffer, position, count, uid, strings):
+    orders = []
+    unpack = ORDER.unpack_from
+    size = ORDER.size
+    for _ in range(count):
+        (flags, game_id, server_id, amount, status,
+         price, timestamp, chat_id, id_length, extra_length) = unpack(buffer, position)
+        position += size
+        order = {}
+        if flags & HAS_ORDER_ID:
+            order["order_id"] = buffer[position:position + id_length].decode("utf-8", "surrogatepass")
+            position += id_length
+        if game_id != NO_STRING:
+            order["game_id"] = strings[game_id]
+        if server_id != NO_STRING:
+            order["server_id"] = strings[server_id]
+        if amount != NO_STRING:
+            order["amount"] = strings[amount]
+        if status != NO_STRING:
+            order["status"] = strings[status]
+        if flags & HAS_PRICE:
+            order["price"] = price
+        if flags & HAS_TIMESTAMP:
+            order["timestamp"] = (EPOCH + timestamp * MICROSECOND).isoformat()
+        if flags & HAS_USER_ID:
+            order["user_id"] = uid
+        if flags & HAS_CHAT_ID:
+            order["chat_id"] = chat_id
+        if extra_length:
+            order.update(marshal.loads(buffer[position:position + extra_length]))
+            position += extra_length
+        orders.append(order)
+    return orders
+
+
+class Snapshot(Mapping):
+    """
+    Read-only view of a snapshot file, mapping user ID -> user dict.
+    Each lookup decodes that user's block afresh; the caller may mutate
+    the result freely.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path}: empty snapshot") from None
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: not a store snapshot")
+        magic, *layout = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a store snapshot")
+        self._sections = list(zip(layout[::2], layout[1::2]))
+        self.strings = marshal.loads(self._section(0))
+        self._index = marshal.loads(self._section(1))
+        self._blocks = self._sections[3][0]
+
+    def _section(self, number):
+        offset, length = self._sections[number]
+        return self._map[offset:offset + length]
+
+    def __getitem__(self, uid):
+        offset, length = self._index[uid]
+        start = self._blocks + offset
+        block = self._map[start:start + length]
+        profile_length, count = BLOCK.unpack_from(block)
+        user_data = marshal.loads(block[BLOCK.size:BLOCK.size + profile_length])
+        if count != RAW_ORDERS:
+            user_data["orders"] = _decode_orders(block, BLOCK.size + profile_length, count, uid, self.strings)
+        return user_data
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, uid):
+        return uid in self._index
+
+    def meta(self):
+        """Everything in the store except "users" """
+        return marshal.loads(self._section(2))
+
+    def to_data(self):
+        """The whole store as a plain dict, equal to the one written"""
+        data = {"users": {uid: self[uid] for uid in self._index}}
+        data.update(self.meta())
+        return data
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(path):
+    with Snapshot(path) as snapshot:
+        return snapshot.to_data()
@@ -0,0 +1,128 @@
+"""
+Running sales aggregates kept in the data store under data["stats"].
+
+Every order/topup state transition bumps the matching day and hour
+bucket, so reports never have to scan order history. rebuild_stats()
+recomputes everything from history in a single pass.
+"""
+from datetime import datetime
+
+
+def new_bucket():
+    return {
+        "orders": 0,
+        "confirmed": 0,
+        "cancelled": 0,
+        "revenue": 0,
+        "sku_revenue": {},
+        # Supplier cost of confirmed orders whose cost is known, and their revenue
+        "cost": 0,
+        "costed_revenue": 0,
+        "topups": 0,
+        "topup_volume": 0,
+        "admins": {},
+    }
+
+
+def get_buckets(data, timestamp=None):
+    """Return the (day, hour) buckets for an ISO timestamp, creating them if needed"""
+    stats = data.setdefault("stats", {"days": {}, "hours": {}})
+    at = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+    day_key = at.strftime("%Y-%m-%d")
+    hour_key = at.strftime("%Y-%m-%dT%H")
+    day = stats["days"].setdefault(day_key, new_bucket())
+    hour = stats["hours"].setdefault(hour_key, new_bucket())
+    return day, hour
+
+
+def _admin_counter(bucket, admin_name):
+    return bucket["admins"].setdefault(admin_name, {"confirmed": 0, "cancelled": 0})
+
+
+def record_order_created(data, order):
+    for bucket in get_buckets(data, order.get("timestamp")):
+        bucket["orders"] += 1
+
+
+def record_order_confirmed(data, order, admin_name):
+    price = order.get("price", 0)
+    sku = order.get("amount", "")
+    for bucket in get_buckets(data, order.get("confirmed_at")):
+        bucket["confirmed"] += 1
+        bucket["revenue"] += price
+        bucket["sku_revenue"][sku] = bucket["sku_revenue"].get(sku, 0) + price
+        _admin_counter(bucket, admin_name)["confirmed"] += 1
+        if "cost" in order:
+            # Buckets from before cost tracking lack these keys
+            bucket["cost"] = bucket.get("cost", 0) + order["cost"]
+            bucket["costed_revenue"] = bucket.get("costed_revenue", 0) + price
+
+
+def record_order_cancelled(data, order, admin_name):
+    for bucket in get_buckets(data, order.get("cancelled_at")):
+        bucket["cancelled"] += 1
+        _admin_counter(bucket, admin_name)["cancelled"] += 1
+
+
+def record_order_refunded(data, order, admin_name):
+    """A confirmed order whose delivery failed was refunded: take back its confirmation and count a cancel"""
+    price = order.get("price", 0)
+    sku = order.get("amount", "")
+    for bucket in get_buckets(data, order.get("confirmed_at")):
+        bucket["confirmed"] -= 1
+        bucket["revenue"] -= price
+        bucket["sku_revenue"][sku] = bucket["sku_revenue"].get(sku, 0) - price
+        _admin_counter(bucket, order.get("confirmed_by", "Unknown"))["confirmed"] -= 1
+        if "cost" in order:
+            bucket["cost"] = bucket.get("cost", 0) - order["cost"]
+            bucket["costed_revenue"] = bucket.get("costed_revenue", 0) - price
+    record_order_cancelled(data, order, admin_name)
+
+
+def record_topup_approved(data, topup):
+    for bucket in get_buckets(data, topup.get("approved_at")):
+        bucket["topups"] += 1
+        bucket["topup_volume"] += topup.get("amount", 0)
+
+
+def rebuild_stats(data):
+    """Recompute every aggregate from order and topup history in one pass"""
+    data["stats"] = {"days": {}, "hours": {}}
+    for user_data in data["users"].values():
+        for order in user_data.get("orders", []):
+            if order.get("timestamp"):
+                record_order_created(data, order)
+            # Confirmed orders may since have moved on to processing/delivered/failed;
+            # a refunded one counts as cancelled
+            if order.get("confirmed_at") and not order.get("refunded_at"):
+                record_order_confirmed(data, order, order.get("confirmed_by", "Unknown"))
+            elif order.get("cancelled_at"):
+                record_order_cancelled(data, order, order.get("cancelled_by", "Unknown"))
+        for topup in user_data.get("topups", []):
+            if topup.get("status") == "approved" and topup.get("approved_at"):
+                record_topup_approved(data, topup)
+    return data["stats"]
+
+
+def margin(bucket):
+    """(margin, percent of costed revenue) for a bucket, or None if no costed orders"""
+    costed_revenue = bucket.get("costed_revenue", 0)
+    if not costed_revenue:
+        return None
+    profit = costed_revenue - bucket.get("cost", 0)
+    return profit, profit * 100 / costed_revenue
+
+
+def get_day(data, day_key):
+    return data.get("stats", {}).get("days", {}).get(day_key)
+
+
+def get_hours(data, day_key):
+    """Return [(hour, bucket)] for one day, in order"""
+    hours = data.get("stats", {}).get("hours", {})
+    result = []
+    for hour in range(24):
+        bucket = hours.get(f"{day_key}T{hour:02d}")
+        if bucket:
+            result.append((hour, bucket))
+    return result
@@ -0,0 +1,261 @@
+"""
+JSON data store shared by the bot and the offline tools.
+
+data.json stays the source of truth. Next to it, data.json.snap holds
+the same data in marshal form, stamped with the inode, mtime, ctime and
+size of the data.json it mirrors; marshal loads several times faster than json. The
+last snapshot is also kept in memory, so a load_data() while data.json
+is unchanged is only a stat() plus marshal.loads(), and every caller
+still gets its own copy to mutate. If data.json is edited by hand the
+stamp no longer matches and the store falls back to json once.
+
+data.json is written without indentation: with indent json.dump cannot
+use its C encoder, and writing took about ten times as long.
+
+Every data_transaction() holds one flock for its load and save, so writes
+are serialized across processes and each one rewrites the whole file.
+Cluster runtime state (StoreDict) is kept out of it, in a sqlite file.
+"""
+import fcntl, json, marshal, os, sqlite3, struct
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+import records
+
+DATA_FILE = "data.json"
+LOCK_FILE = f"{DATA_FILE}.lock"
+SNAPSHOT_FILE = f"{DATA_FILE}.snap"
+# Runtime state shared by cluster workers (StoreDict)
+STATE_FILE = f"{DATA_FILE}.state"
+
+SNAPSHOT_MAGIC = b"MMBSNAP2"
+SNAPSHOT_HEADER = struct.Struct("<8sqqqq")
+
+_snapshot = {"stamp": None, "blob": None}
+_state = {"pid": None, "db": None}
+
+
+def _stamp(path):
+    st = os.stat(path)
+    # The inode tells a replaced file from the one before it when mtime and
+    # size match; ctime moves on every write, even one that resets the mtime
+    return st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size
+
+
+def data_stamp():
+    """A value that changes whenever data.json is saved or edited (None if it doesn't exist)"""
+    try:
+        return _stamp(DATA_FILE)
+    except FileNotFoundError:
+        return None
+
+
+def _read_snapshot(stamp):
+    """Marshal blob from the snapshot file if it mirrors data.json at stamp"""
+    try:
+        with open(SNAPSHOT_FILE, "rb") as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) != SNAPSHOT_HEADER.size:
+                return None
+            magic, *header_stamp = SNAPSHOT_HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC or tuple(header_stamp) != stamp:
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_snapshot(stamp, blob):
+    tmp_file = f"{SNAPSHOT_FILE}.tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, *stamp))
+            f.write(blob)
+        os.replace(tmp_file, SNAPSHOT_FILE)
+    except OSError:
+        # The snapshot is only a cache; data.json is already saved
+        pass
+
+
+def load_data():
+    if not os.path.exists(DATA_FILE):
+        with open(DATA_FILE, "w") as f:
+            json.dump({"users": {}, "prices": {}}, f)
+    stamp = _stamp(DATA_FILE)
+    if _snapshot["stamp"] != stamp:
+        blob = _read_snapshot(stamp)
+        if blob is None:
+            with open(DATA_FILE, "r") as f:
+                data = json.load(f)
+            blob = marshal.dumps(data)
+            _write_snapshot(stamp, blob)
+            _snapshot.update(stamp=stamp, blob=blob)
+            return data
+        _snapshot.update(stamp=stamp, blob=blob)
+    return marshal.loads(_snapshot["blob"])
+
+
+def load_user(user_id):
+    """One user as a records.User (orders and topups as records), or None"""
+    user_data = load_data()["users"].get(user_id)
+    return records.User.from_dict(user_data) if user_data is not None else None
+
+
+def save_data(data):
+    """Write the store atomically so a crash mid-write never truncates data.json"""
+    tmp_file = f"{DATA_FILE}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_file, DATA_FILE)
+    stamp = _stamp(DATA_FILE)
+    blob = marshal.dumps(data)
+    _write_snapshot(stamp, blob)
+    _snapshot.update(stamp=stamp, blob=blob)
+
+
+@contextmanager
+def store_lock():
+    """Exclusive lock on the store shared by the bot and offline tools"""
+    with open(LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextmanager
+def data_transaction():
+    """
+    Load the store once, let the caller apply any number of mutations,
+    then write it back with a single save. Nothing is written if the
+    block raises, so a half-applied bulk operation is never persisted.
+    The store lock is held throughout, so the bot and admin_cli never
+    overwrite each other's changes.
+    """
+    with store_lock():
+        data = load_data()
+        yield data
+        save_data(data)
+
+
+def find_order(data, order_id):
+    """Return (user_id, order) for an order ID, or (None, None)"""
+    for uid, user_data in data["users"].items():
+        for order in user_data.get("orders", []):
+            if order["order_id"] == order_id:
+                return uid, order
+    return None, None
+
+
+def transition_order(data, order_id, expected, status, **fields):
+    """
+    Compare-and-set an order's status: inside a data_transaction(), move
+    the order to status (and set fields) only if its status is currently
+    one of expected. Returns (user_id, order, applied); order is None when
+    the ID is unknown. The store lock makes the check and the write one
+    step, so of two racing transitions exactly one is applied.
+
+    Every status change also bumps the order's "rev", so code holding two
+    copies of an order (e.g. admin card edits) can tell which is newer.
+    """
+    uid, order = find_order(data, order_id)
+    if order is None or order.get("status") not in expected:
+        return uid, order, False
+    order["status"] = status
+    order["rev"] = order.get("rev", 0) + 1
+    order.update(fields)
+    return uid, order, True
+
+
+def _state_db():
+    """This process's connection to STATE_FILE (reopened after a fork)"""
+    if _state["pid"] != os.getpid():
+        db = sqlite3.connect(STATE_FILE, timeout=10, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT, item TEXT, value TEXT, PRIMARY KEY (key, item))")
+        db.execute("CREATE TABLE IF NOT EXISTS seeded (key TEXT PRIMARY KEY)")
+        _state.update(pid=os.getpid(), db=db)
+    return _state["db"]
+
+
+class StoreDict(MutableMapping):
+    """
+    A dict shared by every bot process, kept in STATE_FILE (sqlite, one
+    row per item, values as JSON) rather than in memory. Each read or
+    write touches only its own row: it neither loads data.json nor takes
+    the store lock, so it is cheap and safe inside data_transaction().
+    Values are copies; mutate them by assigning the item again.
+
+    On first use the key is seeded from its defaults and from data[key],
+    where earlier versions kept this state.
+    """
+
+    def __init__(self, key, defaults=None):
+        self.key = key
+        self.defaults = dict(defaults or {})
+        self._seeded_pid = None
+
+    def _db(self):
+        db = _state_db()
+        if self._seeded_pid != os.getpid():
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if db.execute("INSERT OR IGNORE INTO seeded VALUES (?)", (self.key,)).rowcount:
+                    items = {**self.defaults, **load_data().get(self.key, {})}
+                    db.executemany(
+                        "INSERT OR IGNORE INTO state VALUES (?, ?, ?)",
+                        [(self.key, json.dumps(item), json.dumps(value)) for item, value in items.items()]
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            self._seeded_pid = os.getpid()
+        return db
+
+    def __getitem__(self, item):
+        row = self._db().execute(
+            "SELECT value FROM state WHERE key = ? AND item = ?", (self.key, json.dumps(item))
+        ).fetchone()
+        if row is None:
+            raise KeyError(item)
+        return json.loads(row[0])
+
+    def __setitem__(self, item, value):
+        self._db().execute(
+            "INSERT OR REPLACE INTO state VALUES (?, ?, ?)", (self.key, json.dumps(item), json.dumps(value))
+        )
+
+    def __delitem__(self, item):
+        cursor = self._db().execute("DELETE FROM state WHERE key = ? AND item = ?", (self.key, json.dumps(item)))
+        if not cursor.rowcount:
+            raise KeyError(item)
+
+    def __iter__(self):
+        rows = self._db().execute("SELECT item FROM state WHERE key = ?", (self.key,)).fetchall()
+        return iter([json.loads(item) for item, in rows])
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM state WHERE key = ?", (self.key,)).fetchone()[0]
+
+    def __contains__(self, item):
+        return self._db().execute(
+            "SELECT 1 FROM state WHERE key = ? AND item = ?", (self.key, json.dumps(item))
+        ).fetchone() is not None
+
+    def snapshot(self):
+        """A plain dict copy, for reading several fields with one query"""
+        rows = self._db().execute("SELECT item, value FROM state WHERE key = ?", (self.key,)).fetchall()
+        return {json.loads(item): json.loads(value) for item, value in rows}
+
+    def pop(self, item, *default):
+        row = self._db().execute(
+            "DELETE FROM state WHERE key = ? AND item = ? RETURNING value", (self.key, json.dumps(item))
+        ).fetchone()
+        if row is not None:
+            return json.loads(row[0])
+        if default:
+            return default[0]
+        raise KeyError(item)
@@ -0,0 +1,12 @@
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty directory for the store; storage works on data.json in the current directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, "_snapshot", {"stamp": None, "blob": None})
+    monkeypatch.setattr(storage, "_state", {"pid": None, "db": None})
+    return tmp_path
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import expiry
+import ledger
+
+NOW = datetime(2025, 9, 2, 12, 0, 0)
+HOUR = 3600
+
+
+def store_with(*orders):
+    data = {"users": {"42": {"balance": 0, "orders": [], "topups": []}}}
+    for age_hours, status in orders:
+        order = {
+            "order_id": f"ORD{len(data['users']['42']['orders'])}", "price": 1000, "status": status,
+            "timestamp": (NOW - timedelta(hours=age_hours)).isoformat(),
+        }
+        data["users"]["42"]["orders"].append(order)
+    return data
+
+
+def test_index_only_reports_due_items():
+    data = store_with((1, "pending"), (30, "pending"))
+    index = expiry.PendingIndex()
+    index.rebuild(data)
+
+    assert len(index) == 2
+    assert index.has_due(NOW, 24 * HOUR, 24 * HOUR)
+    assert not index.has_due(NOW, 48 * HOUR, 24 * HOUR)
+    assert not expiry.PendingIndex().has_due(NOW, 0, 0)
+
+
+def test_expire_due_refunds_pending_orders_only():
+    data = store_with((30, "pending"), (30, "confirmed"), (1, "pending"))
+    index = expiry.PendingIndex()
+    index.rebuild(data)
+    # Confirmed after indexing: dropped when it reaches the top
+    data["users"]["42"]["orders"][0]["status"] = "confirmed"
+    data["users"]["42"]["orders"].append(
+        {"order_id": "OLD", "price": 700, "status": "pending", "timestamp": (NOW - timedelta(hours=40)).isoformat()}
+    )
+    index.add_order("42", data["users"]["42"]["orders"][-1])
+
+    expired_orders, expired_topups = expiry.expire_due(index, data, NOW, 24 * HOUR, 24 * HOUR, batch_size=10)
+
+    assert [order["order_id"] for _, order in expired_orders] == ["OLD"]
+    assert expired_topups == []
+    old = data["users"]["42"]["orders"][-1]
+    assert old["status"] == "expired" and old["rev"] == 1
+    assert data["users"]["42"]["balance"] == 700
+    assert ledger.check(data, deep=True) == ([], [])
+    # The young pending order is still indexed
+    assert len(index) == 1
+
+
+def test_expire_due_respects_batch_size():
+    data = store_with(*[(30, "pending")] * 5)
+    index = expiry.PendingIndex()
+    index.rebuild(data)
+
+    first, _ = expiry.expire_due(index, data, NOW, 24 * HOUR, 24 * HOUR, batch_size=3)
+    second, _ = expiry.expire_due(index, data, NOW, 24 * HOUR, 24 * HOUR, batch_size=3)
+
+    assert (len(first), len(second)) == (3, 2)
+    assert not index.has_due(NOW, 24 * HOUR, 24 * HOUR)
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import fulfillment
+import storage
+from fulfillment import FakeProvider, FulfillmentPool
+
+
+@pytest.fixture(autouse=True)
+def store(workdir):
+    order = {
+        "order_id": "ORD1", "game_id": "123", "server_id": "4", "amount": "86",
+        "price": 5100, "status": "confirmed", "timestamp": datetime.now().isoformat(),
+    }
+    fulfillment.mark_for_fulfillment(order)
+    storage.save_data({"users": {"42": {"balance": 0, "orders": [order], "topups": []}}})
+
+
+def stored_order():
+    return storage.find_order(storage.load_data(), "ORD1")[1]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays the pool asked for; the waits themselves are skipped"""
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(fulfillment.asyncio, "sleep", sleep)
+    return delays
+
+
+def run_pool(provider, **kwargs):
+    notices = []
+
+    async def notify(order):
+        notices.append(order["status"])
+
+    async def main():
+        pool = FulfillmentPool(provider, notify=notify, workers=1, **kwargs)
+        await pool.start()
+        await pool.join()
+        await pool.stop()
+
+    asyncio.run(main())
+    return notices
+
+
+def test_delivers_after_retries_with_backoff(sleeps):
+    provider = FakeProvider(fail_times=2)
+    notices = run_pool(provider, max_attempts=5, base_delay=2.0)
+
+    order = stored_order()
+    assert order["status"] == "delivered"
+    assert order["supplier_ref"] == "FAKE-ORD1"
+    assert provider.attempts["order-ORD1"] == 3
+    assert sleeps == [2.0, 4.0]
+    assert notices == ["processing", "delivered"]
+
+
+def test_fails_after_max_attempts(sleeps):
+    provider = FakeProvider(fail_times=10)
+    notices = run_pool(provider, max_attempts=3, base_delay=1.0)
+
+    order = stored_order()
+    assert order["status"] == "failed"
+    assert "failed_at" in order
+    assert provider.attempts["order-ORD1"] == 3
+    # No wait after the last attempt
+    assert sleeps == [1.0, 2.0]
+    assert notices == ["processing", "failed"]
+
+
+def test_reopened_failed_order_is_delivered(sleeps):
+    provider = FakeProvider(fail_times=3)
+    run_pool(provider, max_attempts=3, base_delay=0)
+    assert stored_order()["status"] == "failed"
+
+    with storage.data_transaction() as data:
+        _, order, applied = fulfillment.reopen(data, "ORD1", datetime.now())
+    assert applied
+    assert order["status"] == "confirmed" and order["retries"] == 1
+    assert "failed_at" not in order
+
+    run_pool(provider, max_attempts=3, base_delay=0)
+    assert stored_order()["status"] == "delivered"
+    assert provider.attempts["order-ORD1"] == 4
+
+
+def test_reopen_only_failed_or_stalled_orders():
+    now = datetime.now()
+    with storage.data_transaction() as data:
+        # Still confirmed: nothing to resolve
+        assert not fulfillment.reopen(data, "ORD1", now)[2]
+        assert fulfillment.reopen(data, "ORD9", now) == (None, None, False)
+
+        _, order = storage.find_order(data, "ORD1")
+        order["status"] = "processing"
+        order["processing_at"] = (now - timedelta(minutes=5)).isoformat()
+        assert not fulfillment.reopen(data, "ORD1", now)[2]
+
+        order["processing_at"] = (now - fulfillment.STALLED_AFTER - timedelta(minutes=1)).isoformat()
+        assert fulfillment.reopen(data, "ORD1", now)[2]
+
+        # Left processing by a run without processing_at
+        order["status"] = "processing"
+        del order["processing_at"]
+        assert fulfillment.is_resolvable(order, now)
+
+
+class BrokenProvider(FakeProvider):
+    async def deliver(self, order, idempotency_key):
+        self.attempts[idempotency_key] = self.attempts.get(idempotency_key, 0) + 1
+        raise ConnectionError("supplier unreachable")
+
+
+def test_unexpected_provider_errors_end_in_failed(sleeps):
+    provider = BrokenProvider()
+    notices = run_pool(provider, max_attempts=2, base_delay=1.0)
+
+    assert stored_order()["status"] == "failed"
+    assert provider.attempts["order-ORD1"] == 2
+    assert sleeps == [1.0]
+    assert notices == ["processing", "failed"]
@@ -0,0 +1,57 @@
+import pytest
+
+import inventory
+
+
+def store(**entry):
+    return {"inventory": {"86": entry}}
+
+
+def test_consume_reports_low_once_and_pauses_when_depleted():
+    data = store(stock=3, low=2, cost=4600)
+
+    first = {"amount": "86"}
+    assert inventory.consume(data, first) == inventory.LOW
+    assert first["cost"] == 4600
+    assert inventory.consume(data, {"amount": "86"}) is None
+    assert inventory.consume(data, {"amount": "86"}) == inventory.DEPLETED
+    assert inventory.is_paused(data, "86")
+    # Confirming past zero is allowed and not reported again
+    assert inventory.consume(data, {"amount": "86"}) is None
+    assert data["inventory"]["86"]["stock"] == -1
+
+
+def test_consume_from_supplier_balance():
+    data = store(balance=10000, cost=4000)
+    assert inventory.consume(data, {"amount": "86"}) is None
+    assert inventory.consume(data, {"amount": "86"}) == inventory.DEPLETED
+    assert inventory.available(data["inventory"]["86"]) == 0
+
+
+def test_untracked_skus_never_run_out():
+    data = {"inventory": {}}
+    assert inventory.consume(data, {"amount": "86"}) is None
+    assert inventory.in_stock(data, "86") and not inventory.is_paused(data, "86")
+
+
+def test_parse_update():
+    assert inventory.parse_update(["stock=10", "cost=4600", "maintenance=off"]) == {
+        "stock": 10, "cost": 4600, "maintenance": False,
+    }
+    assert inventory.parse_update(["add=-5"]) == {"add": -5}
+
+
+@pytest.mark.parametrize("tokens", [
+    [], ["stock"], ["price=1"], ["stock=-1"], ["stock=x"], ["maintenance=maybe"], ["stock=1", "balance=1"],
+])
+def test_parse_update_rejects(tokens):
+    with pytest.raises(ValueError):
+        inventory.parse_update(tokens)
+
+
+def test_restock_resumes_a_depleted_sku():
+    data = store(stock=0, maintenance=True)
+    inventory.apply_update(data, "86", {"add": 5})
+    assert data["inventory"]["86"] == {"stock": 5}
+    inventory.apply_update(data, "86", {"add": 5, "maintenance": True})
+    assert inventory.is_paused(data, "86")
@@ -0,0 +1,23 @@
+import messages
+
+
+def test_escape_plain_markdown():
+    assert messages.escape("a_b*c`d[e]") == "a\\_b\\*c\\`d\\[e]"
+    assert messages.escape(12345) == "12345"
+
+
+def test_escape_code_span_and_link():
+    assert messages.escape("ab`c_d", messages.CODE) == "ab'c_d"
+    assert messages.escape("[x]_y", messages.LINK) == "(x)\\_y"
+
+
+def test_render_escapes_fields_by_position():
+    text = messages.render(
+        "admin_new_order",
+        order_id="ORD`1", user_name="[Ko_Ko]", user_id=42, game_id="1", server_id="2",
+        amount="wp_1", price=5100, time="now", status="⏳",
+    )
+    assert "`ORD'1`" in text
+    assert "[(Ko\\_Ko)](tg://user?id=42)" in text
+    assert "💎 Amount: wp\\_1" in text
+    assert "5,100 MMK" in text
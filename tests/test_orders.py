@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime
+
+import fulfillment
+import ledger
+import records
+import storage
+from records import OrderStatus
+
+
+def new_order(now):
+    order = {"order_id": f"ORD{records.id_stamp(now)}", "status": "confirmed"}
+    fulfillment.mark_for_fulfillment(order)
+    return order
+
+
+def test_orders_in_the_same_second_get_distinct_keys():
+    now = datetime(2025, 9, 1, 12, 0, 0)
+    orders = [new_order(now) for _ in range(1000)]
+
+    assert len({order["order_id"] for order in orders}) == len(orders)
+    assert len({order["fulfillment_key"] for order in orders}) == len(orders)
+    assert all(order["order_id"].startswith("ORD20250901120000") for order in orders)
+
+
+def pending_store():
+    data = {"users": {"42": {"balance": 10000, "orders": [], "topups": []}}}
+    order = {"order_id": "ORD1", "amount": "86", "price": 5100, "status": "pending", "timestamp": "2025-09-01T12:00:00"}
+    ledger.post(data, "42", ledger.KIND_ORDER, -order["price"], ref="ORD1")
+    data["users"]["42"]["orders"].append(order)
+    storage.save_data(data)
+
+
+def test_transition_is_compare_and_set(workdir):
+    pending_store()
+    with storage.data_transaction() as data:
+        uid, order, applied = storage.transition_order(data, "ORD1", (OrderStatus.PENDING,), "confirmed")
+        assert (uid, order["status"], order["rev"], applied) == ("42", "confirmed", 1, True)
+        # A second press on the same card sees the order already moved on
+        _, order, applied = storage.transition_order(data, "ORD1", (OrderStatus.PENDING,), "cancelled")
+        assert (order["status"], applied) == ("confirmed", False)
+        assert storage.transition_order(data, "ORD9", (OrderStatus.PENDING,), "cancelled") == (None, None, False)
+    assert storage.find_order(storage.load_data(), "ORD1")[1]["status"] == "confirmed"
+
+
+def test_racing_confirm_and_cancel_apply_once(workdir):
+    pending_store()
+    start = threading.Barrier(2)
+    outcomes = {}
+
+    def press(status):
+        start.wait()
+        with storage.data_transaction() as data:
+            _, _, applied = storage.transition_order(data, "ORD1", (OrderStatus.PENDING,), status)
+            if applied and status == "cancelled":
+                ledger.post(data, "42", ledger.KIND_REFUND, 5100, ref="ORD1")
+        outcomes[status] = applied
+
+    threads = [threading.Thread(target=press, args=(status,)) for status in ("confirmed", "cancelled")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes.values()) == [False, True]
+    data = storage.load_data()
+    order = data["users"]["42"]["orders"][0]
+    assert outcomes[order["status"]] and order["rev"] == 1
+    # The refund was posted at most once and the balance matches the ledger
+    assert data["users"]["42"]["balance"] == (10000 if order["status"] == "cancelled" else 4900)
+    assert ledger.check(data, deep=True) == ([], [])
@@ -0,0 +1,40 @@
+import pytest
+
+import records
+from records import Order, OrderStatus, User
+
+
+@pytest.mark.parametrize("order", [
+    {"order_id": "ORD1", "game_id": "123456789", "server_id": "1234", "amount": "86", "price": 5100,
+     "status": "pending", "timestamp": "2025-09-01T12:00:00.123456", "user_id": "42", "chat_id": -100123},
+    # Values a field can't hold exactly, an unknown status and unknown keys are kept as they are
+    {"order_id": "ORD2", "price": 5100.5, "status": "on_hold", "timestamp": "2025-09-01 12:00", "batch_id": "CART1"},
+    {"order_id": "ORD3", "confirmed_at": "2025-09-01T12:00:00", "chat_id": True, "rev": 3},
+])
+def test_order_round_trip(order):
+    assert Order.from_dict(order).to_dict() == order
+
+
+def test_status_is_an_enum():
+    order = Order.from_dict({"status": "confirmed"})
+    assert order.status is OrderStatus.CONFIRMED
+    assert order.to_dict() == {"status": "confirmed"}
+
+
+def test_user_round_trip_shares_repeated_strings():
+    user = {
+        "name": "Ko", "balance": 100,
+        "orders": [{"order_id": f"ORD{n}", "game_id": "".join(["123", "456"])} for n in range(3)],
+        "topups": [{"amount": 5000, "status": "approved", "timestamp": "2025-09-01T12:00:00"}],
+    }
+    record = User.from_dict(user)
+
+    assert record.to_dict() == user
+    assert record.orders[0].game_id is record.orders[2].game_id
+
+
+def test_timestamps_only_when_exact():
+    assert records.parse_timestamp("2025-09-01T12:00:00") is not None
+    assert records.parse_timestamp("2025-09-01T12:00:00+06:30") is None
+    assert records.parse_timestamp("2025-09-01") is None
+    assert records.parse_timestamp(12) is None